@@ -1,81 +1,162 @@
 from store.models import ProductVariation
-import decimal
+from cart.pricing import PricedCart, load_variations
+from cart.storage import get_request_cart_storage
 from django.shortcuts import get_object_or_404
 from django.core.exceptions import ValidationError
+from helpers import image_srcset, image_url
 
 class Cart:
     """
-    A class to represent a shopping cart in the session.
+    A class to represent a shopping cart.
 
-    This class manages the cart in the session, allowing adding/removing items,
-    updating quantities, and calculating totals.
+    This class manages the cart, allowing adding/removing items, updating
+    quantities, and calculating totals. The lines are kept by a storage
+    backend from `cart.storage`: the session for anonymous visitors and the
+    `CartItem` table for signed-in users, by default.
 
     Attributes:
-        session (Session): The session object from the request to store cart data.
-        cart (dict): The dictionary representing the cart, stored in the session.
+        session (Session): The session object from the request.
+        storage (BaseCartStorage): The backend keeping the cart lines.
+        cart (dict): The quantity of each variation in the cart, keyed by
+            variation id as a string.
     """
 
     def __init__(self, request):
         """
         Initializes the cart.
 
-        Retrieves the cart from the session, or creates a new cart if none exists.
+        Loads the cart from its storage. When none exists an empty cart is
+        used and nothing is written until an item is actually added, so
+        browsing visitors never get a session written.
 
         Args:
             request (HttpRequest): The HTTP request object containing the session.
         """
         self.session = request.session
-        cart = self.session.get("cart", None)
-        if not cart:
-            cart = self.session['cart'] = {}
-        self.cart = cart
+        self.storage = get_request_cart_storage(request)
+        self.cart = self.storage.load()
+        self._priced = None
     
     def save(self):
         """
-        Marks the session as modified to ensure the cart is saved.
+        Writes the whole cart to its storage.
 
-        This method is called whenever the cart is updated.
+        Single line changes go through `add` and `remove`, which only write
+        the line that changed.
         """
-        self.session.modified = True 
+        self.storage.save(self.cart)
+        self._priced = None
     
     def clear(self):
         """
-        Clears the cart from the session.
+        Clears the cart.
 
-        This method removes the cart from the session and resets the in-memory cart.
-        It then saves the session after clearing the cart.
+        This method removes the cart from its storage and resets the in-memory cart.
         """
-        self.session.pop("cart", None)  # Remove cart from session
+        self.storage.clear()
         self.cart = {}  # Reset in-memory cart
-        self.save()  # Ensure session modification
+        self._priced = None
 
     def add(self, id, quantity=1, update_quantity=False):
         id = str(id)
         variation = get_object_or_404(ProductVariation, id=int(id))
         
         # Validate stock
-        current_quantity = self.cart.get(id, {'quantity': 1})['quantity']
-        new_quantity = quantity if update_quantity else current_quantity + quantity
+        current_quantity = self.cart.get(id, 1)
+        new_quantity = int(quantity) if update_quantity else current_quantity + int(quantity)
         if new_quantity > variation.stock:
             raise ValidationError("This exceeds our stock")
         
-        if id not in self.cart:
-            self.cart[id] = {
-                'id': int(id),
-                'price_cents': int(variation.price_cents),
-                'quantity': 1
-            }
-        
-        if update_quantity:
-            self.cart[id]['quantity'] = int(quantity)
-        else:
-            self.cart[id]['quantity'] += int(quantity)
-        
         # Remove item if quantity becomes 0
-        if self.cart[id]['quantity'] <= 0:
+        if new_quantity <= 0:
             self.remove(id)
-        
-        self.save()
+            return
+
+        self.cart[id] = new_quantity
+        self.storage.save_line(id, new_quantity)
+        self._priced = None
+
+    def update(self, operations):
+        """
+        Applies a batch of quantity changes to the cart.
+
+        The variations of every operation are loaded with a single query and
+        all operations are validated before anything is written, so a batch
+        is applied entirely or not at all. Operations run in order, so a
+        variation may appear more than once.
+
+        Args:
+            operations (list): Dicts with a `variation_id`, a `quantity` and
+                an optional `mode`: `"set"` (the default) replaces the line
+                quantity, `"add"` adds to it (negative values remove units).
+                Lines ending at zero are removed.
+
+        Raises:
+            ValidationError: Keyed by variation id, when a variation does not
+                exist or a quantity is raised above its stock.
+        """
+        # The lines of the whole resulting cart come from the same query
+        variations = load_variations(
+            set(self.cart) | {str(operation['variation_id']) for operation in operations}
+        )
+
+        quantities, errors = {}, {}
+        for operation in operations:
+            id = str(operation['variation_id'])
+            variation = variations.get(int(id))
+            if variation is None:
+                errors[id] = "This product is not available"
+                continue
+            current = quantities.get(id, self.cart.get(id, 0))
+            quantity = int(operation['quantity'])
+            if operation.get('mode', 'set') == 'add':
+                quantity += current
+            quantity = max(quantity, 0)
+            # Lowering a line is always allowed, even below a fallen stock
+            if quantity > current and quantity > variation.stock:
+                errors[id] = "This exceeds our stock"
+                continue
+            quantities[id] = quantity
+        if errors:
+            raise ValidationError(errors)
+
+        changed, removed = {}, []
+        for id, quantity in quantities.items():
+            if quantity == 0:
+                if self.cart.pop(id, None) is not None:
+                    removed.append(id)
+            elif self.cart.get(id) != quantity:
+                self.cart[id] = changed[id] = quantity
+        if changed:
+            self.storage.merge(changed)
+        if removed:
+            self.storage.delete_lines(removed)
+        self._priced = PricedCart.from_variations(self.cart, variations)
+
+    def summary(self):
+        """
+        Returns a JSON-serializable summary of the cart.
+
+        Returns:
+            dict: The item count, the subtotal, shipping and total in cents,
+            and the lines of the cart.
+        """
+        priced = self.priced()
+        return {
+            'count': priced.count,
+            'subtotal_cents': priced.subtotal_cents,
+            'shipping_cents': priced.shipping_cents,
+            'total_cents': priced.total_cents,
+            'lines': [
+                {
+                    'variation_id': line.variation.id,
+                    'quantity': line.quantity,
+                    'price_cents': line.unit_price_cents,
+                    'total_cents': line.total_cents,
+                }
+                for line in priced.lines
+            ],
+        }
 
     def remove(self, id):
         """
@@ -89,7 +170,8 @@ class Cart:
         id = str(id)
         if id in self.cart:
             del self.cart[id]
-            self.save()
+            self.storage.delete_line(id)
+            self._priced = None
     
     def __len__(self):
         """
@@ -100,48 +182,82 @@ class Cart:
         Returns:
             int: The total number of items in the cart.
         """
-        if len(self.cart.keys()) == 0:
-            return 0
-        else:
-            return sum(
-                int(item['quantity']) for item in self.cart.values()
-            )
+        return sum(self.cart.values())
         
     def get_total_cost(self):
         """
-        Calculates the total cost of all items in the cart.
+        Calculates the total cost of all items in the cart, before shipping.
+
+        Returns:
+            float: The discounted subtotal of the cart in dollars.
+        """
+        return self.priced().subtotal
 
-        This method multiplies the price of each item by its quantity and sums up the result.
+    def priced(self):
+        """
+        Returns the cart priced by `cart.pricing`, loading it on first use.
+
+        The cart itself only holds variation ids and quantities. All
+        variations and their products are fetched in a single query and the
+        result is kept on the cart until it is modified, so the cart page,
+        header, checkout and payment share one snapshot per request.
 
         Returns:
-            decimal.Decimal: The total cost of the cart in decimal format (representing dollars).
+            PricedCart: The priced cart, shipping included.
         """
-        return sum(
-            int(item['price_cents']) * int(item['quantity']) for item in self.cart.values()
-        ) / 100
+        if self._priced is None:
+            self._priced = PricedCart.from_variations(self.cart, load_variations(self.cart))
+        return self._priced
     
-    def __iter__(self):
+    def lines(self):
         """
-        Iterates over the items in the cart and retrieves additional product information.
+        Returns the enriched cart lines, as dicts for templates.
 
-        This method enriches the cart items with product details such as the image URL, product slug,
-        and calculates the total price for each item.
+        Returns:
+            list: One dict per line with product details (name, price, total, etc.).
+        """
+        return [
+            {
+                'id': line.variation.id,
+                'quantity': line.quantity,
+                'price_cents': line.unit_price_cents,
+                'list_price_cents': line.list_price_cents,
+                'price': line.unit_price,
+                'image_url': image_url(line.variation.image_resource, "cart") or None,
+                'image_srcset': image_srcset(line.variation.image_resource, "cart"),
+                'product_slug': line.variation.product.slug,
+                'slug': line.variation.slug,
+                'name': line.variation.product.name,
+                'total_cents': line.total_cents,
+                'total': line.total,
+                'variation': line.variation,
+            }
+            for line in self.priced().lines
+        ]
+
+    def __iter__(self):
+        """
+        Iterates over the enriched items in the cart.
 
         Yields:
             dict: Each item in the cart with additional information (name, price, total, etc.).
         """
-        ids = self.cart.keys()
-        product_variations = ProductVariation.objects.filter(id__in=ids)
-        
-        for variation in product_variations:
-            self.cart[str(variation.id)]['id'] = variation.id
-            self.cart[str(variation.id)]['quantity'] = self.cart[str(variation.id)]['quantity']
-            self.cart[str(variation.id)]['image_url'] = variation.image
-            self.cart[str(variation.id)]['product_slug'] = variation.product.slug
-            self.cart[str(variation.id)]['slug'] = variation.slug
-            self.cart[str(variation.id)]['name'] = variation.product.name
-            self.cart[str(variation.id)]['total'] = (variation.price_cents * self.cart[str(variation.id)]['quantity']) / 100
-        
-        for item in self.cart.values():
-            item['price'] = item['price_cents'] / 100
-            yield item
+        yield from self.lines()
+
+
+def get_cart(request):
+    """
+    Returns the cart for this request, creating it on first use.
+
+    The same `Cart` instance (and therefore the same line snapshot) is reused
+    by every view, template and context processor handling the request.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing the session.
+
+    Returns:
+        Cart: The request's cart.
+    """
+    if not hasattr(request, "_cart"):
+        request._cart = Cart(request)
+    return request._cart
@@ -1,14 +1,17 @@
-from cart.cart import Cart
+from django.utils.functional import SimpleLazyObject
+from cart.cart import get_cart
 
 def cart(request):
     """
-    Retrieves the current cart object and returns it as part of the context.
+    Returns the current cart as part of the context.
+
+    The cart is wrapped in a lazy object so the session is only read when a
+    template actually uses it.
 
     Args:
         request (HttpRequest): The HTTP request object containing the session.
 
     Returns:
-        dict: A dictionary containing the cart object.
+        dict: A dictionary containing the (lazy) cart object.
     """
-    cart = Cart(request)
-    return {"cart": cart}
\ No newline at end of file
+    return {"cart": SimpleLazyObject(lambda: get_cart(request))}
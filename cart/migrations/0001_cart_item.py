@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-17 08:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('store', '0006_unique_featured_variation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('price_cents', models.PositiveIntegerField()),
+                ('quantity', models.PositiveIntegerField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_items', to=settings.AUTH_USER_MODEL)),
+                ('variation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='store.productvariation')),
+            ],
+            options={
+                'verbose_name': 'cart item',
+                'verbose_name_plural': 'cart items',
+                'constraints': [models.UniqueConstraint(fields=('user', 'variation'), name='unique_cart_item')],
+            },
+        ),
+    ]
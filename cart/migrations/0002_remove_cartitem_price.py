@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-17 08:25
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0001_cart_item'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='cartitem',
+            name='price_cents',
+        ),
+    ]
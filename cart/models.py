@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.db import models
+from store.models import TimeStampedModel, ProductVariation
+
+User = get_user_model()
+
+
+class CartItem(TimeStampedModel):
+    """
+    One line of the persistent cart of a signed-in user.
+
+    Written by `cart.storage.DatabaseCartStorage`, one row per variation, so
+    a cart change inserts, updates or deletes a single row.
+
+    Attributes:
+        user (ForeignKey): The owner of the cart.
+        variation (ForeignKey): The product variation in the cart.
+        quantity (PositiveIntegerField): The number of units.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="cart_items")
+    variation = models.ForeignKey(ProductVariation, on_delete=models.CASCADE, related_name="+")
+    quantity = models.PositiveIntegerField()
+
+    class Meta:
+        verbose_name = "cart item"
+        verbose_name_plural = "cart items"
+        constraints = [
+            models.UniqueConstraint(fields=["user", "variation"], name="unique_cart_item"),
+        ]
+
+    def __str__(self):
+        """
+        Returns a string representation of the cart line.
+        """
+        return f"{self.quantity} x {self.variation_id} for {self.user_id}"
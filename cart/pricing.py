@@ -0,0 +1,196 @@
+from dataclasses import dataclass
+
+from django.conf import settings
+
+from helpers import image_url
+
+from store.models import ProductVariation
+
+
+@dataclass(frozen=True)
+class PricedLine:
+    """
+    One priced line of a cart or order.
+
+    Attributes:
+        variation (ProductVariation): The variation, with its product loaded.
+        quantity (int): The number of units.
+        list_price_cents (int): The unit price before discount.
+        unit_price_cents (int): The unit price after discount, as given by
+            `ProductVariation.final_price_cents`.
+    """
+    variation: ProductVariation
+    quantity: int
+    list_price_cents: int
+    unit_price_cents: int
+
+    @property
+    def total_cents(self):
+        return self.unit_price_cents * self.quantity
+
+    @property
+    def discount_cents(self):
+        return (self.list_price_cents - self.unit_price_cents) * self.quantity
+
+    @property
+    def unit_price(self):
+        return self.unit_price_cents / 100
+
+    @property
+    def total(self):
+        return self.total_cents / 100
+
+
+@dataclass(frozen=True)
+class PricedCart:
+    """
+    A cart or order priced in one pass, in integer cents.
+
+    Built by `price_cart` (or `PricedCart.from_order` for an order already
+    placed) and shared by the cart page, the checkout and the Stripe session,
+    so every total shown or charged comes from the same numbers.
+
+    Attributes:
+        lines (tuple): The `PricedLine` of each line.
+        shipping_cents (int): The shipping fee.
+    """
+    lines: tuple
+    shipping_cents: int
+
+    @property
+    def count(self):
+        return sum(line.quantity for line in self.lines)
+
+    @property
+    def subtotal_cents(self):
+        return sum(line.total_cents for line in self.lines)
+
+    @property
+    def discount_cents(self):
+        return sum(line.discount_cents for line in self.lines)
+
+    @property
+    def total_cents(self):
+        return self.subtotal_cents + self.shipping_cents
+
+    @property
+    def subtotal(self):
+        return self.subtotal_cents / 100
+
+    @property
+    def shipping(self):
+        return self.shipping_cents / 100
+
+    @property
+    def total(self):
+        return self.total_cents / 100
+
+    @classmethod
+    def from_variations(cls, quantities, variations, shipping_cents=None):
+        """
+        Price lines from variations that are already loaded.
+
+        Args:
+            quantities (dict): Quantity of each variation, keyed by variation id
+                (as a string or an int), in display order.
+            variations (dict): The loaded variations, keyed by id. Lines whose
+                variation is missing are dropped.
+            shipping_cents (int, optional): The shipping fee. Defaults to
+                `settings.SHIPPING_FEE_CENTS`, or zero for an empty cart.
+        """
+        lines = []
+        for id, quantity in quantities.items():
+            variation = variations.get(int(id))
+            if variation is None or quantity <= 0:
+                continue
+            lines.append(PricedLine(
+                variation=variation,
+                quantity=int(quantity),
+                list_price_cents=variation.price_cents or 0,
+                unit_price_cents=variation.final_price_cents,
+            ))
+        if shipping_cents is None:
+            shipping_cents = settings.SHIPPING_FEE_CENTS if lines else 0
+        return cls(lines=tuple(lines), shipping_cents=shipping_cents)
+
+    @classmethod
+    def from_order(cls, order):
+        """
+        Price an order from the unit prices recorded on its items.
+
+        Items and their variations and products are loaded in one query; the
+        shipping fee is what the order total holds beyond its items.
+        """
+        items = order.items.select_related("product__product").order_by("id")
+        lines = tuple(
+            PricedLine(
+                variation=item.product,
+                quantity=item.quantity,
+                list_price_cents=item.product.price_cents or 0,
+                unit_price_cents=item.unit_price_cents,
+            )
+            for item in items
+        )
+        return cls(lines=lines, shipping_cents=order.total_cents - sum(line.total_cents for line in lines))
+
+    def stripe_line_items(self, currency="usd"):
+        """
+        Returns:
+            list: The Stripe Checkout `line_items` charging this cart,
+            shipping included.
+        """
+        line_items = [
+            {
+                "price_data": {
+                    "currency": currency,
+                    "product_data": {
+                        "name": line.variation.product.name,
+                        "images": [image_url(line.variation.image_resource, "stripe")]
+                        if line.variation.image_resource else [],
+                    },
+                    "unit_amount": line.unit_price_cents,
+                },
+                "quantity": line.quantity,
+            }
+            for line in self.lines
+        ]
+        if self.shipping_cents:
+            line_items.append({
+                "price_data": {
+                    "currency": currency,
+                    "product_data": {"name": "Shipping Fee", "description": "Standard delivery"},
+                    "unit_amount": self.shipping_cents,
+                },
+                "quantity": 1,
+            })
+        return line_items
+
+
+def load_variations(ids):
+    """
+    Fetch the variations of a cart, with their products, in one query.
+
+    Args:
+        ids (iterable): Variation ids, as integers or strings.
+
+    Returns:
+        dict: The `ProductVariation` of each id found, keyed by id.
+    """
+    return ProductVariation.objects.filter(
+        id__in=[int(id) for id in ids]
+    ).select_related("product").in_bulk()
+
+
+def price_cart(quantities, shipping_cents=None):
+    """
+    Price a whole cart with a single query.
+
+    Args:
+        quantities (dict): Quantity of each variation, keyed by variation id.
+        shipping_cents (int, optional): The shipping fee. Defaults to
+            `settings.SHIPPING_FEE_CENTS`.
+
+    Returns:
+        PricedCart: The priced cart.
+    """
+    return PricedCart.from_variations(quantities, load_variations(quantities), shipping_cents)
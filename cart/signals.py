@@ -0,0 +1,58 @@
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+
+from cart.storage import get_cart_storage
+from store.models import ProductVariation
+
+
+def merge_lines(lines, incoming, stock):
+    """
+    Merge two sets of cart lines.
+
+    Quantities of a variation present in both are added up, and every
+    quantity is capped to the stock available.
+
+    Args:
+        lines (dict): The lines of the existing cart.
+        incoming (dict): The lines merged into it.
+        stock (dict): Variation id mapped to its stock. Variations missing
+            from it no longer exist and are dropped.
+
+    Returns:
+        dict: The lines that changed, to be written back.
+    """
+    changed = {}
+    for id, quantity in incoming.items():
+        available = stock.get(int(id))
+        if available is None:
+            continue
+        merged = min(quantity + lines.get(id, 0), available)
+        if merged > 0 and merged != lines.get(id):
+            changed[id] = merged
+    return changed
+
+
+@receiver(user_logged_in, dispatch_uid="cart.merge_anonymous_cart")
+def merge_anonymous_cart(sender, request, user, **kwargs):
+    """
+    Move the anonymous cart of a visitor into their persistent cart on login.
+
+    The stock of every incoming variation is read in one query and the
+    changed lines are written in one `merge` call (a single upsert for the
+    database storage), then the anonymous cart is dropped.
+    """
+    if request is None or not hasattr(request, "session"):
+        return
+    anonymous = get_cart_storage(request)
+    persistent = get_cart_storage(request, user)
+    if anonymous.location == persistent.location:
+        return
+    incoming = anonymous.load()
+    if incoming:
+        stock = dict(
+            ProductVariation.objects.filter(id__in=[int(id) for id in incoming]).values_list("id", "stock")
+        )
+        persistent.merge(merge_lines(persistent.load(), incoming, stock))
+        anonymous.clear()
+    # A cart already built for this request belongs to the anonymous visitor
+    request.__dict__.pop("_cart", None)
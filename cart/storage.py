@@ -0,0 +1,307 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+# Version of the cart encoding written by `encode_lines`
+CART_FORMAT_VERSION = 2
+
+
+def encode_lines(lines):
+    """
+    Encode cart lines for the session or the cache.
+
+    Only the variation ids and quantities are kept, as
+    `{"v": 2, "items": {"<id>": <quantity>}}`. Prices, names and images are
+    loaded from the database when the cart is displayed.
+    """
+    return {"v": CART_FORMAT_VERSION, "items": lines}
+
+
+def decode_lines(data):
+    """
+    Decode cart lines written by `encode_lines` or by an older version.
+
+    Version 1 carts are a dict per line keyed by variation id, holding the
+    `id`, `price_cents` and `quantity` of the line (and, for some, the
+    display fields added while rendering the cart); only the quantities are
+    kept.
+
+    Returns:
+        dict: The quantity of each variation, keyed by variation id as a string.
+    """
+    if not data:
+        return {}
+    if data.get("v") == CART_FORMAT_VERSION:
+        return {id: int(quantity) for id, quantity in data["items"].items()}
+    return {
+        id: int(item["quantity"])
+        for id, item in data.items()
+        if isinstance(item, dict) and "quantity" in item
+    }
+
+
+class BaseCartStorage:
+    """
+    Interface of the backends a `Cart` keeps its lines in.
+
+    Lines map the variation id, as a string, to its quantity. Mutations are
+    made one line at a time through `save_line` and `delete_line`, so
+    backends that can write a single row never rewrite the whole cart.
+
+    Args:
+        request (HttpRequest): The current request.
+        user (User, optional): The owner of the cart, or None for the anonymous
+            cart of the request's session.
+    """
+
+    def __init__(self, request, user=None):
+        self.request = request
+        self.user = user
+
+    @property
+    def location(self):
+        """
+        Where the cart is kept. Two storages with the same location share
+        their lines, so the login merge skips them.
+        """
+        raise NotImplementedError
+
+    def load(self):
+        """
+        Returns:
+            dict: The lines of the cart.
+        """
+        raise NotImplementedError
+
+    def save_line(self, id, quantity):
+        """
+        Insert or update one line.
+        """
+        raise NotImplementedError
+
+    def delete_line(self, id):
+        """
+        Remove one line.
+        """
+        self.delete_lines([id])
+
+    def delete_lines(self, ids):
+        """
+        Remove several lines.
+        """
+        raise NotImplementedError
+
+    def save(self, lines):
+        """
+        Replace every line of the cart.
+        """
+        self.clear()
+        self.merge(lines)
+
+    def clear(self):
+        """
+        Remove every line.
+        """
+        raise NotImplementedError
+
+    def merge(self, lines):
+        """
+        Insert or update several lines, replacing the existing ones.
+
+        Args:
+            lines (dict): The lines to write.
+        """
+        for id, quantity in lines.items():
+            self.save_line(id, quantity)
+
+
+class SessionCartStorage(BaseCartStorage):
+    """
+    Keeps the cart in the session under `"cart"`, encoded by `encode_lines`.
+
+    Every mutation rewrites the session, so this backend suits anonymous
+    visitors whose session holds little else. The session is only written
+    once a line is added, or once to upgrade a cart in an older format.
+    """
+    lines = None
+
+    @property
+    def location(self):
+        return ("session", self.request.session.session_key)
+
+    def load(self):
+        data = self.request.session.get("cart")
+        self.lines = decode_lines(data)
+        if data and data.get("v") != CART_FORMAT_VERSION:
+            self.save(self.lines)
+        return self.lines
+
+    def save_line(self, id, quantity):
+        self.lines[id] = quantity
+        self.save(self.lines)
+
+    def delete_lines(self, ids):
+        for id in ids:
+            self.lines.pop(id, None)
+        self.save(self.lines)
+
+    def save(self, lines):
+        self.lines = lines
+        self.request.session["cart"] = encode_lines(lines)
+        self.request.session.modified = True
+
+    def clear(self):
+        self.lines = {}
+        self.request.session.pop("cart", None)
+        self.request.session.modified = True
+
+    def merge(self, lines):
+        if self.lines is None:
+            self.load()
+        self.lines.update(lines)
+        self.save(self.lines)
+
+
+class DatabaseCartStorage(BaseCartStorage):
+    """
+    Keeps the cart of a signed-in user in the `CartItem` table.
+
+    Each mutation is a single `INSERT ... ON CONFLICT DO UPDATE` or `DELETE`
+    of one row, and the cart follows the user across devices and sessions.
+
+    Raises:
+        ValueError: If the cart has no user.
+    """
+
+    def __init__(self, request, user=None):
+        if user is None:
+            raise ValueError("DatabaseCartStorage needs a signed-in user.")
+        super().__init__(request, user)
+
+    @property
+    def location(self):
+        return ("database", self.user.pk)
+
+    def _items(self):
+        from cart.models import CartItem
+
+        return CartItem.objects.filter(user=self.user)
+
+    def load(self):
+        return {
+            str(variation_id): quantity
+            for variation_id, quantity in self._items()
+            .order_by("created", "id")
+            .values_list("variation_id", "quantity")
+        }
+
+    def save_line(self, id, quantity):
+        self.merge({id: quantity})
+
+    def delete_lines(self, ids):
+        self._items().filter(variation_id__in=[int(id) for id in ids]).delete()
+
+    def clear(self):
+        self._items().delete()
+
+    def merge(self, lines):
+        from cart.models import CartItem
+
+        if not lines:
+            return
+        CartItem.objects.bulk_create(
+            [
+                CartItem(user=self.user, variation_id=int(id), quantity=quantity)
+                for id, quantity in lines.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["user", "variation"],
+            update_fields=["quantity", "updated"],
+        )
+
+
+class CacheCartStorage(BaseCartStorage):
+    """
+    Keeps the cart in the `settings.CART_CACHE_ALIAS` cache (e.g. Redis).
+
+    Signed-in users are keyed by their id; anonymous visitors by a random
+    token kept in their session, which survives the key rotation of a login.
+    The lines are stored as one small entry per cart, encoded by
+    `encode_lines`, so a mutation writes a few dozen bytes instead of the
+    whole session. Entries expire after
+    `settings.CART_CACHE_TIMEOUT` seconds of inactivity.
+    """
+    lines = None
+
+    @property
+    def cache(self):
+        return caches[settings.CART_CACHE_ALIAS]
+
+    @property
+    def location(self):
+        return ("cache", self._key(create=False))
+
+    def _key(self, create=True):
+        if self.user is not None:
+            return f"cart:user:{self.user.pk}"
+        token = self.request.session.get("cart_token")
+        if token is None and create:
+            token = self.request.session["cart_token"] = uuid.uuid4().hex
+        return token and f"cart:anonymous:{token}"
+
+    def load(self):
+        key = self._key(create=False)
+        self.lines = decode_lines(self.cache.get(key) if key else None)
+        return self.lines
+
+    def save_line(self, id, quantity):
+        self.lines[id] = quantity
+        self.save(self.lines)
+
+    def delete_lines(self, ids):
+        for id in ids:
+            self.lines.pop(id, None)
+        self.save(self.lines)
+
+    def save(self, lines):
+        self.lines = lines
+        self.cache.set(self._key(), encode_lines(lines), settings.CART_CACHE_TIMEOUT)
+
+    def clear(self):
+        self.lines = {}
+        key = self._key(create=False)
+        if key:
+            self.cache.delete(key)
+
+    def merge(self, lines):
+        if self.lines is None:
+            self.load()
+        self.lines.update(lines)
+        self.save(self.lines)
+
+
+def get_cart_storage(request, user=None):
+    """
+    Build the storage of a cart.
+
+    Args:
+        request (HttpRequest): The current request.
+        user (User, optional): The owner of the cart; None for the anonymous
+            cart of the session.
+
+    Returns:
+        BaseCartStorage: A `settings.CART_USER_STORAGE` for users, a
+        `settings.CART_ANONYMOUS_STORAGE` otherwise.
+    """
+    path = settings.CART_USER_STORAGE if user is not None else settings.CART_ANONYMOUS_STORAGE
+    return import_string(path)(request, user)
+
+
+def get_request_cart_storage(request):
+    """
+    Build the storage of the cart of the current visitor.
+    """
+    user = getattr(request, "user", None)
+    return get_cart_storage(request, user if user is not None and user.is_authenticated else None)
@@ -0,0 +1,100 @@
+import json
+
+import pytest
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from cart import views
+from cart.cart import Cart
+from helpers.ratelimit import RateLimit
+from store.tests.factories import ProductVariationFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def post_operations(client, *operations):
+    return client.post(
+        reverse("cart-api"), json.dumps({"operations": list(operations)}), content_type="application/json"
+    )
+
+
+def test_batch_sets_quantities_and_returns_the_summary(client):
+    first = ProductVariationFactory(stock=5, price_cents=1000, discount=10)
+    second = ProductVariationFactory(stock=5, price_cents=250, discount=0)
+
+    response = post_operations(
+        client,
+        {"variation_id": first.id, "quantity": 2},
+        {"variation_id": second.id, "quantity": 1},
+        {"variation_id": second.id, "quantity": 2, "mode": "add"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["count"] == 5
+    assert response.json()["subtotal_cents"] == 2 * 900 + 3 * 250
+    assert response.json()["total_cents"] == 2 * 900 + 3 * 250 + settings.SHIPPING_FEE_CENTS
+    assert Cart(client).cart[str(second.id)] == 3
+
+
+def test_zero_quantity_removes_the_line(client):
+    variation = ProductVariationFactory(stock=5)
+    post_operations(client, {"variation_id": variation.id, "quantity": 2})
+
+    response = post_operations(client, {"variation_id": variation.id, "quantity": 0})
+
+    assert response.json() == {
+        "count": 0, "subtotal_cents": 0, "shipping_cents": 0, "total_cents": 0, "lines": []
+    }
+
+
+def test_batch_is_rejected_as_a_whole_when_stock_is_short(client):
+    available = ProductVariationFactory(stock=5)
+    short = ProductVariationFactory(stock=1)
+
+    response = post_operations(
+        client,
+        {"variation_id": available.id, "quantity": 2},
+        {"variation_id": short.id, "quantity": 2},
+        {"variation_id": 9999, "quantity": 1},
+    )
+
+    assert response.status_code == 400
+    assert set(response.json()["errors"]) == {str(short.id), "9999"}
+    assert response.json()["cart"]["count"] == 0
+
+
+def test_stock_is_checked_with_one_query(client):
+    variations = [ProductVariationFactory(stock=5) for _ in range(10)]
+    operations = [{"variation_id": variation.id, "quantity": 1} for variation in variations]
+
+    with CaptureQueriesContext(connection) as context:
+        post_operations(client, *operations)
+
+    assert sum("store_productvariation" in query["sql"] for query in context.captured_queries) == 1
+
+
+@pytest.mark.parametrize("body", [
+    "not json",
+    json.dumps({"operations": []}),
+    json.dumps({"operations": [{"variation_id": "1", "quantity": 1}]}),
+    json.dumps({"operations": [{"variation_id": 1, "quantity": -1}]}),
+    json.dumps({"operations": [{"variation_id": 1, "quantity": 1, "mode": "double"}]}),
+])
+def test_malformed_batches_are_rejected(client, body):
+    response = client.post(reverse("cart-api"), body, content_type="application/json")
+
+    assert response.status_code == 400
+    assert "operations" in response.json()["errors"]
+
+
+def test_throttled_requests_get_a_json_429(client, monkeypatch):
+    monkeypatch.setattr(views.CartApiView, "rate_limits", (RateLimit("cart-test", capacity=1, period=60),))
+
+    assert client.get(reverse("cart-api")).status_code == 200
+    response = client.get(reverse("cart-api"))
+
+    assert response.status_code == 429
+    assert response.json() == {"errors": {"request": ["Too many requests"]}}
+    assert response["Retry-After"] == "60"
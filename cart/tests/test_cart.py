@@ -3,7 +3,7 @@ from django.test import RequestFactory
 from django.contrib.sessions.middleware import SessionMiddleware
 from django.http import Http404
 from django.core.exceptions import ValidationError
-from cart.cart import Cart
+from cart.cart import Cart, get_cart
 from store.models import ProductVariation
 from store.tests.factories import ProductVariationFactory
 
@@ -27,18 +27,31 @@ def product_variation():
 @pytest.mark.django_db
 def test_cart_initialization_empty(cart):
     assert cart.cart == {}
-    assert cart.session.get('cart') == {}
+    assert 'cart' not in cart.session
 
 @pytest.mark.django_db
 def test_cart_initialization_existing_cart(cart, product_variation, request_factory):
+    cart.session['cart'] = {'v': 2, 'items': {str(product_variation.id): 2}}
+    cart.session.modified = True
+    new_request = request_factory.get('/')
+    new_request.session = cart.session
+    new_cart = Cart(new_request)
+    assert new_cart.cart == {str(product_variation.id): 2}
+
+@pytest.mark.django_db
+def test_legacy_cart_is_migrated(cart, product_variation, request_factory):
     cart.session['cart'] = {
-        str(product_variation.id): {'id': product_variation.id, 'quantity': 2, 'price_cents': 1000}
+        str(product_variation.id): {
+            'id': product_variation.id, 'quantity': 2, 'price_cents': 1000,
+            'name': 'Enriched while rendering', 'total': 20.0,
+        }
     }
-    cart.session.modified = True
     new_request = request_factory.get('/')
     new_request.session = cart.session
     new_cart = Cart(new_request)
-    assert new_cart.cart == cart.session['cart']
+    assert new_cart.cart == {str(product_variation.id): 2}
+    assert cart.session['cart'] == {'v': 2, 'items': {str(product_variation.id): 2}}
+    assert new_cart.get_total_cost() == product_variation.final_price_cents * 2 / 100
 
 @pytest.mark.django_db
 def test_save_marks_session_modified(cart):
@@ -47,10 +60,7 @@ def test_save_marks_session_modified(cart):
 
 @pytest.mark.django_db
 def test_clear_removes_cart(cart, product_variation):
-    cart.cart = {
-        str(product_variation.id): {'id': product_variation.id, 'quantity': 2, 'price_cents': 1000}
-    }
-    cart.session['cart'] = cart.cart
+    cart.add(product_variation.id, quantity=2, update_quantity=True)
     cart.clear()
     assert cart.cart == {}
     assert 'cart' not in cart.session
@@ -60,23 +70,19 @@ def test_clear_removes_cart(cart, product_variation):
 def test_add_new_product(cart, product_variation):
     cart.add(product_variation.id, quantity=2, update_quantity=True)
     assert str(product_variation.id) in cart.cart
-    assert cart.cart[str(product_variation.id)] == {
-        'id': product_variation.id,
-        'price_cents': int(product_variation.price_cents),
-        'quantity': 2
-    }
+    assert cart.cart[str(product_variation.id)] == 2
 
 @pytest.mark.django_db
 def test_add_existing_product_without_update(cart, product_variation):
     cart.add(product_variation.id, quantity=2, update_quantity=True)
     cart.add(product_variation.id, quantity=3, update_quantity=False)
-    assert cart.cart[str(product_variation.id)]['quantity'] == 5
+    assert cart.cart[str(product_variation.id)] == 5
 
 @pytest.mark.django_db
 def test_add_existing_product_with_update(cart, product_variation):
     cart.add(product_variation.id, quantity=2, update_quantity=True)
     cart.add(product_variation.id, quantity=3, update_quantity=True)
-    assert cart.cart[str(product_variation.id)]['quantity'] == 3
+    assert cart.cart[str(product_variation.id)] == 3
 
 @pytest.mark.django_db
 def test_add_zero_quantity_removes_product(cart, product_variation):
@@ -95,6 +101,12 @@ def test_add_exceeds_stock(cart):
     with pytest.raises(ValidationError):
         cart.add(variation.id, quantity=5, update_quantity=True)
 
+@pytest.mark.django_db
+def test_add_attaches_cart_to_session(cart, product_variation):
+    cart.add(product_variation.id, quantity=1, update_quantity=True)
+    assert cart.session['cart'] == {'v': 2, 'items': cart.cart}
+    assert cart.session.modified is True
+
 @pytest.mark.django_db
 def test_remove_product(cart, product_variation):
     cart.add(product_variation.id, quantity=2, update_quantity=True)
@@ -104,7 +116,7 @@ def test_remove_product(cart, product_variation):
 @pytest.mark.django_db
 def test_remove_non_existent_product(cart):
     cart.remove(id=9999)  # Should not raise
-    assert cart.session.modified is True
+    assert 'cart' not in cart.session
 
 @pytest.mark.django_db
 def test_len_empty_cart(cart):
@@ -124,7 +136,7 @@ def test_get_total_cost_empty_cart(cart):
 @pytest.mark.django_db
 def test_get_total_cost_non_empty_cart(cart, product_variation):
     cart.add(product_variation.id, quantity=2, update_quantity=True)
-    expected_total = (product_variation.price_cents * 2) / 100
+    expected_total = (product_variation.final_price_cents * 2) / 100
     assert cart.get_total_cost() == expected_total
 
 @pytest.mark.django_db
@@ -139,12 +151,12 @@ def test_iter_non_empty_cart(cart, product_variation):
     item = items[0]
     assert item['id'] == product_variation.id
     assert item['quantity'] == 2
-    assert item['price'] == product_variation.price_cents / 100
+    assert item['price'] == product_variation.final_price_cents / 100
     assert item['image_url'] == (product_variation.image or None)
     assert item['product_slug'] == product_variation.product.slug
     assert item['slug'] == product_variation.slug
     assert item['name'] == product_variation.product.name
-    assert item['total'] == (product_variation.price_cents * 2) / 100
+    assert item['total'] == (product_variation.final_price_cents * 2) / 100
 
 @pytest.mark.django_db
 def test_iter_multiple_products(cart, product_variation):
@@ -156,3 +168,40 @@ def test_iter_multiple_products(cart, product_variation):
     assert len(items) == 2
     item_ids = {item['id'] for item in items}
     assert item_ids == {variation1.id, variation2.id}
+
+@pytest.mark.django_db
+def test_iter_uses_one_query_and_keeps_session_compact(cart, django_assert_num_queries):
+    variations = [ProductVariationFactory(stock=5) for _ in range(3)]
+    for variation in variations:
+        cart.add(variation.id, quantity=1, update_quantity=True)
+
+    with django_assert_num_queries(1):
+        items = list(cart)
+        names = [item['name'] for item in items]
+        images = [item['image_url'] for item in items]
+        assert list(cart) == items
+        cart.get_total_cost()
+    assert names == [variation.product.name for variation in variations]
+    assert cart.session['cart'] == {'v': 2, 'items': {str(variation.id): 1 for variation in variations}}
+
+@pytest.mark.django_db
+def test_get_cart_is_shared_per_request(request_factory):
+    request = request_factory.get('/')
+    SessionMiddleware(lambda x: None).process_request(request)
+    assert get_cart(request) is get_cart(request)
+
+def test_compact_encoding_is_an_order_of_magnitude_smaller():
+    import json
+    from cart.storage import encode_lines
+
+    legacy = {
+        str(id): {
+            'id': id, 'price_cents': 12900, 'quantity': 2, 'price': 129.0, 'total': 258.0,
+            'image_url': 'https://res.cloudinary.com/demo/image/upload/v1/products/shirt.jpg',
+            'product_slug': 'classic-cotton-shirt', 'slug': f'classic-cotton-shirt-{id}',
+            'name': 'Classic Cotton Shirt',
+        }
+        for id in range(100, 110)
+    }
+    compact = encode_lines({id: item['quantity'] for id, item in legacy.items()})
+    assert len(json.dumps(compact)) * 10 <= len(json.dumps(legacy))
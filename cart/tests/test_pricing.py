@@ -0,0 +1,55 @@
+import pytest
+from django.conf import settings
+
+from cart.pricing import PricedCart, price_cart
+from orders.tests.factories import OrderFactory, OrderItemFactory
+from store.tests.factories import ProductFactory, ProductVariationFactory, SizeFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def test_cart_is_priced_in_integer_cents():
+    first = ProductVariationFactory(price_cents=999, discount=15)
+    second = ProductVariationFactory(price_cents=250, discount=0)
+
+    priced = price_cart({str(first.id): 3, str(second.id): 2})
+
+    # 999 * 0.85 = 849.15, rounded to 849 cents a unit
+    assert [line.unit_price_cents for line in priced.lines] == [849, 250]
+    assert priced.subtotal_cents == 3 * 849 + 2 * 250
+    assert priced.discount_cents == 3 * (999 - 849)
+    assert priced.total_cents == priced.subtotal_cents + settings.SHIPPING_FEE_CENTS
+    assert priced.count == 5
+
+
+def test_empty_and_missing_lines_are_not_charged():
+    priced = price_cart({"9999": 2})
+
+    assert priced.lines == ()
+    assert priced.total_cents == 0
+
+
+def test_stripe_line_items_charge_the_order_total():
+    order = OrderFactory(total_cents=2 * 900 + settings.SHIPPING_FEE_CENTS)
+    OrderItemFactory(order=order, quantity=2, unit_price_cents=900, total_cents=1800)
+
+    line_items = PricedCart.from_order(order).stripe_line_items()
+
+    assert sum(item["price_data"]["unit_amount"] * item["quantity"] for item in line_items) == order.total_cents
+    assert line_items[-1]["price_data"]["unit_amount"] == settings.SHIPPING_FEE_CENTS
+
+
+def test_benchmark_pricing_a_100_line_cart(django_assert_num_queries):
+    product = ProductFactory()
+    variations = [
+        ProductVariationFactory(product=product, size=SizeFactory(), price_cents=1000 + i, discount=i % 20)
+        for i in range(100)
+    ]
+    quantities = {str(variation.id): 1 + i % 3 for i, variation in enumerate(variations)}
+
+    with django_assert_num_queries(1):
+        priced = price_cart(quantities)
+        priced.total_cents
+        priced.stripe_line_items()
+
+    assert len(priced.lines) == 100
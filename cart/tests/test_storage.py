@@ -0,0 +1,100 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.urls import reverse
+
+from cart.cart import Cart
+from cart.models import CartItem
+from cart.storage import CacheCartStorage, DatabaseCartStorage, SessionCartStorage
+from store.tests.factories import ProductVariationFactory
+from users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def make_request(rf):
+    def make(user=None):
+        request = rf.get("/")
+        SessionMiddleware(lambda x: None).process_request(request)
+        request.user = user or AnonymousUser()
+        return request
+    return make
+
+
+@pytest.mark.parametrize("storage_class", [SessionCartStorage, CacheCartStorage, DatabaseCartStorage])
+def test_storages_round_trip_lines(make_request, storage_class):
+    user = UserFactory()
+    first, second = ProductVariationFactory(stock=5), ProductVariationFactory(stock=5)
+    request = make_request(user)
+    storage = storage_class(request, user)
+    storage.load()
+
+    storage.save_line(str(first.id), 1)
+    storage.save_line(str(second.id), 2)
+    storage.save_line(str(first.id), 3)
+    storage.delete_line(str(second.id))
+
+    assert storage_class(request, user).load() == {str(first.id): 3}
+    storage.clear()
+    assert storage_class(request, user).load() == {}
+
+
+def test_user_cart_mutations_are_single_row_writes(make_request, django_assert_num_queries):
+    user = UserFactory()
+    variation = ProductVariationFactory(stock=5)
+    cart = Cart(make_request(user))
+    cart.add(variation.id, quantity=1, update_quantity=True)
+
+    # One query for the stock check, one upsert of the line
+    with django_assert_num_queries(2):
+        cart.add(variation.id, quantity=1)
+
+    assert CartItem.objects.get(user=user, variation=variation).quantity == 2
+    assert "cart" not in cart.session
+
+
+def test_user_cart_persists_across_sessions(make_request):
+    user = UserFactory()
+    variation = ProductVariationFactory(stock=5)
+    Cart(make_request(user)).add(variation.id, quantity=2, update_quantity=True)
+
+    assert len(Cart(make_request(user))) == 2
+
+
+def test_anonymous_cache_cart_survives_session_key_rotation(make_request, settings):
+    settings.CART_ANONYMOUS_STORAGE = "cart.storage.CacheCartStorage"
+    variation = ProductVariationFactory(stock=5)
+    request = make_request()
+    Cart(request).add(variation.id, quantity=2, update_quantity=True)
+
+    request.session.cycle_key()
+
+    assert len(Cart(request)) == 2
+    assert "cart" not in request.session
+
+
+def test_login_merges_the_anonymous_cart(client):
+    user = UserFactory(password="secret-password")
+    shared, anonymous_only = ProductVariationFactory(stock=3), ProductVariationFactory(stock=5)
+    CartItem.objects.create(user=user, variation=shared, quantity=2)
+    client.get(reverse("cart-add", args=[shared.slug]), {"quantity": 2})
+    client.get(reverse("cart-add", args=[anonymous_only.slug]), {"quantity": 1})
+
+    client.login(email=user.email, password="secret-password")
+
+    quantities = dict(CartItem.objects.filter(user=user).values_list("variation_id", "quantity"))
+    # Quantities add up, capped to the stock
+    assert quantities == {shared.id: 3, anonymous_only.id: 1}
+    assert "cart" not in client.session
+
+
+def test_login_merge_is_skipped_when_both_carts_share_the_session(client, settings):
+    settings.CART_USER_STORAGE = "cart.storage.SessionCartStorage"
+    user = UserFactory(password="secret-password")
+    variation = ProductVariationFactory(stock=5)
+    client.get(reverse("cart-add", args=[variation.slug]), {"quantity": 2})
+
+    client.login(email=user.email, password="secret-password")
+
+    assert client.session["cart"]["items"][str(variation.id)] == 2
@@ -1,4 +1,5 @@
 import pytest
+from django.conf import settings
 from django.test import RequestFactory, Client
 from django.urls import reverse
 from django.http import Http404
@@ -53,11 +54,7 @@ def test_cart_add_view_success(client, product_variation):
 
     cart = Cart(client)
     assert str(product_variation.id) in cart.cart
-    assert cart.cart[str(product_variation.id)] == {
-        'id': product_variation.id,
-        'price_cents': int(product_variation.price_cents),
-        'quantity': 2,
-    }
+    assert cart.cart[str(product_variation.id)] == 2
 
 @pytest.mark.django_db
 def test_cart_add_view_default_quantity(client, product_variation):
@@ -69,7 +66,7 @@ def test_cart_add_view_default_quantity(client, product_variation):
 
     cart = Cart(client)
     assert str(product_variation.id) in cart.cart
-    assert cart.cart[str(product_variation.id)]['quantity'] == 1
+    assert cart.cart[str(product_variation.id)] == 1
 
 
 @pytest.mark.django_db
@@ -79,6 +76,15 @@ def test_cart_add_view_non_existent_slug(client):
     response = client.get(url)
     assert response.status_code == 404
 
+@pytest.mark.django_db
+def test_cart_add_view_refuses_more_than_the_stock(client):
+    variation = ProductVariationFactory(stock=1)
+    url = reverse('cart-add', kwargs={'slug': variation.slug})
+    response = client.get(url, {'quantity': 2})
+    assert response.status_code == 302
+    assert response.url == variation.get_absolute_url()
+    assert Cart(client).cart == {}
+
 @pytest.mark.django_db
 def test_cart_reset_view_clears_cart(client, product_variation):
     client.session.flush()
@@ -102,6 +108,43 @@ def test_cart_update_view_non_existent_id(client):
     response = client.get(url)
     assert response.status_code == 404
 
+@pytest.mark.django_db
+def test_cart_update_view_decrements_below_a_fallen_stock(client):
+    variation = ProductVariationFactory(stock=10)
+    client.get(reverse('cart-add', kwargs={'slug': variation.slug}), {'quantity': 5})
+    ProductVariation.objects.filter(id=variation.id).update(stock=2)
+
+    response = client.get(reverse('cart-update', kwargs={'id': variation.id, 'action': 'decrement'}))
+
+    assert response.status_code == 302
+    assert Cart(client).cart == {str(variation.id): 4}
+
+
+@pytest.mark.django_db
+def test_cart_update_view_reports_stock_errors(client):
+    variation = ProductVariationFactory(stock=2)
+    client.get(reverse('cart-add', kwargs={'slug': variation.slug}), {'quantity': 2})
+
+    response = client.get(reverse('cart-update', kwargs={'id': variation.id, 'action': 'increment'}), follow=True)
+
+    assert response.redirect_chain[-1][0] == reverse('cart')
+    assert [str(message) for message in response.context['messages']] == ["This exceeds our stock"]
+    assert Cart(client).cart == {str(variation.id): 2}
+
+
+@pytest.mark.django_db
+def test_cart_update_view_reports_removed_variations(client):
+    variation = ProductVariationFactory(stock=2)
+    client.get(reverse('cart-add', kwargs={'slug': variation.slug}), {'quantity': 1})
+    url = reverse('cart-update', kwargs={'id': variation.id, 'action': 'increment'})
+    variation.delete()
+
+    response = client.get(url)
+
+    assert response.status_code == 302
+    assert response.url == reverse('cart')
+
+
 @pytest.mark.django_db
 def test_cart_update_view_invalid_action(client):
     client.session.flush()
@@ -112,3 +155,10 @@ def test_cart_update_view_invalid_action(client):
     url = reverse('cart-update', kwargs={'id': product_variation.id, 'action': 'invalid'})
     response = client.get(url)
     assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_browsing_with_empty_cart_does_not_create_session(client):
+    response = client.get(reverse('home'))
+    assert response.status_code == 200
+    assert settings.SESSION_COOKIE_NAME not in response.cookies
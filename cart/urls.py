@@ -1,5 +1,5 @@
 from django.urls import path
-from cart.views import (CartPageView, CartAddView, CartResetView,CartUpdateView)
+from cart.views import (CartPageView, CartAddView, CartResetView,CartUpdateView, CartApiView)
 
 
 
@@ -7,6 +7,7 @@ from cart.views import (CartPageView, CartAddView, CartResetView,CartUpdateView)
 urlpatterns = [
     path("<slug:slug>/add-to-cart/", CartAddView.as_view(), name="cart-add"),
     path("<int:id>/<str:action>/", CartUpdateView.as_view(), name="cart-update"),
+    path("api/", CartApiView.as_view(), name="cart-api"),
     path("reset/", CartResetView.as_view(), name="cart-reset"),
     path("", CartPageView.as_view(), name="cart"),
 ]
\ No newline at end of file
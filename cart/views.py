@@ -1,10 +1,24 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from store.models import Product, ProductVariation
-from cart.cart import Cart
+from cart.cart import get_cart
 from django.views.generic import TemplateView, View
 from store.forms import QuantityForm
+from django.contrib import messages
 from django.core.exceptions import ValidationError
-from django.http import Http404
+from django.http import Http404, JsonResponse
+from helpers.ratelimit import RateLimit, RateLimitMixin
+import json
+
+# Largest batch accepted by `CartApiView`
+MAX_BATCH_OPERATIONS = 50
+
+# Buckets shared by the cart views (all methods, GET endpoints included)
+CART_RATE_LIMITS = (
+    RateLimit("cart-ip", capacity=120, period=60, key=("ip",)),
+    RateLimit("cart-session", capacity=60, period=60, key=("session",)),
+)
+
+
 class CartPageView(TemplateView):
     """
     Renders the cart page displaying the contents of the cart.
@@ -12,26 +26,35 @@ class CartPageView(TemplateView):
     template_name = "cart.html"
 
 # View for adding a product variation to the cart
-class CartAddView(View):
+class CartAddView(RateLimitMixin, View):
     """
     Handles adding a product variation to the cart. 
     If the product variation exists in the cart, it updates the quantity.
     """
+    rate_limits = CART_RATE_LIMITS
+
     def get(self, request, slug):
         variation = get_object_or_404(ProductVariation, slug=slug)
-        cart = Cart(request)
+        cart = get_cart(request)
         quantity = 1  # Default quantity
         form = QuantityForm(request.GET)
         if form.is_valid():
             quantity = form.cleaned_data.get("quantity", 1)
-        cart.add(variation.id, quantity=quantity, update_quantity=True)
+        try:
+            cart.add(variation.id, quantity=quantity, update_quantity=True)
+        except ValidationError as error:
+            # Typically sold out since the page was rendered
+            messages.error(request, error.messages[0])
+            return redirect(variation.get_absolute_url())
         return redirect('cart')
 
 # View for resetting the cart (clearing all items)
-class CartResetView(View):
+class CartResetView(RateLimitMixin, View):
     """
     Clears all items in the cart and redirects to the cart page.
     """
+    rate_limits = CART_RATE_LIMITS
+
     def get(self, request):
         """
         Clears the cart and redirects to the cart page.
@@ -42,16 +65,18 @@ class CartResetView(View):
         Returns:
             HttpResponse: Redirects to the cart page.
         """
-        cart = Cart(request)
+        cart = get_cart(request)
         cart.clear()
         return redirect('cart')
 
 # View for updating the quantity of a product variation in the cart
-class CartUpdateView(View):
+class CartUpdateView(RateLimitMixin, View):
     """
     Handles updating the quantity of a product variation in the cart.
     It supports both incrementing and decrementing the quantity.
     """
+    rate_limits = CART_RATE_LIMITS
+
     def get(self, request, id, action):
         """
         Updates the quantity of a product variation in the cart.
@@ -64,22 +89,97 @@ class CartUpdateView(View):
         Returns:
             HttpResponse: Redirects to the cart page after updating the quantity.
         """
-        cart = Cart(request)
-        variation = get_object_or_404(ProductVariation, id=id)
+        cart = get_cart(request)
 
         # Check if the item exists in the cart
         if str(id) not in cart.cart:
             raise Http404("Product variation not found in cart")
-        quantity = int(cart.cart[str(id)]['quantity'])
-
-        if action == "increment":
-            if quantity + 1 > variation.stock:
-                raise ValidationError("This exceeds our stock")
-            cart.add(id, quantity=1)
-        elif action == "decrement":
-            cart.add(id, quantity=-1)
-        
-        else:
+        steps = {"increment": 1, "decrement": -1}
+        if action not in steps:
             raise Http404
 
-        return redirect('cart')
\ No newline at end of file
+        # One query loads the variation and checks its stock
+        try:
+            cart.update([{"variation_id": id, "quantity": steps[action], "mode": "add"}])
+        except ValidationError as error:
+            # Sold out or removed from the catalog since the page was rendered
+            for message in error.messages:
+                messages.error(request, message)
+
+        return redirect('cart')
+
+
+# JSON view applying a batch of cart changes
+class CartApiView(RateLimitMixin, View):
+    """
+    JSON endpoint applying a batch of cart changes in one request.
+
+    The body is `{"operations": [{"variation_id": 1, "quantity": 2}, ...]}`,
+    each operation optionally carrying `"mode": "add"` to add to the line
+    instead of replacing its quantity. Stock is checked for the whole batch
+    with one query and the updated cart summary is returned, so quick-add,
+    reorder and quantity steppers need no redirect or page render.
+    """
+    rate_limits = CART_RATE_LIMITS
+
+    def get(self, request):
+        """
+        Returns the cart summary.
+        """
+        return JsonResponse(get_cart(request).summary())
+
+    def post(self, request):
+        """
+        Applies the operations and returns the cart summary.
+
+        Args:
+            request (HttpRequest): The HTTP request with a JSON body.
+
+        Returns:
+            JsonResponse: The cart summary, or a 400 response with an `errors`
+            object (keyed by variation id for stock errors) and the unchanged
+            cart summary.
+        """
+        cart = get_cart(request)
+        try:
+            operations = self.parse_operations(request.body)
+        except ValueError as error:
+            return JsonResponse({"errors": {"operations": [str(error)]}, "cart": cart.summary()}, status=400)
+        try:
+            cart.update(operations)
+        except ValidationError as error:
+            return JsonResponse({"errors": error.message_dict, "cart": cart.summary()}, status=400)
+        return JsonResponse(cart.summary())
+
+    def rate_limited(self, request, retry_after):
+        """
+        Refuses a throttled request with a JSON 429 response.
+        """
+        response = super().rate_limited(request, retry_after)
+        throttled = JsonResponse({"errors": {"request": ["Too many requests"]}}, status=429)
+        throttled["Retry-After"] = response["Retry-After"]
+        return throttled
+
+    @staticmethod
+    def parse_operations(body):
+        """
+        Decodes and checks the shape of the operations of a request body.
+
+        Raises:
+            ValueError: If the body is not a valid batch.
+        """
+        try:
+            operations = json.loads(body)["operations"]
+        except (ValueError, TypeError, KeyError):
+            raise ValueError("Expected a JSON object with an operations list")
+        if not isinstance(operations, list) or not 0 < len(operations) <= MAX_BATCH_OPERATIONS:
+            raise ValueError(f"Expected between 1 and {MAX_BATCH_OPERATIONS} operations")
+        for operation in operations:
+            if not isinstance(operation, dict) or operation.get("mode", "set") not in ("set", "add"):
+                raise ValueError("Each operation needs a variation_id, a quantity and an optional mode")
+            variation_id, quantity = operation.get("variation_id"), operation.get("quantity")
+            if type(variation_id) is not int or type(quantity) is not int:
+                raise ValueError("variation_id and quantity must be integers")
+            if operation.get("mode", "set") == "set" and quantity < 0:
+                raise ValueError("quantity must not be negative")
+        return operations
@@ -28,6 +28,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'allauth',
     'allauth.account',
     'allauth.socialaccount.providers.facebook',
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
     'orders',
     'payments',
     'reviews',
+    'notifications',
 
 ]
 CITIES_LIGHT_TRANSLATION_LANGUAGES = ['en']  # English only
@@ -199,6 +201,11 @@ SOCIALACCOUNT_EMAIL_REQUIRED = True
 # stripe
 STRIPE_PUBLIC_KEY=config("STRIPE_PUBLIC_KEY")
 STRIPE_PRIVATE_KEY=config("STRIPE_PRIVATE_KEY")
+STRIPE_WEBHOOK_SECRET=config("STRIPE_WEBHOOK_SECRET", default="")
+
+# Stripe event worker (`manage.py process_stripe_events`)
+STRIPE_EVENT_MAX_ATTEMPTS = 5  # Attempts before an event is marked as failed
+STRIPE_EVENT_RETRY_BACKOFF = 30  # Seconds before the first retry, doubled after each failure
 
 
 # EMAIL 
@@ -209,6 +216,13 @@ EMAIL_USE_TLS = True  # Use TLS for security
 EMAIL_USE_SSL = False  # Do not use SSL (mutually exclusive with TLS)
 EMAIL_HOST_USER = config("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = config("EMAIL_HOST_PASSWORD")
+DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+
+# Outbox worker (`manage.py send_outbox`)
+OUTBOX_BATCH_SIZE = 50  # Emails sent per SMTP connection
+OUTBOX_MAX_ATTEMPTS = 5  # Attempts before an email is marked as failed
+OUTBOX_RETRY_BACKOFF = 30  # Seconds before the first retry, doubled after each failure
+OUTBOX_LEASE = 5 * 60  # Seconds a worker owns a claimed batch before other workers retry it
 
 
 
@@ -226,3 +240,58 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedStaticFilesStorage'
 
 
 STATIC_ROOT = BASE_DIR / "staticfiles"
+
+
+# Cache shared by every process (web workers, cron commands, the Stripe and
+# outbox workers), so a read model dropped by one of them is dropped for all.
+# Without REDIS_URL each process keeps its own memory cache, which is only
+# suitable for development and tests.
+REDIS_URL = config("REDIS_URL", default="")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+
+# Seconds a Stripe Checkout session stays payable (Stripe accepts 30 minutes to 24 hours)
+STRIPE_CHECKOUT_TTL = 30 * 60
+
+# Seconds a checkout holds stock before an unpaid order's reservation is
+# released; renewed when the Stripe session is created and longer than it,
+# so a session can never be paid after its stock was released
+STOCK_RESERVATION_TTL = STRIPE_CHECKOUT_TTL + 5 * 60
+
+# Flat shipping fee added to every order, in cents
+SHIPPING_FEE_CENTS = 1000
+
+# Seconds an anonymous page is kept in the full-page cache (and in shared caches)
+PAGE_CACHE_TIMEOUT = 10 * 60
+
+# Daily multiplier applied to sales ranks by `manage.py decay_sales_ranks`
+# (0.9 halves the weight of a sale in about a week)
+SALES_RANK_DECAY = 0.9
+
+# Where carts are kept (see `cart.storage`): anonymous visitors and signed-in users
+CART_ANONYMOUS_STORAGE = "cart.storage.SessionCartStorage"
+CART_USER_STORAGE = "cart.storage.DatabaseCartStorage"
+
+# Cache used by `cart.storage.CacheCartStorage`, and seconds an idle cart is kept there
+CART_CACHE_ALIAS = "default"
+CART_CACHE_TIMEOUT = 30 * 24 * 60 * 60
+
+# Request rate limits (see `helpers.ratelimit`): the cache holding the token
+# buckets (shared by every worker, see CACHES), and the number of proxies in
+# front of the app appending to X-Forwarded-For (1 on Heroku; 0 trusts only
+# the socket address)
+RATE_LIMIT_ENABLED = True
+RATE_LIMIT_CACHE_ALIAS = "default"
+RATE_LIMIT_PROXY_COUNT = config("RATE_LIMIT_PROXY_COUNT", default=0, cast=int)
@@ -7,6 +7,7 @@ urlpatterns = [
     path('accounts/', include('allauth.urls')),  # Allauth URLs
     path('cart/', include("cart.urls")),
     path('checkout/', include("orders.urls")),
+    path('payments/', include("payments.urls")),
     path('reviews/', include("reviews.urls")),
     path('', include("store.urls")),
 ]
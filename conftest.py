@@ -0,0 +1,13 @@
+import pytest
+from django.core.cache import cache
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """
+    Start every test with an empty cache so cached read models never leak
+    between tests.
+    """
+    cache.clear()
+    yield
+    cache.clear()
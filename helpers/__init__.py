@@ -1,3 +1,4 @@
 from helpers.cloudinary.config import cloud_init
+from helpers.cloudinary.images import image_srcset, image_url
 
-__all__ = ["cloud_init"]
+__all__ = ["cloud_init", "image_srcset", "image_url"]
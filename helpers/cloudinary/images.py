@@ -0,0 +1,77 @@
+from functools import lru_cache
+
+from cloudinary.utils import cloudinary_url
+
+# Delivery settings of each place an image is shown: the default width,
+# the widths offered in `srcset` and, where the client cannot negotiate a
+# format (Stripe Checkout), a fixed format instead of f_auto
+IMAGE_PRESETS = {
+    "card": {"width": 400, "widths": (200, 400, 800)},
+    "detail": {"width": 800, "widths": (400, 800, 1200, 1600)},
+    "thumbnail": {"width": 160, "widths": (160, 320)},
+    "cart": {"width": 96, "widths": (96, 192)},
+    "stripe": {"width": 512, "widths": (512,), "format": "jpg"},
+}
+
+# Number of built URLs kept in memory by each process
+IMAGE_URL_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=IMAGE_URL_CACHE_SIZE)
+def _build_url(public_id, version, format, preset, width):
+    options = IMAGE_PRESETS[preset]
+    url, _ = cloudinary_url(
+        public_id,
+        version=version,
+        format=options.get("format", format),
+        width=width,
+        crop="limit",
+        fetch_format=None if "format" in options else "auto",
+        quality="auto",
+        secure=True,
+    )
+    return url
+
+
+def _source(image):
+    """
+    The memoization key of a Cloudinary image: a re-upload changes its
+    version, so a cached URL never outlives the file it points to.
+    """
+    return image.public_id, str(image.version or ""), image.format
+
+
+def image_url(image, preset):
+    """
+    Build the delivery URL of an image for one of the `IMAGE_PRESETS`.
+
+    The image is resized to the preset width (never upscaled), served in
+    the best format and quality the client accepts, and the URL is
+    memoized per public id and version so repeated renders skip the SDK.
+
+    Args:
+        image (CloudinaryResource): The image, e.g. a `CloudinaryField` value.
+        preset (str): The use site, a key of `IMAGE_PRESETS`.
+
+    Returns:
+        str: The URL, or an empty string if there is no image.
+    """
+    if not image:
+        return ""
+    return _build_url(*_source(image), preset, IMAGE_PRESETS[preset]["width"])
+
+
+def image_srcset(image, preset):
+    """
+    Build the `srcset` attribute of an image for one of the `IMAGE_PRESETS`.
+
+    Returns:
+        str: One URL per preset width with its `w` descriptor, or an empty
+        string if there is no image.
+    """
+    if not image:
+        return ""
+    source = _source(image)
+    return ", ".join(
+        f"{_build_url(*source, preset, width)} {width}w" for width in IMAGE_PRESETS[preset]["widths"]
+    )
@@ -0,0 +1,143 @@
+import hashlib
+import math
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """
+    A token bucket applied to the requests of a view.
+
+    Each client (as identified by `key`) starts with `capacity` tokens and
+    regains them at `capacity / period` tokens per second. A request spends
+    one token; when none is left it is refused until a token is back.
+
+    Attributes:
+        name (str): The bucket name, part of the cache key.
+        capacity (int): The burst size, in requests.
+        period (int): Seconds to refill an empty bucket.
+        key (tuple): What identifies a client: `"ip"`, `"session"`, or the
+            name of a URL keyword argument (e.g. `"slug"`). Requests missing
+            a part (e.g. without a session) are not limited by this bucket.
+        methods (tuple): The HTTP methods limited; all when empty.
+    """
+    name: str
+    capacity: int
+    period: int
+    key: tuple = ("ip",)
+    methods: tuple = ()
+
+    @property
+    def rate(self):
+        return self.capacity / self.period
+
+
+def client_ip(request):
+    """
+    Return the client address.
+
+    Behind `settings.RATE_LIMIT_PROXY_COUNT` trusted proxies, it is the
+    `X-Forwarded-For` entry appended by the outermost of them, counted from
+    the right: entries further left are sent by the client and can be
+    forged. Without proxies, or when the header is shorter than expected,
+    the socket address is used.
+    """
+    proxies = settings.RATE_LIMIT_PROXY_COUNT
+    if proxies:
+        forwarded = [part.strip() for part in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",")]
+        if len(forwarded) >= proxies and forwarded[-proxies]:
+            return forwarded[-proxies]
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def _key_part(request, kwargs, part):
+    if part == "ip":
+        return client_ip(request)
+    if part == "session":
+        session = getattr(request, "session", None)
+        return session.session_key if session is not None else None
+    value = kwargs.get(part)
+    return str(value) if value is not None else None
+
+
+def consume(limit, client, now=None):
+    """
+    Take one token from the bucket of a client.
+
+    The bucket is stored in the `settings.RATE_LIMIT_CACHE_ALIAS` cache as
+    `(tokens, timestamp)` and refilled lazily on every call, so idle clients
+    cost nothing. The read and the write are not atomic: concurrent requests
+    of one client may each see the same token, which lets a burst through
+    by at most the number of concurrent workers.
+
+    Args:
+        limit (RateLimit): The bucket definition.
+        client (str): The client identifier.
+        now (float, optional): The current time, for tests.
+
+    Returns:
+        float: 0 when the request is allowed, otherwise the seconds until a
+        token is available again.
+    """
+    cache = caches[settings.RATE_LIMIT_CACHE_ALIAS]
+    digest = hashlib.md5(client.encode()).hexdigest()
+    key = f"ratelimit:{limit.name}:{digest}"
+    now = time.time() if now is None else now
+
+    tokens, updated = cache.get(key) or (limit.capacity, now)
+    tokens = min(limit.capacity, tokens + (now - updated) * limit.rate)
+    allowed = tokens >= 1
+    if allowed:
+        tokens -= 1
+    # The entry expires once the bucket would be full again
+    timeout = math.ceil((limit.capacity - tokens) / limit.rate) + 1
+    cache.set(key, (tokens, now), timeout)
+    return 0 if allowed else (1 - tokens) / limit.rate
+
+
+class RateLimitMixin:
+    """
+    Class-based view mixin refusing requests beyond `rate_limits` with a
+    `429 Too Many Requests`, before the view touches the database.
+
+    Every bucket matching the request is charged in turn; the request is
+    refused as soon as one is empty. Limits are skipped entirely when
+    `settings.RATE_LIMIT_ENABLED` is false.
+
+    Attributes:
+        rate_limits (tuple): The `RateLimit` buckets of the view.
+    """
+    rate_limits = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        if settings.RATE_LIMIT_ENABLED:
+            for limit in self.rate_limits:
+                if limit.methods and request.method not in limit.methods:
+                    continue
+                parts = [_key_part(request, kwargs, part) for part in limit.key]
+                if any(part is None for part in parts):
+                    continue
+                retry_after = consume(limit, ":".join(parts))
+                if retry_after:
+                    return self.rate_limited(request, retry_after)
+        return super().dispatch(request, *args, **kwargs)
+
+    def rate_limited(self, request, retry_after):
+        """
+        Build the response to a refused request.
+
+        Args:
+            request (HttpRequest): The refused request.
+            retry_after (float): Seconds until the client may retry.
+
+        Returns:
+            HttpResponse: A 429 response with a `Retry-After` header.
+        """
+        response = HttpResponse("Too many requests, please try again later.", status=429, content_type="text/plain")
+        response["Retry-After"] = str(math.ceil(retry_after))
+        return response
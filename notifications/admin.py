@@ -0,0 +1,17 @@
+from django.contrib import admin
+from notifications.models import OutboxEmail
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    """
+    Admin interface for inspecting queued and sent emails.
+
+    Attributes:
+        list_display (tuple): The fields to be displayed in the list view.
+        list_filter (tuple): The fields by which the list can be filtered.
+        search_fields (tuple): The fields to be searchable in the admin.
+    """
+    list_display = ('subject', 'to', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('to', 'subject')
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.outbox import send_pending
+
+
+class Command(BaseCommand):
+    """
+    Delivers queued outbox emails.
+
+    Run it from cron, or keep it running with `--loop`.
+    """
+    help = "Send pending outbox emails."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop", action="store_true", help="Keep draining instead of running once."
+        )
+        parser.add_argument(
+            "--interval", type=int, default=5, help="Seconds to wait when the outbox is empty with --loop."
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=None, help="Maximum number of emails per batch."
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = send_pending(batch_size=options["batch_size"])
+            if sent or failed:
+                self.stdout.write(f"Sent {sent} email(s), {failed} failed.")
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,69 @@
+from django.db import models
+from store.models import TimeStampedModel
+
+
+class OutboxEmail(TimeStampedModel):
+    """
+    An email waiting to be delivered by the outbox worker.
+
+    Rows are written in the same transaction as the change that triggers the
+    email (e.g. an order), so an email is queued if and only if that change
+    is committed. The `send_outbox` command delivers them off the request path.
+
+    Attributes:
+        to (EmailField): The recipient address.
+        from_email (CharField): The sender address.
+        subject (CharField): The email subject.
+        body (TextField): The plain text body.
+        html_body (TextField): The optional HTML alternative.
+        status (CharField): Whether the email is pending, being sent, sent or failed.
+        attempts (PositiveIntegerField): Number of delivery attempts so far.
+        next_attempt_at (DateTimeField): Earliest time of the next attempt, or
+            the end of the lease while the email is being sent.
+        last_error (TextField): The error raised by the last failed attempt.
+        sent_at (DateTimeField): When the email was delivered.
+    """
+
+    class Status(models.TextChoices):
+        """
+        Delivery state of an outbox email.
+
+        Attributes:
+            PENDING: Waiting for (another) delivery attempt.
+            SENDING: Leased to a worker until `next_attempt_at`.
+            SENT: Delivered to the SMTP server.
+            FAILED: Gave up after too many attempts.
+        """
+        PENDING = ("pending", "Pending")
+        SENDING = ("sending", "Sending")
+        SENT = ("sent", "Sent")
+        FAILED = ("failed", "Failed")
+
+    to = models.EmailField(max_length=254)
+    from_email = models.CharField(max_length=254)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    status = models.CharField(
+        choices=Status.choices, max_length=20, default=Status.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField()
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "outbox email"
+        verbose_name_plural = "outbox emails"
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="outbox_status_next_idx"),
+        ]
+
+    def __str__(self):
+        """
+        Return a string representation of the email.
+
+        Returns:
+            str: A string in the format '<subject> to <recipient> (<status>)'.
+        """
+        return f"{self.subject} to {self.to} ({self.status})"
@@ -0,0 +1,146 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils.timezone import now
+
+from notifications.models import OutboxEmail
+
+
+def enqueue_email(to, subject, body, html_body="", from_email=None):
+    """
+    Queue an email for the outbox worker.
+
+    Call it inside the transaction of the change that triggers the email.
+
+    Args:
+        to (str): The recipient address.
+        subject (str): The email subject.
+        body (str): The plain text body.
+        html_body (str, optional): An HTML alternative.
+        from_email (str, optional): The sender. Defaults to `settings.DEFAULT_FROM_EMAIL`.
+
+    Returns:
+        OutboxEmail: The queued email.
+    """
+    return OutboxEmail.objects.create(
+        to=to,
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        next_attempt_at=now(),
+    )
+
+
+def _backoff(attempts):
+    """
+    Delay before the next attempt, doubling after every failure.
+    """
+    return timedelta(seconds=settings.OUTBOX_RETRY_BACKOFF * 2 ** (attempts - 1))
+
+
+def _claim(batch_size):
+    """
+    Lease a batch of due emails to this worker and commit the lease.
+
+    Emails whose lease ran out (their worker died mid-batch) are due again;
+    those already out of attempts are marked as failed instead.
+    """
+    with transaction.atomic():
+        emails = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(
+                status__in=[OutboxEmail.Status.PENDING, OutboxEmail.Status.SENDING],
+                next_attempt_at__lte=now(),
+            )
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        claimed, abandoned = [], []
+        for email in emails:
+            if email.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                email.status = OutboxEmail.Status.FAILED
+                email.last_error = email.last_error or "The delivery attempt did not complete."
+                abandoned.append(email)
+                continue
+            email.status = OutboxEmail.Status.SENDING
+            email.attempts += 1
+            email.next_attempt_at = now() + timedelta(seconds=settings.OUTBOX_LEASE)
+            claimed.append(email)
+        OutboxEmail.objects.bulk_update(emails, ["status", "attempts", "next_attempt_at", "last_error"])
+    return claimed
+
+
+def _record_failure(email, error):
+    email.last_error = str(error)
+    if email.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        email.status = OutboxEmail.Status.FAILED
+    else:
+        email.status = OutboxEmail.Status.PENDING
+        email.next_attempt_at = now() + _backoff(email.attempts)
+
+
+def send_pending(batch_size=None, connection=None):
+    """
+    Deliver one batch of due emails over a single SMTP connection.
+
+    Rows are claimed with `SELECT ... FOR UPDATE SKIP LOCKED` and leased to
+    the worker for `settings.OUTBOX_LEASE` seconds; the lease is committed
+    before talking to SMTP, so no row lock or transaction is held while
+    sending and several workers can drain the outbox side by side. A failed
+    email (or a whole batch, when the connection cannot be opened) is retried
+    with exponential backoff until `settings.OUTBOX_MAX_ATTEMPTS` is reached.
+    If a worker dies mid-batch its emails are retried once the lease runs
+    out, so delivery is at least once.
+
+    Args:
+        batch_size (int, optional): Maximum number of emails to send.
+            Defaults to `settings.OUTBOX_BATCH_SIZE`.
+        connection (optional): An email backend connection to reuse.
+            Defaults to a new connection to the configured `EMAIL_BACKEND`.
+
+    Returns:
+        tuple: The number of emails sent and the number that failed.
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    sent = failed = 0
+
+    emails = _claim(batch_size)
+    if not emails:
+        return sent, failed
+
+    try:
+        connection = connection or get_connection()
+        connection.open()
+    except Exception as error:
+        for email in emails:
+            _record_failure(email, error)
+        failed = len(emails)
+    else:
+        try:
+            for email in emails:
+                message = EmailMultiAlternatives(
+                    subject=email.subject,
+                    body=email.body,
+                    from_email=email.from_email,
+                    to=[email.to],
+                    connection=connection,
+                )
+                if email.html_body:
+                    message.attach_alternative(email.html_body, "text/html")
+                try:
+                    message.send()
+                except Exception as error:
+                    failed += 1
+                    _record_failure(email, error)
+                else:
+                    sent += 1
+                    email.status = OutboxEmail.Status.SENT
+                    email.sent_at = now()
+                    email.last_error = ""
+        finally:
+            connection.close()
+
+    OutboxEmail.objects.bulk_update(emails, ["status", "next_attempt_at", "last_error", "sent_at"])
+    return sent, failed
@@ -0,0 +1,154 @@
+import socket
+
+import pytest
+from datetime import timedelta
+from django.core import mail
+from django.utils.timezone import now
+from notifications.models import OutboxEmail
+from notifications.outbox import enqueue_email, send_pending
+
+pytestmark = pytest.mark.django_db
+
+
+class FailingConnection:
+    """
+    Email backend connection stand-in that rejects every message.
+    """
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        raise ConnectionError("SMTP unavailable")
+
+
+class UnreachableConnection(FailingConnection):
+    """
+    Email backend connection stand-in whose server cannot be reached.
+    """
+    def open(self):
+        raise ConnectionRefusedError("Connection refused")
+
+
+class RecordingConnection(FailingConnection):
+    """
+    Email backend connection stand-in recording the stored state of the
+    emails while they are sent.
+    """
+    def __init__(self):
+        self.statuses = []
+
+    def send_messages(self, messages):
+        self.statuses.extend(OutboxEmail.objects.values_list("status", flat=True))
+        return len(messages)
+
+
+def test_send_pending_delivers_queued_emails():
+    enqueue_email("a@example.com", "Hello", "Plain", html_body="<p>Html</p>")
+    enqueue_email("b@example.com", "Hi", "Plain")
+
+    assert send_pending() == (2, 0)
+
+    assert [message.to for message in mail.outbox] == [["a@example.com"], ["b@example.com"]]
+    assert mail.outbox[0].alternatives[0][0] == "<p>Html</p>"
+    assert not OutboxEmail.objects.exclude(status=OutboxEmail.Status.SENT).exists()
+    assert send_pending() == (0, 0)
+
+
+def test_failed_email_is_retried_with_backoff(settings):
+    settings.OUTBOX_MAX_ATTEMPTS = 2
+    email = enqueue_email("a@example.com", "Hello", "Plain")
+
+    assert send_pending(connection=FailingConnection()) == (0, 1)
+    email.refresh_from_db()
+    assert email.status == OutboxEmail.Status.PENDING
+    assert email.attempts == 1
+    assert email.next_attempt_at > now() + timedelta(seconds=settings.OUTBOX_RETRY_BACKOFF - 5)
+    assert "SMTP unavailable" in email.last_error
+
+    # Not due yet
+    assert send_pending(connection=FailingConnection()) == (0, 0)
+
+    OutboxEmail.objects.update(next_attempt_at=now())
+    assert send_pending(connection=FailingConnection()) == (0, 1)
+    email.refresh_from_db()
+    assert email.status == OutboxEmail.Status.FAILED
+
+
+def test_unreachable_server_backs_off_the_whole_batch():
+    enqueue_email("a@example.com", "Hello", "Plain")
+    enqueue_email("b@example.com", "Hi", "Plain")
+
+    assert send_pending(connection=UnreachableConnection()) == (0, 2)
+
+    for email in OutboxEmail.objects.all():
+        assert email.status == OutboxEmail.Status.PENDING
+        assert email.attempts == 1
+        assert email.next_attempt_at > now()
+        assert "Connection refused" in email.last_error
+
+
+def test_emails_are_leased_before_being_sent():
+    enqueue_email("a@example.com", "Hello", "Plain")
+    connection = RecordingConnection()
+
+    assert send_pending(connection=connection) == (1, 0)
+
+    assert connection.statuses == [OutboxEmail.Status.SENDING]
+    assert OutboxEmail.objects.get().status == OutboxEmail.Status.SENT
+
+
+def test_emails_of_a_dead_worker_are_retried_once_the_lease_runs_out(settings):
+    settings.OUTBOX_MAX_ATTEMPTS = 2
+    email = enqueue_email("a@example.com", "Hello", "Plain")
+    OutboxEmail.objects.update(status=OutboxEmail.Status.SENDING, attempts=1, next_attempt_at=now() + timedelta(minutes=1))
+
+    # Still leased
+    assert send_pending() == (0, 0)
+
+    OutboxEmail.objects.update(next_attempt_at=now())
+    assert send_pending() == (1, 0)
+    email.refresh_from_db()
+    assert (email.status, email.attempts) == (OutboxEmail.Status.SENT, 2)
+
+    # A lease that runs out on the last attempt gives up
+    OutboxEmail.objects.update(status=OutboxEmail.Status.SENDING, next_attempt_at=now())
+    assert send_pending() == (0, 0)
+    email.refresh_from_db()
+    assert email.status == OutboxEmail.Status.FAILED
+
+
+def test_send_pending_over_smtp(settings):
+    controller_module = pytest.importorskip("aiosmtpd.controller")
+
+    class Handler:
+        def __init__(self):
+            self.received = []
+
+        async def handle_DATA(self, server, session, envelope):
+            self.received.append(envelope.rcpt_tos)
+            return "250 OK"
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+
+    handler = Handler()
+    controller = controller_module.Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        settings.EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+        settings.EMAIL_HOST = "127.0.0.1"
+        settings.EMAIL_PORT = port
+        settings.EMAIL_USE_TLS = False
+        settings.EMAIL_HOST_USER = ""
+        settings.EMAIL_HOST_PASSWORD = ""
+        for index in range(3):
+            enqueue_email(f"user{index}@example.com", "Hello", "Plain")
+
+        assert send_pending() == (3, 0)
+    finally:
+        controller.stop()
+    assert handler.received == [[f"user{index}@example.com"] for index in range(3)]
@@ -1,14 +1,19 @@
 from django.contrib import admin
-from .models import Order, OrderItem
+from .models import Order, OrderItem, StockReservation
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
 
+class StockReservationInline(admin.TabularInline):
+    model = StockReservation
+    extra = 0
+    readonly_fields = ('variation', 'quantity', 'status', 'expires_at')
+
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'status', 'total', 'is_paid')
-    list_filter = ('status', 'is_paid')
-    inlines = [OrderItemInline]
+    list_display = ('id', 'user', 'status', 'total', 'is_paid', 'needs_review')
+    list_filter = ('status', 'is_paid', 'needs_review')
+    inlines = [OrderItemInline, StockReservationInline]
 
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ('order', 'product', 'quantity', 'total', 'total_cents')
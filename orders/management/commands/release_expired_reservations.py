@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.reservations import release_expired_reservations
+
+
+class Command(BaseCommand):
+    """
+    Returns the stock of unpaid orders whose reservation has expired.
+
+    Run it from cron, or keep it running with `--loop`.
+    """
+    help = "Release expired stock reservations."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop", action="store_true", help="Keep sweeping instead of running once."
+        )
+        parser.add_argument(
+            "--interval", type=int, default=60, help="Seconds between sweeps with --loop."
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            released = release_expired_reservations()
+            self.stdout.write(f"Released {released} expired reservation(s).")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
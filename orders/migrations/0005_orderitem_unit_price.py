@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-17 08:28
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_unit_prices(apps, schema_editor):
+    """
+    Derive the unit price of existing items from their total.
+    """
+    OrderItem = apps.get_model("orders", "OrderItem")
+    OrderItem.objects.filter(quantity__gt=0).update(unit_price_cents=F("total_cents") / F("quantity"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_stock_reservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='unit_price_cents',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_unit_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 09:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_orderitem_unit_price'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='needs_review',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -21,6 +21,8 @@ class Order(TimeStampedModel):
         is_paid (BooleanField): Whether the order has been paid or not.
         status (CharField): The current status of the order.
         total_cents (IntegerField): The total amount of the order in cents.
+        needs_review (BooleanField): Whether the order was paid after its stock
+            was released and sold elsewhere, and must be refunded or fixed by hand.
     """
     
     class Status(models.TextChoices):
@@ -53,6 +55,7 @@ class Order(TimeStampedModel):
         choices=Status.choices, max_length=50, default=Status.PENDING
     )
     total_cents = models.IntegerField()
+    needs_review = models.BooleanField(default=False)
 
     @property
     def total(self):
@@ -76,14 +79,7 @@ class Order(TimeStampedModel):
         """
         return f"Order #{self.id} - {self.get_status_display()}"
     
-    def save(self, *args, **kwargs):
-        if self.is_paid : 
-            items = self.items.all()
-            for item in items:
-                item.product.stock -= item.quantity 
-                item.save()
-        super().save(*args, **kwargs)
-        
+
 class OrderItem(models.Model):
     """
     Represents an item in an order.
@@ -96,6 +92,7 @@ class OrderItem(models.Model):
         order (ForeignKey): The order this item is part of.
         product (ForeignKey): The product variation associated with this item.
         quantity (PositiveIntegerField): The number of units of the product in the order.
+        unit_price_cents (IntegerField): The discounted unit price charged, in cents.
         total_cents (IntegerField): The total cost of this item in cents.
     """
     
@@ -106,6 +103,7 @@ class OrderItem(models.Model):
         ProductVariation, on_delete=models.CASCADE, related_name="order_items"
     )
     quantity = models.PositiveIntegerField(default=1)
+    unit_price_cents = models.IntegerField(default=0)
     total_cents = models.IntegerField()
 
     @property
@@ -130,3 +128,59 @@ class OrderItem(models.Model):
                  '<quantity> x <product_name> in Order #<order_id>'.
         """
         return f"{self.quantity} x {self.product.name} in Order #{self.order.id}"
+
+
+class StockReservation(TimeStampedModel):
+    """
+    Stock held for an order between checkout and payment.
+
+    Stock is taken from the variation when the reservation is created. The
+    reservation is then either committed once the order is paid, or released
+    (and the stock given back) when it expires unpaid.
+
+    Attributes:
+        order (ForeignKey): The order holding the stock.
+        variation (ForeignKey): The product variation being held.
+        quantity (PositiveIntegerField): The number of units held.
+        status (CharField): Whether the reservation is held, committed or released.
+        expires_at (DateTimeField): When a held reservation may be released.
+    """
+
+    class Status(models.TextChoices):
+        """
+        Lifecycle of a reservation.
+
+        Attributes:
+            HELD: Stock is set aside, waiting for payment.
+            COMMITTED: The order was paid; the stock is sold.
+            RELEASED: The reservation expired and the stock was returned.
+        """
+        HELD = ("held", "Held")
+        COMMITTED = ("committed", "Committed")
+        RELEASED = ("released", "Released")
+
+    order = models.ForeignKey(
+        Order, on_delete=models.CASCADE, related_name="reservations"
+    )
+    variation = models.ForeignKey(
+        ProductVariation, on_delete=models.CASCADE, related_name="reservations"
+    )
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(
+        choices=Status.choices, max_length=20, default=Status.HELD
+    )
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "expires_at"], name="reservation_status_expiry_idx"),
+        ]
+
+    def __str__(self):
+        """
+        String representation of the reservation.
+
+        Returns:
+            str: A string in the format '<quantity> x <variation> for Order #<order_id> (<status>)'.
+        """
+        return f"{self.quantity} x {self.variation_id} for Order #{self.order_id} ({self.status})"
@@ -0,0 +1,285 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BooleanField, Case, F, PositiveIntegerField, Q, Value, When
+from django.utils.timezone import now
+
+from orders.models import Order, StockReservation
+from store.facets import reindex_products
+from store.models import Product, ProductVariation
+from store.pagecache import product_key, product_page_keys, purge_surrogate_keys
+from store.variants import invalidate_variant_matrices
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientStock(Exception):
+    """
+    Raised when a reservation cannot be satisfied.
+
+    Attributes:
+        variation_ids (list): The variations that do not have enough stock.
+    """
+
+    def __init__(self, variation_ids):
+        super().__init__(f"Insufficient stock for variations {variation_ids}")
+        self.variation_ids = variation_ids
+
+
+def _refresh_products(product_ids, flipped_ids):
+    """
+    Refresh the read models of products whose stock changed.
+
+    Stock only shows in the variant matrices and product pages. Products
+    with a variation deactivated or reactivated (`flipped_ids`) also have
+    their facets and listing pages refreshed. Each cache is updated once
+    for the whole batch.
+    """
+    keys = [product_key(product_id) for product_id in product_ids]
+    if flipped_ids:
+        reindex_products(flipped_ids)
+        for product_id, category_id, brand_id in Product.objects.filter(id__in=flipped_ids).values_list(
+            "id", "category_id", "brand_id"
+        ):
+            keys.extend(product_page_keys(product_id, category_id, brand_id))
+    invalidate_variant_matrices(product_ids)
+    purge_surrogate_keys(*dict.fromkeys(keys))
+
+
+def _adjust_stock(quantities, sign):
+    """
+    Add (`sign=1`) or remove (`sign=-1`) stock for several variations in one
+    UPDATE statement.
+
+    Rows are locked in primary key order first so concurrent checkouts always
+    acquire locks in the same order and cannot deadlock.
+
+    The same statement applies the rule of `ProductVariation.save`: a
+    variation left without stock is deactivated. Stock given back to a
+    variation at zero reactivates it, since it was only inactive for being
+    sold out. The read models of the products are refreshed once this
+    commits.
+
+    Returns:
+        int: The number of variations updated.
+    """
+    ids = sorted(quantities)
+    rows = ProductVariation.objects.select_for_update().filter(id__in=ids).order_by("id").values_list(
+        "id", "product_id", "stock", "is_active"
+    )
+    product_ids, flipped_ids = set(), set()
+    for variation_id, product_id, stock, is_active in rows:
+        product_ids.add(product_id)
+        # The rows are locked, so they predict the update below
+        if (sign < 0 and is_active and stock == quantities[variation_id]) or (
+            sign > 0 and not is_active and stock == 0
+        ):
+            flipped_ids.add(product_id)
+    transaction.on_commit(lambda: _refresh_products(product_ids, flipped_ids))
+
+    condition = Q()
+    for variation_id in ids:
+        if sign < 0:
+            # Never take more than what is left
+            condition |= Q(id=variation_id, stock__gte=quantities[variation_id])
+        else:
+            condition |= Q(id=variation_id)
+    new_stock = Case(
+        *[When(id=variation_id, then=F("stock") + sign * quantities[variation_id]) for variation_id in ids],
+        output_field=PositiveIntegerField(),
+    )
+    # Conditions read the stock before this update
+    if sign < 0:
+        sold_out = [When(id=variation_id, stock=quantities[variation_id], then=Value(False)) for variation_id in ids]
+    else:
+        sold_out = [When(id=variation_id, stock=0, then=Value(True)) for variation_id in ids]
+    is_active = Case(*sold_out, default=F("is_active"), output_field=BooleanField())
+    return ProductVariation.objects.filter(condition).update(stock=new_stock, is_active=is_active)
+
+
+def _take_stock(quantities):
+    """
+    Take stock for several variations, all or nothing. Must run inside a
+    transaction, which the exception rolls back.
+
+    Raises:
+        InsufficientStock: If a variation does not have enough stock.
+    """
+    updated = _adjust_stock(quantities, -1)
+    if updated != len(quantities):
+        stock = dict(ProductVariation.objects.filter(id__in=quantities).values_list("id", "stock"))
+        short = sorted(
+            variation_id for variation_id, quantity in quantities.items()
+            if stock.get(variation_id, 0) < quantity
+        )
+        raise InsufficientStock(short)
+
+
+def reserve_stock(order, quantities, ttl=None):
+    """
+    Take stock for every line of an order and record the reservations.
+
+    The whole cart is decremented with a single set-based UPDATE guarded by
+    `stock >= quantity`. If any line falls short nothing is reserved.
+
+    Args:
+        order (Order): The order the stock is held for.
+        quantities (dict): Variation id mapped to the quantity to reserve.
+        ttl (int, optional): Seconds before the reservation expires.
+            Defaults to `settings.STOCK_RESERVATION_TTL`.
+
+    Raises:
+        InsufficientStock: If a variation does not have enough stock.
+
+    Returns:
+        list: The created `StockReservation` objects.
+    """
+    quantities = {int(variation_id): int(quantity) for variation_id, quantity in quantities.items() if int(quantity) > 0}
+    if ttl is None:
+        ttl = settings.STOCK_RESERVATION_TTL
+    expires_at = now() + timedelta(seconds=ttl)
+
+    with transaction.atomic():
+        # Leaving the atomic block with an exception rolls back the rows already decremented
+        _take_stock(quantities)
+        return StockReservation.objects.bulk_create([
+            StockReservation(order=order, variation_id=variation_id, quantity=quantity, expires_at=expires_at)
+            for variation_id, quantity in quantities.items()
+        ])
+
+
+def renew_reservations(order, ttl=None):
+    """
+    Hold the stock of an unpaid order for another `ttl` seconds, e.g. when
+    its payment starts.
+
+    Held reservations are extended. Reservations already released take
+    their stock again, all or nothing.
+
+    Args:
+        order (Order): The order.
+        ttl (int, optional): Seconds before the reservations expire.
+            Defaults to `settings.STOCK_RESERVATION_TTL`.
+
+    Raises:
+        InsufficientStock: If released stock cannot be taken again.
+
+    Returns:
+        int: The number of reservations held.
+    """
+    if ttl is None:
+        ttl = settings.STOCK_RESERVATION_TTL
+    with transaction.atomic():
+        reservations = list(
+            StockReservation.objects.select_for_update()
+            .filter(order=order).exclude(status=StockReservation.Status.COMMITTED)
+            .values_list("id", "status", "variation_id", "quantity")
+        )
+        quantities = {}
+        for _, status, variation_id, quantity in reservations:
+            if status == StockReservation.Status.RELEASED:
+                quantities[variation_id] = quantities.get(variation_id, 0) + quantity
+        if quantities:
+            _take_stock(quantities)
+        return StockReservation.objects.filter(id__in=[row[0] for row in reservations]).update(
+            status=StockReservation.Status.HELD, expires_at=now() + timedelta(seconds=ttl)
+        )
+
+
+def commit_reservations(order):
+    """
+    Mark an order's reservations as sold once it has been paid.
+
+    Args:
+        order (Order): The paid order.
+
+    Returns:
+        int: The number of reservations committed.
+    """
+    return commit_order_reservations([order.pk])
+
+
+def commit_order_reservations(order_ids):
+    """
+    Mark the reservations of several paid orders as sold.
+
+    Reservations that already expired take their stock again, order by
+    order and all or nothing, in a single UPDATE before being committed.
+    An order whose stock is gone in the meantime is oversold: its released
+    reservations are left as they are, and the order is flagged with
+    `needs_review` (and logged) for a refund or a manual fix.
+
+    Args:
+        order_ids (list): Ids of the paid orders.
+
+    Returns:
+        int: The number of reservations committed.
+    """
+    with transaction.atomic():
+        reservations = StockReservation.objects.filter(order_id__in=order_ids)
+        released = list(
+            reservations.select_for_update().filter(status=StockReservation.Status.RELEASED)
+            .order_by("order_id", "id").values_list("id", "order_id", "variation_id", "quantity")
+        )
+        retaken, short_orders = [], set()
+        if released:
+            by_order = {}
+            for row in released:
+                by_order.setdefault(row[1], []).append(row)
+            stock = dict(
+                ProductVariation.objects.select_for_update().filter(id__in={row[2] for row in released})
+                .order_by("id").values_list("id", "stock")
+            )
+            taken = {}
+            for order_id, rows in by_order.items():
+                needed = {}
+                for _, _, variation_id, quantity in rows:
+                    needed[variation_id] = needed.get(variation_id, 0) + quantity
+                if all(stock.get(variation_id, 0) - taken.get(variation_id, 0) >= quantity
+                       for variation_id, quantity in needed.items()):
+                    for variation_id, quantity in needed.items():
+                        taken[variation_id] = taken.get(variation_id, 0) + quantity
+                    retaken.extend(row[0] for row in rows)
+                else:
+                    short_orders.add(order_id)
+            if taken:
+                _adjust_stock(taken, -1)
+            if short_orders:
+                Order.objects.filter(id__in=short_orders).update(needs_review=True, updated=now())
+                logger.warning("Paid orders %s are short of stock and need review", sorted(short_orders))
+        return reservations.filter(
+            Q(status=StockReservation.Status.HELD) | Q(id__in=retaken)
+        ).update(status=StockReservation.Status.COMMITTED)
+
+
+def release_expired_reservations(at=None):
+    """
+    Give back the stock of held reservations that have expired.
+
+    Rows already locked by another sweeper are skipped, so several workers can
+    run this concurrently.
+
+    Args:
+        at (datetime, optional): The reference time. Defaults to now.
+
+    Returns:
+        int: The number of reservations released.
+    """
+    at = at or now()
+    with transaction.atomic():
+        expired = list(
+            StockReservation.objects.select_for_update(skip_locked=True)
+            .filter(status=StockReservation.Status.HELD, expires_at__lte=at)
+            .values_list("id", "variation_id", "quantity")
+        )
+        if not expired:
+            return 0
+        quantities = {}
+        for _, variation_id, quantity in expired:
+            quantities[variation_id] = quantities.get(variation_id, 0) + quantity
+        _adjust_stock(quantities, 1)
+        return StockReservation.objects.filter(id__in=[row[0] for row in expired]).update(
+            status=StockReservation.Status.RELEASED
+        )
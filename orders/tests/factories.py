@@ -28,4 +28,5 @@ class OrderItemFactory(DjangoModelFactory):
     order = factory.SubFactory(OrderFactory)
     product = factory.SubFactory(ProductVariationFactory)
     quantity = factory.Faker('random_int', min=1, max=5)
+    unit_price_cents = factory.LazyAttribute(lambda obj: obj.product.price_cents)
     total_cents = factory.LazyAttribute(lambda obj: obj.product.price_cents * obj.quantity)
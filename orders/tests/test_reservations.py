@@ -0,0 +1,153 @@
+import pytest
+from io import StringIO
+from datetime import timedelta
+from django.core.management import call_command
+from django.utils.timezone import now
+from orders.models import StockReservation
+from orders.reservations import (
+    InsufficientStock, commit_reservations, release_expired_reservations, renew_reservations, reserve_stock,
+)
+from orders.tests.factories import OrderFactory
+from store.facets import get_facet_index
+from store.tests.factories import ProductVariationFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def test_reserve_stock_takes_stock_for_every_line(django_assert_max_num_queries):
+    first = ProductVariationFactory(stock=5)
+    second = ProductVariationFactory(stock=3)
+    order = OrderFactory()
+
+    with django_assert_max_num_queries(5):
+        reservations = reserve_stock(order, {first.id: 2, second.id: 3})
+
+    assert len(reservations) == 2
+    first.refresh_from_db()
+    second.refresh_from_db()
+    assert (first.stock, second.stock) == (3, 0)
+
+
+def test_reserve_stock_is_all_or_nothing():
+    first = ProductVariationFactory(stock=5)
+    second = ProductVariationFactory(stock=1)
+    order = OrderFactory()
+
+    with pytest.raises(InsufficientStock) as error:
+        reserve_stock(order, {first.id: 2, second.id: 2})
+
+    assert error.value.variation_ids == [second.id]
+    first.refresh_from_db()
+    assert first.stock == 5
+    assert not StockReservation.objects.exists()
+
+
+def test_release_expired_reservations_returns_stock():
+    variation = ProductVariationFactory(stock=4)
+    order = OrderFactory()
+    reserve_stock(order, {variation.id: 3}, ttl=60)
+
+    assert release_expired_reservations() == 0
+    assert release_expired_reservations(at=now() + timedelta(seconds=61)) == 1
+
+    variation.refresh_from_db()
+    assert variation.stock == 4
+    assert order.reservations.get().status == StockReservation.Status.RELEASED
+
+
+def test_commit_reservations_marks_stock_as_sold():
+    variation = ProductVariationFactory(stock=4)
+    order = OrderFactory()
+    reserve_stock(order, {variation.id: 3})
+
+    assert commit_reservations(order) == 1
+    call_command("release_expired_reservations", stdout=StringIO())
+
+    variation.refresh_from_db()
+    assert variation.stock == 1
+    assert order.reservations.get().status == StockReservation.Status.COMMITTED
+
+
+def test_selling_out_deactivates_the_variation_and_refreshes_listings(django_capture_on_commit_callbacks):
+    variation = ProductVariationFactory(stock=2, color="#123456")
+    order = OrderFactory()
+    assert get_facet_index().search({"color": "#123456"}).ids == [variation.product_id]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        reserve_stock(order, {variation.id: 2}, ttl=60)
+
+    variation.refresh_from_db()
+    assert (variation.stock, variation.is_active) == (0, False)
+    assert get_facet_index().search({"color": "#123456"}).ids == []
+
+    with django_capture_on_commit_callbacks(execute=True):
+        release_expired_reservations(at=now() + timedelta(seconds=61))
+
+    variation.refresh_from_db()
+    assert (variation.stock, variation.is_active) == (2, True)
+    assert get_facet_index().search({"color": "#123456"}).ids == [variation.product_id]
+
+
+def test_stock_changes_refresh_each_cache_once_per_batch(monkeypatch, django_capture_on_commit_callbacks):
+    from orders import reservations
+
+    variations = [ProductVariationFactory(stock=10) for _ in range(19)] + [ProductVariationFactory(stock=2)]
+    reindexed, purges = [], []
+    monkeypatch.setattr(reservations, "reindex_products", lambda product_ids: reindexed.append(set(product_ids)))
+    monkeypatch.setattr(reservations, "purge_surrogate_keys", lambda *keys: purges.append(keys))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        reserve_stock(OrderFactory(), {variation.id: 2 for variation in variations})
+
+    # Only the sold out variation changes the facets
+    assert reindexed == [{variations[-1].product_id}]
+    assert len(purges) == 1
+    assert {f"product-{variation.product_id}" for variation in variations} <= set(purges[0])
+
+
+def test_renew_reservations_extends_holds_and_retakes_released_stock():
+    held = ProductVariationFactory(stock=4)
+    expired = ProductVariationFactory(stock=4)
+    order = OrderFactory()
+    reserve_stock(order, {held.id: 1}, ttl=600)
+    reserve_stock(order, {expired.id: 2}, ttl=60)
+    release_expired_reservations(at=now() + timedelta(seconds=61))
+
+    assert renew_reservations(order, ttl=1800) == 2
+
+    expired.refresh_from_db()
+    assert expired.stock == 2
+    assert all(
+        reservation.status == StockReservation.Status.HELD
+        and reservation.expires_at > now() + timedelta(seconds=1700)
+        for reservation in order.reservations.all()
+    )
+
+
+def test_renew_reservations_refuses_stock_sold_in_the_meantime():
+    variation = ProductVariationFactory(stock=2)
+    order = OrderFactory()
+    reserve_stock(order, {variation.id: 2}, ttl=60)
+    release_expired_reservations(at=now() + timedelta(seconds=61))
+    reserve_stock(OrderFactory(), {variation.id: 1})
+
+    with pytest.raises(InsufficientStock):
+        renew_reservations(order)
+
+    assert order.reservations.get().status == StockReservation.Status.RELEASED
+
+
+def test_paying_an_order_whose_stock_was_sold_flags_it_for_review():
+    variation = ProductVariationFactory(stock=2)
+    order = OrderFactory()
+    reserve_stock(order, {variation.id: 2}, ttl=60)
+    release_expired_reservations(at=now() + timedelta(seconds=61))
+    reserve_stock(OrderFactory(), {variation.id: 1})
+
+    assert commit_reservations(order) == 0
+
+    order.refresh_from_db()
+    variation.refresh_from_db()
+    assert order.needs_review
+    assert variation.stock == 1
+    assert order.reservations.get().status == StockReservation.Status.RELEASED
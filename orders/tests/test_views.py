@@ -1,12 +1,16 @@
+import time
+
 import pytest
 from django.urls import reverse
 from django.contrib.sessions.middleware import SessionMiddleware
 from django.test import RequestFactory
 from cart.cart import Cart
+from cart.models import CartItem
 from orders.models import Order, OrderItem
+from notifications.models import OutboxEmail
 from shipping.models import ShippingInfo
 from store.models import ProductVariation
-from store.tests.factories import ProductVariationFactory
+from store.tests.factories import ProductFactory, ProductVariationFactory, SizeFactory
 from users.tests.factories import UserFactory
 
 
@@ -49,3 +53,101 @@ def test_get_checkout_view_logged_in_user(client, django_user_model, cart_with_i
     assert "form" in response.context
     assert "total" in response.context
 
+
+
+SHIPPING_DATA = {
+    "first_name": "Ahmed",
+    "last_name": "Youssef",
+    "email": "ahmed@example.com",
+    "address": "123 Nile Street",
+    "postal_code": "12345",
+    "phone_number": "+201234567890",
+}
+
+
+def _fill_cart(user, size):
+    product = ProductFactory()
+    variations = [
+        ProductVariationFactory(product=product, size=SizeFactory(name=f"S{i}"), stock=10, price_cents=1000, discount=10)
+        for i in range(size)
+    ]
+    # Signed-in users keep their cart in the database
+    CartItem.objects.bulk_create([
+        CartItem(user=user, variation=variation, quantity=2)
+        for variation in variations
+    ])
+    return variations
+
+
+@pytest.mark.parametrize("size", [1, 10, 50])
+def test_post_checkout_creates_order_in_bounded_queries(
+    client, django_assert_max_num_queries, django_capture_on_commit_callbacks, record_property, size
+):
+    user = UserFactory()
+    client.force_login(user)
+    variations = _fill_cart(user, size)
+
+    # The same bound for every cart size, read model refreshes included
+    started = time.perf_counter()
+    with django_assert_max_num_queries(22), django_capture_on_commit_callbacks(execute=True):
+        response = client.post(reverse("checkout"), SHIPPING_DATA)
+    # Reported (e.g. with --junitxml) rather than asserted, wall time varies by machine
+    record_property("checkout_seconds", round(time.perf_counter() - started, 4))
+
+    assert response.status_code == 302
+    order = Order.objects.get(user=user)
+    assert order.total_cents == size * 2 * 900 + 1000
+    assert order.items.count() == size
+    assert all(item.unit_price_cents == 900 and item.total_cents == 1800 for item in order.items.all())
+    assert sorted(ProductVariation.objects.filter(id__in=[v.id for v in variations]).values_list("stock", flat=True)) == [8] * size
+
+
+def test_post_checkout_rolls_back_when_stock_is_short(client):
+    user = UserFactory()
+    client.force_login(user)
+    variation = _fill_cart(user, 2)[0]
+    ProductVariation.objects.filter(id=variation.id).update(stock=1)
+
+    response = client.post(reverse("checkout"), SHIPPING_DATA)
+
+    assert response.status_code == 200
+    assert not Order.objects.exists()
+    assert not OrderItem.objects.exists()
+
+
+def test_post_checkout_queues_confirmation_email(client, mailoutbox):
+    user = UserFactory()
+    client.force_login(user)
+    _fill_cart(user, 1)
+
+    client.post(reverse("checkout"), SHIPPING_DATA)
+
+    order = Order.objects.get(user=user)
+    email = OutboxEmail.objects.get()
+    assert email.to == user.email
+    assert str(order.id) in email.subject
+    assert mailoutbox == []
+    assert not CartItem.objects.filter(user=user).exists()
+
+
+def test_pay_expires_the_stripe_session_before_the_stock_hold(client, monkeypatch, settings):
+    import stripe
+    from datetime import datetime, timezone
+
+    user = UserFactory()
+    client.force_login(user)
+    _fill_cart(user, 1)
+    client.post(reverse("checkout"), SHIPPING_DATA)
+    order = Order.objects.get(user=user)
+    created = {}
+
+    def create_session(**kwargs):
+        created.update(kwargs)
+        return type("Session", (), {"url": "https://checkout.stripe.test/pay"})()
+
+    monkeypatch.setattr(stripe.checkout.Session, "create", create_session)
+    response = client.get(reverse("checkout-pay"))
+
+    assert response.status_code == 302
+    session_expiry = datetime.fromtimestamp(created["expires_at"], tz=timezone.utc)
+    assert all(reservation.expires_at > session_expiry for reservation in order.reservations.all())
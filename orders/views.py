@@ -1,14 +1,28 @@
+import logging
+
+import stripe
+from datetime import timedelta
+from django.http import JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.views.generic import View
 from shipping.models import ShippingInfo
 from shipping.forms import ShippingInfoForm
-from cart.cart import Cart
+from cart.cart import get_cart
+from cart.pricing import PricedCart
 from orders.models import Order, OrderItem
-from store.models import ProductVariation
-from payments.models import Payment
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.template.loader import render_to_string
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils.timezone import now
+from orders.reservations import InsufficientStock, renew_reservations, reserve_stock
+from notifications.outbox import enqueue_email
+
+stripe.api_key = settings.STRIPE_PRIVATE_KEY
+
+logger = logging.getLogger(__name__)
 
 
 class OrderCreationView(LoginRequiredMixin, View):
@@ -16,7 +30,7 @@ class OrderCreationView(LoginRequiredMixin, View):
     Handles the creation of an order during the checkout process.
 
     Displays a form for the user to enter shipping information, creates the order, 
-    sends an email confirmation, and clears the cart once the order is successfully 
+    queues an email confirmation, and clears the cart once the order is successfully 
     created.
 
     Methods:
@@ -38,7 +52,7 @@ class OrderCreationView(LoginRequiredMixin, View):
         Returns:
             HttpResponse: The rendered checkout page.
         """
-        cart = Cart(request)
+        cart = get_cart(request)
         if len(cart) == 0:
             return redirect("shop")
         
@@ -52,10 +66,10 @@ class OrderCreationView(LoginRequiredMixin, View):
                 'last_name': user.last_name,
                 'email': user.email 
             })
-        total = cart.get_total_cost() + 10
         context = {
             "form": form,
-            "total": total,
+            "priced": cart.priced(),
+            "total": cart.priced().total,
         }
         return render(request, "checkout.html", context)
         
@@ -63,7 +77,7 @@ class OrderCreationView(LoginRequiredMixin, View):
         """
         Handles the submission of the shipping info form, creates the order and order items.
 
-        If the form is valid, the order is created, payment email is sent to the user, 
+        If the form is valid, the order is created, a confirmation email is queued, 
         and the cart is cleared. Redirects the user to the payment checkout page.
 
         Args:
@@ -72,11 +86,13 @@ class OrderCreationView(LoginRequiredMixin, View):
         Returns:
             HttpResponse: The rendered checkout page or a redirect to the payment page.
         """
-        cart = Cart(request)
+        cart = get_cart(request)
         if len(cart) == 0:
             return redirect("shop")
         
-        total = cart.get_total_cost() + 10
+        # Every variation in the cart is loaded and priced once, by the cart snapshot
+        priced = cart.priced()
+        total = priced.total
         user = request.user
         past_shipping_info = ShippingInfo.objects.filter(user=user).last()
         if past_shipping_info:
@@ -85,44 +101,65 @@ class OrderCreationView(LoginRequiredMixin, View):
             form = ShippingInfoForm(data=request.POST)
         
         if form.is_valid():
-            shipping_info = form.save(commit=False)
-            shipping_info.user = user 
-            shipping_info.save()
-            
-            # Create order & order items, send confirmation email & clear cart
-            order = Order.objects.create(
-                user=user,
-                shipping_info=shipping_info,
-                total_cents=total,
-            )
-
-            # Render the email content
-            email_body = render_to_string("orders_emails/order-created.html", {"order": order})
-            
-            # Send the email
-            user.send_mail(
-                subject="Payment Successful",
-                message="Your payment was successful.",
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                html_message=email_body
-            )
-            
-            for item in cart:
-                OrderItem.objects.create(
-                    product=ProductVariation.objects.get(id=int(item['id'])),
-                    quantity=item['quantity'],
-                    total_cents=int(item['total']) * 100,
-                    order=order
-                )
-            
+            try:
+                with transaction.atomic():
+                    shipping_info = form.save(commit=False)
+                    shipping_info.user = user 
+                    shipping_info.save()
+                    
+                    # Create the order & all of its items in bulk
+                    order = Order.objects.create(
+                        user=user,
+                        shipping_info=shipping_info,
+                        total_cents=priced.total_cents,
+                    )
+                    OrderItem.objects.bulk_create([
+                        OrderItem(
+                            order=order,
+                            product=line.variation,
+                            quantity=line.quantity,
+                            unit_price_cents=line.unit_price_cents,
+                            total_cents=line.total_cents,
+                        )
+                        for line in priced.lines
+                    ])
+
+                    # Hold the stock until the order is paid or the reservation expires
+                    reserve_stock(order, {line.variation.id: line.quantity for line in priced.lines})
+
+                    # Queue the confirmation email in the same transaction
+                    _queue_order_created_email(order)
+            except InsufficientStock:
+                form.add_error(None, "Some items in your cart are no longer available in the requested quantity.")
+                return render(request, "checkout.html", {"form": form, "priced": priced, "total": total})
+
             # Clear the cart and redirect to checkout payment
             cart.clear()
             request.session['order'] = {"order_id": order.id}
             return redirect("checkout-pay")
         
         else:
-            print("Form errors:", form.errors)
-            return render(request, "checkout.html", {"form": form, "total": total})  
+            # The errors are shown next to the fields
+            logger.info("Rejected checkout form: %s", form.errors.as_json())
+            return render(request, "checkout.html", {"form": form, "priced": priced, "total": total})  
+
+
+def _queue_order_created_email(order):
+    """
+    Queues the order confirmation email in the outbox.
+
+    Args:
+        order (Order): The order that was just placed.
+    """
+    order = Order.objects.select_related("user").prefetch_related(
+        Prefetch("items", queryset=OrderItem.objects.select_related("product__product", "product__size"))
+    ).get(pk=order.pk)
+    enqueue_email(
+        to=order.user.email,
+        subject=f"Order #{order.id} received",
+        body=f"We received your order #{order.id}. Please proceed to payment to confirm it.",
+        html_body=render_to_string("orders_emails/order-created.html", {"order": order}),
+    )
 
 
 def create_checkout_session(request):
@@ -133,57 +170,39 @@ def create_checkout_session(request):
     from the order, and redirects the user to the Stripe checkout page for 
     payment.
 
+    The session expires after `settings.STRIPE_CHECKOUT_TTL` seconds and the
+    order's stock reservations are renewed to outlive it, so a payment can
+    never complete after its stock was released.
+
     Args:
         request (HttpRequest): The HTTP request object.
 
     Returns:
-        HttpResponseRedirect: Redirects the user to the Stripe checkout session.
+        HttpResponseRedirect: Redirects the user to the Stripe checkout session,
+        or a 400 JSON error (e.g. when the stock is no longer available).
     """
     try:
         order_data = request.session.get("order", {})  # Returns {} if 'order' doesn't exist
         order_id = order_data.get("order_id")  # Returns None if key doesn't exist
         order = get_object_or_404(Order, id=int(order_id))
         
-        line_items = []
+        # Charge exactly the unit prices and shipping recorded on the order
+        line_items = PricedCart.from_order(order).stripe_line_items()
         order_id = order.id
-        for item in order.items.all():
-            price = int(item.product.price_cents)
-            quantity = int(item.quantity)
-            name = str(item.product.product.name)
-            
-            image_url = str(item.product.image)
-            images = [image_url]
-
-            line_items.append({
-                "price_data": {
-                    "currency": "usd",
-                    "product_data": {"name": name, "images": images},
-                    "unit_amount": price,
-                },
-                "quantity": quantity,
-            })
 
-        shipping_fee = 1000  # $10.00 in cents
-        line_items.append({
-            "price_data": {
-                "currency": "usd",
-                "product_data": {
-                    "name": "Shipping Fee",
-                    "description": "Standard delivery"
-                },
-                "unit_amount": shipping_fee,
-            },
-            "quantity": 1,
-        })
-        
+        # Hold the stock for longer than the session can be paid
+        renew_reservations(order)
+        expires_at = now() + timedelta(seconds=settings.STRIPE_CHECKOUT_TTL)
+
         # Create Stripe checkout session
         session = stripe.checkout.Session.create(
             payment_method_types=["card"],
             mode="payment",
-            success_url=f"http://localhost:8000/pay/success?order_id={order_id}",
-            cancel_url=f"http://localhost:8000/pay/cancel?order_id={order_id}",
+            success_url=request.build_absolute_uri(reverse("success")),
+            cancel_url=request.build_absolute_uri(reverse("cancel")),
             line_items=line_items,
             metadata={"order_id": order_id},
+            expires_at=int(expires_at.timestamp()),
         )
 
         return redirect(session.url)
@@ -193,36 +212,20 @@ def create_checkout_session(request):
 
 def payment_success(request):
     """
-    Handles successful payment processing and updates the order status.
+    Shows the confirmation page once the customer is back from Stripe.
 
-    After the user completes the payment, this view marks the order as 'processing', 
-    decreases the stock of the purchased items, and records the payment.
+    The order itself is marked as paid by the Stripe webhook
+    (`payments.views.stripe_webhook`), so reloading or sharing this page has
+    no side effect.
 
     Args:
         request (HttpRequest): The HTTP request object.
 
     Returns:
-        HttpResponse: Renders a success page indicating the order has been processed.
+        HttpResponse: Renders a success page.
     """
-    order_id = request.GET.get("order_id")
-    order = Order.objects.get(id=order_id)
-    order.status = "processing"
-    order.is_paid = True
-    order.save()
-    
-    # Update product stock and create a payment record
-    for item in order.items.all():
-        item.product.stock -= item.quantity
-        item.save()
-    
-    Payment.objects.create(
-        order=order,
-        total_cents=order.total_cents,
-    )
-    
-    request.session["order"] = {}
-    
-    return render(request, "orders/success.html")
+    request.session.pop("order", None)
+    return render(request, "payment-success.html")
 
 
 def payment_cancel(request):
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from payments.models import Payment
+from payments.models import Payment, StripeEvent
 
 
 
@@ -27,3 +27,28 @@ class PaymentAdmin(admin.ModelAdmin):
     
 
 admin.site.register(Payment, PaymentAdmin)
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    """
+    Admin interface for inspecting Stripe webhook events.
+
+    Failed events can be queued again with the `retry_events` action once the
+    cause has been fixed.
+
+    Attributes:
+        list_display (tuple): The fields to be displayed in the list view.
+        list_filter (tuple): The fields by which the list can be filtered.
+        search_fields (tuple): The fields to be searchable in the admin.
+        readonly_fields (tuple): The fields that cannot be edited in the admin.
+    """
+    list_display = ('event_id', 'type', 'status', 'attempts', 'created', 'processed_at')
+    list_filter = ('status', 'type')
+    search_fields = ('event_id',)
+    readonly_fields = ('created', 'updated', 'processed_at')
+    actions = ('retry_events',)
+
+    @admin.action(description="Process selected events again")
+    def retry_events(self, request, queryset):
+        queryset.exclude(status=StripeEvent.Status.PROCESSED).update(status=StripeEvent.Status.PENDING)
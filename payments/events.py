@@ -0,0 +1,158 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils.timezone import now
+
+from orders.models import Order, OrderItem
+from orders.reservations import commit_order_reservations
+from payments.models import Payment, StripeEvent
+from store.ranking import record_sales
+
+
+def record_event(event):
+    """
+    Store a verified Stripe event for later processing.
+
+    The insert is a single `INSERT ... ON CONFLICT DO NOTHING`, so Stripe
+    retries and replays of an event already stored are silently dropped.
+
+    Args:
+        event (dict): The decoded event body.
+    """
+    StripeEvent.objects.bulk_create(
+        [StripeEvent(event_id=event["id"], type=event["type"], payload=event)],
+        ignore_conflicts=True,
+    )
+
+
+def _complete_checkouts(sessions):
+    """
+    Mark the orders of several completed checkout sessions as paid.
+
+    Orders are updated with one UPDATE guarded by `is_paid=False`, their
+    reservations committed, their payments created in bulk and their items
+    added to the product sales ranks. Orders that are already paid are left
+    alone.
+
+    Args:
+        sessions (list): The `checkout.session.completed` session objects.
+
+    Returns:
+        int: The number of orders marked as paid.
+    """
+    amounts = {}
+    for session in sessions:
+        order_id = (session.get("metadata") or {}).get("order_id")
+        if order_id and session.get("payment_status", "paid") == "paid":
+            amounts[int(order_id)] = session.get("amount_total")
+
+    orders = list(
+        Order.objects.select_for_update().filter(id__in=amounts, is_paid=False).order_by("id")
+    )
+    if not orders:
+        return 0
+    order_ids = [order.id for order in orders]
+    Order.objects.filter(id__in=order_ids).update(
+        is_paid=True, status=Order.Status.PROCESSING, updated=now()
+    )
+    commit_order_reservations(order_ids)
+    Payment.objects.bulk_create([
+        Payment(order=order, total_cents=amounts[order.id] or order.total_cents)
+        for order in orders
+    ])
+    record_sales(dict(
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values_list("product__product_id")
+        .annotate(units=Sum("quantity"))
+        .order_by()
+    ))
+    return len(orders)
+
+
+# Event type mapped to the function applying a list of event objects
+HANDLERS = {
+    "checkout.session.completed": _complete_checkouts,
+}
+
+
+def _backoff(attempts):
+    """
+    Delay before the next attempt, doubling after every failure.
+    """
+    return timedelta(seconds=settings.STRIPE_EVENT_RETRY_BACKOFF * 2 ** (attempts - 1))
+
+
+def _apply(handler, events):
+    """
+    Apply events in a savepoint, so an error rolls back only their changes.
+    """
+    with transaction.atomic():
+        if handler is not None:
+            handler([event.payload["data"]["object"] for event in events])
+
+
+def process_pending_events(batch_size=100):
+    """
+    Apply one batch of recorded Stripe events.
+
+    Due events are claimed with `SELECT ... FOR UPDATE SKIP LOCKED` and
+    grouped by type, so each handler runs once for the whole batch. Types
+    without a handler are marked as processed. If a handler raises, the
+    events of its group are applied again one by one, each in its own
+    savepoint, so a single bad event cannot hold back the others. An event
+    that still fails stays pending and is retried with exponential backoff,
+    until `settings.STRIPE_EVENT_MAX_ATTEMPTS` is reached and it is marked
+    as failed.
+
+    Args:
+        batch_size (int, optional): Maximum number of events to process.
+
+    Returns:
+        tuple: The number of events processed and the number that failed.
+    """
+    processed = failed = 0
+    with transaction.atomic():
+        events = list(
+            StripeEvent.objects.select_for_update(skip_locked=True)
+            .filter(status=StripeEvent.Status.PENDING, next_attempt_at__lte=now())
+            .order_by("created", "id")[:batch_size]
+        )
+        if not events:
+            return processed, failed
+
+        by_type = {}
+        for event in events:
+            event.attempts += 1
+            by_type.setdefault(event.type, []).append(event)
+
+        for event_type, group in by_type.items():
+            handler = HANDLERS.get(event_type)
+            try:
+                _apply(handler, group)
+                applied = group
+            except Exception:
+                applied = []
+                for event in group:
+                    try:
+                        _apply(handler, [event])
+                    except Exception as error:
+                        failed += 1
+                        event.last_error = str(error)
+                        if event.attempts >= settings.STRIPE_EVENT_MAX_ATTEMPTS:
+                            event.status = StripeEvent.Status.FAILED
+                        else:
+                            event.next_attempt_at = now() + _backoff(event.attempts)
+                    else:
+                        applied.append(event)
+            processed += len(applied)
+            for event in applied:
+                event.status = StripeEvent.Status.PROCESSED
+                event.processed_at = now()
+                event.last_error = ""
+
+        StripeEvent.objects.bulk_update(
+            events, ["status", "attempts", "next_attempt_at", "last_error", "processed_at"]
+        )
+    return processed, failed
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from payments.events import process_pending_events
+
+
+class Command(BaseCommand):
+    """
+    Applies Stripe events recorded by the webhook.
+
+    Run it from cron, or keep it running with `--loop`.
+    """
+    help = "Process pending Stripe webhook events."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop", action="store_true", help="Keep processing instead of running once."
+        )
+        parser.add_argument(
+            "--interval", type=int, default=2, help="Seconds to wait when no event is pending with --loop."
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=100, help="Maximum number of events per batch."
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            processed, failed = process_pending_events(batch_size=options["batch_size"])
+            if processed or failed:
+                self.stdout.write(f"Processed {processed} event(s), {failed} failed.")
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
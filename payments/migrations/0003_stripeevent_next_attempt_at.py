@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-17 09:06
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_stripe_event'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='stripeevent',
+            name='stripe_event_status_idx',
+        ),
+        migrations.AddField(
+            model_name='stripeevent',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='stripeevent',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='stripe_event_status_next_idx'),
+        ),
+    ]
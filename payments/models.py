@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils.timezone import now
 from store.models import TimeStampedModel, Product, ProductVariation
 from shipping.models import ShippingInfo
 from django.contrib.auth import get_user_model
@@ -38,4 +39,64 @@ class Payment(TimeStampedModel):
         - verbose_name_plural: The plural name for the model in the admin interface.
         """
         verbose_name = "Payment"
-        verbose_name_plural = "Payments"
\ No newline at end of file
+        verbose_name_plural = "Payments"
+
+class StripeEvent(TimeStampedModel):
+    """
+    A Stripe webhook event, stored once per Stripe event id.
+
+    The webhook view only verifies the signature and records the event; the
+    `process_stripe_events` command applies it afterwards. Stripe retries and
+    replays hit the unique `event_id` and are ignored, so every event is
+    applied at most once.
+
+    Attributes:
+        event_id (CharField): The Stripe event id (`evt_...`).
+        type (CharField): The Stripe event type, e.g. `checkout.session.completed`.
+        payload (JSONField): The full event body.
+        status (CharField): Whether the event is pending, processed or failed.
+        attempts (PositiveIntegerField): Number of processing attempts so far.
+        next_attempt_at (DateTimeField): Earliest time of the next attempt.
+        last_error (TextField): The error raised by the last failed attempt.
+        processed_at (DateTimeField): When the event was applied.
+    """
+
+    class Status(models.TextChoices):
+        """
+        Processing state of a Stripe event.
+
+        Attributes:
+            PENDING: Recorded, waiting to be processed (again).
+            PROCESSED: Applied (or deliberately ignored).
+            FAILED: Gave up after too many attempts.
+        """
+        PENDING = ("pending", "Pending")
+        PROCESSED = ("processed", "Processed")
+        FAILED = ("failed", "Failed")
+
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(
+        choices=Status.choices, max_length=20, default=Status.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=now)
+    last_error = models.TextField(blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Stripe event"
+        verbose_name_plural = "Stripe events"
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="stripe_event_status_next_idx"),
+        ]
+
+    def __str__(self):
+        """
+        Return a string representation of the event.
+
+        Returns:
+            str: A string in the format '<type> <event_id> (<status>)'.
+        """
+        return f"{self.type} {self.event_id} ({self.status})"
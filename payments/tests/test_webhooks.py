@@ -0,0 +1,167 @@
+import hashlib
+import hmac
+import json
+import time
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from io import StringIO
+from django.utils.timezone import now
+from orders.models import Order, StockReservation
+from orders.reservations import reserve_stock
+from orders.tests.factories import OrderFactory, OrderItemFactory
+from payments.events import HANDLERS, process_pending_events
+from payments.models import Payment, StripeEvent
+from store.tests.factories import ProductVariationFactory
+
+pytestmark = pytest.mark.django_db
+
+WEBHOOK_SECRET = "whsec_test"
+
+
+@pytest.fixture(autouse=True)
+def webhook_secret(settings):
+    settings.STRIPE_WEBHOOK_SECRET = WEBHOOK_SECRET
+
+
+def checkout_completed(order, event_id="evt_1"):
+    """Builds a `checkout.session.completed` event body for an order"""
+    return json.dumps({
+        "id": event_id,
+        "type": "checkout.session.completed",
+        "data": {"object": {
+            "object": "checkout.session",
+            "payment_status": "paid",
+            "amount_total": order.total_cents,
+            "metadata": {"order_id": str(order.id)},
+        }},
+    })
+
+
+def post_event(client, payload, secret=WEBHOOK_SECRET):
+    """Posts a payload signed the way Stripe signs webhooks"""
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return client.post(
+        reverse("stripe-webhook"),
+        data=payload,
+        content_type="application/json",
+        HTTP_STRIPE_SIGNATURE=f"t={timestamp},v1={signature}",
+    )
+
+
+def test_webhook_records_event_without_processing_it(client):
+    order = OrderFactory()
+
+    response = post_event(client, checkout_completed(order))
+
+    assert response.status_code == 200
+    event = StripeEvent.objects.get()
+    assert (event.event_id, event.status) == ("evt_1", StripeEvent.Status.PENDING)
+    order.refresh_from_db()
+    assert not order.is_paid
+
+
+def test_webhook_rejects_bad_signature(client):
+    order = OrderFactory()
+
+    response = post_event(client, checkout_completed(order), secret="whsec_other")
+
+    assert response.status_code == 400
+    assert not StripeEvent.objects.exists()
+
+
+def test_webhook_ignores_replayed_events(client):
+    order = OrderFactory()
+
+    for _ in range(3):
+        assert post_event(client, checkout_completed(order)).status_code == 200
+
+    assert StripeEvent.objects.count() == 1
+
+
+def test_processing_marks_orders_paid_once(client):
+    variation = ProductVariationFactory(stock=5)
+    order = OrderFactory()
+    OrderItemFactory(order=order, product=variation, quantity=2)
+    reserve_stock(order, {variation.id: 2})
+    post_event(client, checkout_completed(order, "evt_1"))
+    # Stripe may deliver the same session under a new event id
+    post_event(client, checkout_completed(order, "evt_2"))
+
+    call_command("process_stripe_events", stdout=StringIO())
+
+    order.refresh_from_db()
+    assert order.is_paid
+    assert order.status == "processing"
+    assert Payment.objects.get().total_cents == order.total_cents
+    assert order.reservations.get().status == StockReservation.Status.COMMITTED
+    variation.refresh_from_db()
+    assert variation.stock == 3
+    assert variation.product.sales_rank.units_sold == 2
+    assert set(StripeEvent.objects.values_list("status", flat=True)) == {StripeEvent.Status.PROCESSED}
+
+
+def test_processing_a_batch_runs_a_bounded_number_of_queries(client, django_assert_max_num_queries):
+    for index in range(20):
+        post_event(client, checkout_completed(OrderFactory(), f"evt_{index}"))
+
+    with django_assert_max_num_queries(15):
+        assert process_pending_events() == (20, 0)
+    assert Payment.objects.count() == 20
+
+
+def test_unknown_event_types_are_marked_processed(client):
+    payload = json.dumps({"id": "evt_1", "type": "customer.created", "data": {"object": {}}})
+    post_event(client, payload)
+
+    assert process_pending_events() == (1, 0)
+    assert StripeEvent.objects.get().status == StripeEvent.Status.PROCESSED
+
+
+def test_a_failing_event_does_not_hold_back_the_rest_of_its_batch(client, monkeypatch, settings):
+    settings.STRIPE_EVENT_MAX_ATTEMPTS = 2
+    applied = []
+
+    def handle(objects):
+        for obj in objects:
+            OrderFactory()
+            if obj.get("broken"):
+                raise ValueError("Broken event")
+            applied.append(obj["name"])
+
+    monkeypatch.setitem(HANDLERS, "test.event", handle)
+    for name in ("first", "broken", "last"):
+        post_event(client, json.dumps({
+            "id": f"evt_{name}", "type": "test.event", "data": {"object": {"name": name, "broken": name == "broken"}},
+        }))
+
+    assert process_pending_events() == (2, 1)
+
+    # The batch was rolled back, then each event applied on its own
+    assert applied == ["first", "first", "last"]
+    assert Order.objects.count() == 2
+    broken = StripeEvent.objects.get(event_id="evt_broken")
+    assert broken.status == StripeEvent.Status.PENDING
+    assert broken.next_attempt_at > now()
+    assert "Broken event" in broken.last_error
+
+    # Not due yet
+    assert process_pending_events() == (0, 0)
+
+    StripeEvent.objects.update(next_attempt_at=now())
+    assert process_pending_events() == (0, 1)
+    broken.refresh_from_db()
+    assert (broken.status, broken.attempts) == (StripeEvent.Status.FAILED, 2)
+
+
+def test_success_page_has_no_side_effect(client):
+    order = OrderFactory()
+
+    response = client.get(reverse("success"), {"order_id": order.id})
+
+    assert response.status_code == 200
+    order.refresh_from_db()
+    assert not order.is_paid
+    assert not Payment.objects.exists()
@@ -0,0 +1,7 @@
+from django.urls import path
+from payments.views import stripe_webhook
+
+
+urlpatterns = [
+    path("webhook/", stripe_webhook, name="stripe-webhook"),
+]
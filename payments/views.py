@@ -0,0 +1,40 @@
+import json
+
+import stripe
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from payments.events import record_event
+
+
+@csrf_exempt
+@require_POST
+def stripe_webhook(request):
+    """
+    Receives Stripe webhook events.
+
+    The signature is verified against `settings.STRIPE_WEBHOOK_SECRET` and the
+    event is stored for the `process_stripe_events` command; nothing else
+    happens on the request path, so Stripe gets its acknowledgement at once.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        HttpResponse: 200 once the event is recorded, 400 if it cannot be verified.
+    """
+    if not settings.STRIPE_WEBHOOK_SECRET:
+        return HttpResponse(status=400)
+    try:
+        stripe.Webhook.construct_event(
+            request.body,
+            request.headers.get("Stripe-Signature", ""),
+            settings.STRIPE_WEBHOOK_SECRET,
+        )
+    except (ValueError, stripe.SignatureVerificationError):
+        return HttpResponse(status=400)
+
+    record_event(json.loads(request.body))
+    return HttpResponse(status=200)
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from store.models import TimeStampedModel, Product
 from django.contrib.auth import get_user_model
 from django.utils.timezone import now
@@ -61,6 +61,32 @@ class Review(TimeStampedModel):
     If the user is deleted, associated reviews are also deleted.
     """
 
+    def save(self, *args, **kwargs):
+        """
+        Saves the review and updates the rating aggregates of its product.
+
+        A new review is added to the aggregates with one incremental UPDATE;
+        an edited one has its product's aggregates recomputed, since its
+        previous rating is not known. Deletions are counted out by the
+        `reviews.signals.remove_deleted_rating` receiver.
+        """
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                Product.adjust_rating(self.product_id, self.rating, 1)
+            else:
+                Product.refresh_ratings([self.product_id])
+        self.refresh_product_pages()
+
+    def refresh_product_pages(self):
+        """
+        Purges the cached pages of the reviewed product.
+        """
+        from store.pagecache import product_key, purge_surrogate_keys
+
+        purge_surrogate_keys(product_key(self.product_id))
+
     @property
     def from_user(self):
         """
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from reviews.models import Review
+from store.models import Product
+
+
+@receiver(post_delete, sender=Review, dispatch_uid="reviews.remove_deleted_rating")
+def remove_deleted_rating(sender, instance, **kwargs):
+    """
+    Remove a deleted review from the rating aggregates of its product.
+
+    A receiver rather than `Review.delete`, so reviews deleted by a queryset
+    or by the cascade of a deleted user are counted out too. Runs inside the
+    deletion's transaction.
+    """
+    Product.adjust_rating(instance.product_id, instance.rating, -1)
+    instance.refresh_product_pages()
@@ -75,3 +75,67 @@ class TestReviewModel:
         # Check if the reverse relationship works
         assert product.reviews.count() == 1
         assert review.product == product
+
+
+@pytest.mark.django_db
+def test_reviews_update_product_rating_aggregates():
+    product = ProductFactory()
+    ReviewFactory(product=product, rating=5)
+    ReviewFactory(product=product, rating=4)
+    last = ReviewFactory(product=product, rating=4)
+
+    product.refresh_from_db()
+    assert (product.rating_count, product.rating_sum) == (3, 13)
+    assert product.rating_avg == pytest.approx(13 / 3)
+    assert [count for stars, count, percent in product.rating_histogram] == [1, 2, 0, 0, 0]
+
+    last.delete()
+    product.refresh_from_db()
+    assert (product.rating_count, product.rating_avg, product.rating_4_count) == (2, 4.5, 1)
+
+
+@pytest.mark.django_db
+def test_editing_a_rating_recomputes_the_aggregates():
+    product = ProductFactory()
+    review = ReviewFactory(product=product, rating=1)
+
+    review.rating = 3
+    review.save()
+
+    product.refresh_from_db()
+    assert (product.rating_count, product.rating_avg, product.rating_1_count, product.rating_3_count) == (1, 3.0, 0, 1)
+
+
+@pytest.mark.django_db
+def test_deleting_the_last_review_resets_the_average():
+    product = ProductFactory()
+    ReviewFactory(product=product, rating=2).delete()
+
+    product.refresh_from_db()
+    assert (product.rating_count, product.rating_avg) == (0, 0)
+
+
+@pytest.mark.django_db
+def test_deleting_a_user_removes_their_ratings():
+    product = ProductFactory()
+    user = UserFactory()
+    ReviewFactory(product=product, user=user, rating=1)
+    ReviewFactory(product=product, user=user, rating=2)
+    ReviewFactory(product=product, rating=5)
+
+    user.delete()
+
+    product.refresh_from_db()
+    assert (product.rating_count, product.rating_avg, product.rating_1_count, product.rating_2_count) == (1, 5.0, 0, 0)
+
+
+@pytest.mark.django_db
+def test_deleting_reviews_in_bulk_removes_their_ratings():
+    product = ProductFactory()
+    ReviewFactory(product=product, rating=3)
+    ReviewFactory(product=product, rating=4)
+
+    Review.objects.filter(product=product, rating=3).delete()
+
+    product.refresh_from_db()
+    assert (product.rating_count, product.rating_sum, product.rating_3_count) == (1, 4, 0)
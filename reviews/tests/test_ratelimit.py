@@ -0,0 +1,90 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from helpers.ratelimit import RateLimit, client_ip, consume
+from reviews.models import Review
+from store.tests.factories import ProductFactory
+
+pytestmark = pytest.mark.django_db
+
+REVIEW = {"name": "Sam", "email": "sam@example.com", "rating": 4, "review": "Fits well"}
+
+
+def test_bucket_allows_a_burst_then_refills():
+    limit = RateLimit("test", capacity=2, period=60)
+
+    assert consume(limit, "client", now=0) == 0
+    assert consume(limit, "client", now=0) == 0
+    assert consume(limit, "client", now=0) == pytest.approx(30)
+    # One token is back after period / capacity seconds
+    assert consume(limit, "client", now=30) == 0
+    assert consume(limit, "client", now=30) > 0
+
+
+def test_buckets_are_per_client():
+    limit = RateLimit("test", capacity=1, period=60)
+
+    assert consume(limit, "first", now=0) == 0
+    assert consume(limit, "second", now=0) == 0
+    assert consume(limit, "first", now=0) > 0
+
+
+def test_review_flood_is_refused_before_the_database(client):
+    product = ProductFactory()
+    url = reverse("product-review", args=[product.slug])
+
+    for _ in range(2):
+        assert client.post(url, REVIEW).status_code == 302
+    with CaptureQueriesContext(connection) as queries:
+        response = client.post(url, REVIEW)
+
+    assert response.status_code == 429
+    assert int(response["Retry-After"]) > 0
+    assert len(queries) == 0
+    assert Review.objects.filter(product=product).count() == 2
+
+
+def test_review_limit_is_per_address(client):
+    product = ProductFactory()
+    url = reverse("product-review", args=[product.slug])
+    for _ in range(2):
+        client.post(url, REVIEW)
+
+    response = client.post(url, REVIEW, REMOTE_ADDR="10.0.0.2")
+
+    assert response.status_code == 302
+
+
+def test_client_ip_trusts_only_the_entries_added_by_proxies(rf, settings):
+    forged = rf.get("/", HTTP_X_FORWARDED_FOR="1.1.1.1, 203.0.113.7", REMOTE_ADDR="10.0.0.1")
+
+    settings.RATE_LIMIT_PROXY_COUNT = 0
+    assert client_ip(forged) == "10.0.0.1"
+
+    settings.RATE_LIMIT_PROXY_COUNT = 1
+    assert client_ip(forged) == "203.0.113.7"
+    # A request that did not come through the proxy falls back to the socket
+    assert client_ip(rf.get("/", REMOTE_ADDR="10.0.0.1")) == "10.0.0.1"
+
+
+def test_forged_forwarded_for_does_not_escape_the_limit(client, settings):
+    settings.RATE_LIMIT_PROXY_COUNT = 1
+    product = ProductFactory()
+    url = reverse("product-review", args=[product.slug])
+    for index in range(2):
+        client.post(url, REVIEW, HTTP_X_FORWARDED_FOR=f"10.9.9.{index}, 203.0.113.7")
+
+    response = client.post(url, REVIEW, HTTP_X_FORWARDED_FOR="10.9.9.9, 203.0.113.7")
+
+    assert response.status_code == 429
+
+
+def test_limits_can_be_disabled(client, settings):
+    settings.RATE_LIMIT_ENABLED = False
+    product = ProductFactory()
+    url = reverse("product-review", args=[product.slug])
+
+    for _ in range(3):
+        assert client.post(url, REVIEW).status_code == 302
@@ -2,14 +2,24 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import View
 from reviews.forms import ReviewForm
 from store.models import Product
+from helpers.ratelimit import RateLimit, RateLimitMixin
 
-class ReviewProductView(View):
+class ReviewProductView(RateLimitMixin, View):
     """
     View for submitting a product review.
 
     This view handles the `POST` request to submit a review for a specific product.
     If the user is authenticated, the review will be linked to their account.
+
+    Submissions are throttled per client address, per session and per
+    address and product, so review floods are refused before reaching the
+    database.
     """
+    rate_limits = (
+        RateLimit("review-ip", capacity=10, period=60 * 60, key=("ip",)),
+        RateLimit("review-session", capacity=5, period=60 * 60, key=("session",)),
+        RateLimit("review-product", capacity=2, period=24 * 60 * 60, key=("ip", "slug")),
+    )
 
     def post(self, request, slug):
         """
@@ -202,4 +202,78 @@ document.addEventListener('DOMContentLoaded', function () {
           }
       });
   });
-});
\ No newline at end of file
+});
+/* product variant switcher: colors and sizes are switched in place from the
+   product's variant matrix (fetched once, revalidated with its ETag) */
+document.addEventListener('DOMContentLoaded', function () {
+  const section = document.querySelector('[data-variants-url]');
+  if (!section) return;
+  let matrix = null;
+
+  function loadMatrix() {
+    if (!matrix) {
+      matrix = fetch(section.dataset.variantsUrl, { headers: { Accept: 'application/json' } })
+        .then(function (response) {
+          if (!response.ok) throw new Error(response.status);
+          return response.json();
+        });
+    }
+    return matrix;
+  }
+
+  function pickerLink(variant, child) {
+    const link = document.createElement('a');
+    link.href = '?variant_slug=' + variant.slug;
+    link.dataset.variantSlug = variant.slug;
+    link.appendChild(child);
+    return link;
+  }
+
+  function render(data, variant) {
+    const mainImage = document.getElementById('main-image');
+    mainImage.srcset = variant.image_srcset || '';
+    mainImage.src = variant.image || '';
+    document.getElementById('variant-price').textContent = '$' + (variant.final_price_cents / 100).toFixed(2);
+    document.getElementById('variant-availability').textContent = variant.is_active ? ' In Stock' : ' Out of Stock';
+    document.getElementById('variant-cart-form').action = section.dataset.cartUrl.replace('__slug__', variant.slug);
+
+    const sizes = document.getElementById('same-color');
+    sizes.replaceChildren.apply(sizes, data.variants
+      .filter(function (other) { return other.color === variant.color && other.is_active && other.id !== variant.id; })
+      .map(function (other) {
+        const label = document.createElement('p');
+        label.textContent = other.size + ' ';
+        return pickerLink(other, label);
+      }));
+
+    const seen = {};
+    const colors = document.getElementById('other-colors');
+    colors.replaceChildren.apply(colors, data.variants
+      .filter(function (other) {
+        if (!other.is_active || other.color === variant.color || seen[other.color]) return false;
+        return (seen[other.color] = true);
+      })
+      .map(function (other) {
+        const image = document.createElement('img');
+        image.src = other.thumbnail || '';
+        image.className = 'object-cover object-center max-h-30 max-w-full rounded-lg cursor-pointer';
+        image.alt = other.color;
+        return pickerLink(other, image);
+      }));
+
+    history.replaceState(null, '', '?variant_slug=' + variant.slug);
+  }
+
+  section.addEventListener('click', function (event) {
+    const link = event.target.closest('[data-variant-slug]');
+    if (!link) return;
+    event.preventDefault();
+    loadMatrix()
+      .then(function (data) {
+        const variant = data.variants.find(function (v) { return v.slug === link.dataset.variantSlug; });
+        if (!variant) throw new Error('unknown variant');
+        render(data, variant);
+      })
+      .catch(function () { window.location = link.href; });
+  });
+});
@@ -51,6 +51,14 @@ class ProductAdmin(admin.ModelAdmin):
         return obj.get_url()
     get_url.short_description = "Product URL"  # Set a short description for the field
 
+    def save_related(self, request, form, formsets, change):
+        """
+        Refreshes the product's read models once its tags have been saved,
+        so the search vector includes them.
+        """
+        super().save_related(request, form, formsets, change)
+        form.instance.refresh_read_models()
+
 @admin.register(ProductVariation)
 class ProductVariationAdmin(admin.ModelAdmin):
     """
@@ -68,6 +76,20 @@ class ProductVariationAdmin(admin.ModelAdmin):
     search_fields = ("sku", "product__name", "size")  # Search by SKU, product name, or size
     ordering = ["product", "color"]  # Order variations by product and color
     readonly_fields = ["sku",]  # SKU is a read-only field
+    actions = ["make_featured"]
+
+    @admin.action(description="Make featured (one per product)")
+    def make_featured(self, request, queryset):
+        """
+        Features the selected variations in one set-based swap. When several
+        variations of the same product are selected, the oldest one wins.
+        """
+        chosen = {}
+        for variation_id, product_id in queryset.order_by("-id").values_list("id", "product_id"):
+            chosen[product_id] = variation_id
+        ProductVariation.set_featured_variations(list(chosen.values()))
+        for product in Product.objects.filter(id__in=chosen):
+            product.refresh_read_models()
 
 @admin.register(Brand)
 class BrandAdmin(admin.ModelAdmin):
@@ -0,0 +1,194 @@
+import time
+from collections import namedtuple
+from dataclasses import dataclass, field
+
+from django.core.cache import cache
+
+from store.models import Category
+
+# Cache key holding the pickled tree, and seconds it is kept: a rebuild
+# racing a category change in another process is corrected by the next one
+CATEGORY_TREE_KEY = "store:category-tree"
+CATEGORY_TREE_TIMEOUT = 60 * 60
+
+# Cache key, format version and seconds kept of the header menu; bump the
+# format version whenever the shape of `CategoryMenuItem` changes so stale
+# entries are never read
+CATEGORY_MENU_KEY = "store:category-menu"
+CATEGORY_MENU_VERSION = 1
+CATEGORY_MENU_TIMEOUT = 60 * 60
+
+# Cache key of the counter the menu is stored under; every category change
+# increments it, so every process moves to a fresh entry at once
+CATEGORY_MENU_COUNTER_KEY = "store:category-menu-counter"
+
+# A header menu entry: plain tuples pickle small and render without queries
+CategoryMenuItem = namedtuple("CategoryMenuItem", ["name", "slug", "children"])
+
+
+@dataclass
+class CategoryNode:
+    """
+    A category as held in the cached tree.
+
+    Attributes:
+        id (int): The category id.
+        name (str): The category name.
+        slug (str): The category slug, used in the shop query string.
+        path (str): The materialized path of the category.
+        parent_id (int): The parent category id, or None for a root.
+        children (list): The child nodes, sorted by name.
+    """
+    id: int
+    name: str
+    slug: str
+    path: str
+    parent_id: int = None
+    children: list = field(default_factory=list)
+
+    @property
+    def depth(self):
+        return self.path.count("/") - 1
+
+
+class CategoryTree:
+    """
+    The whole category hierarchy, built in one query and kept in the cache.
+
+    Menus, breadcrumbs and descendant lookups are answered from memory. The
+    tree lives in the shared cache for `CATEGORY_TREE_TIMEOUT` seconds at
+    most; it is dropped whenever a category is saved or deleted and rebuilt
+    on the next read.
+    """
+
+    def __init__(self, nodes):
+        self.by_id = {node.id: node for node in nodes}
+        self.by_slug = {node.slug: node for node in nodes}
+        self.roots = []
+        for node in sorted(nodes, key=lambda node: node.name.lower()):
+            parent = self.by_id.get(node.parent_id)
+            if parent is None:
+                self.roots.append(node)
+            else:
+                parent.children.append(node)
+
+    @classmethod
+    def build(cls):
+        """
+        Build the tree for every category in a single query.
+
+        Returns:
+            CategoryTree: The freshly built tree.
+        """
+        rows = Category.objects.values_list("id", "name", "slug", "path", "parent_id")
+        return cls([CategoryNode(*row) for row in rows])
+
+    def get(self, key):
+        """
+        Return the node with the given id or slug, or None.
+        """
+        if isinstance(key, int):
+            return self.by_id.get(key)
+        return self.by_slug.get(key)
+
+    def ancestors(self, key, include_self=True):
+        """
+        Return the chain of nodes from the root down to a category.
+
+        Args:
+            key (int | str): The category id or slug.
+            include_self (bool): Whether the category itself ends the chain.
+
+        Returns:
+            list: The `CategoryNode` chain, empty for an unknown category.
+        """
+        node = self.get(key)
+        if node is None:
+            return []
+        chain = [self.by_id[int(node_id)] for node_id in node.path.split("/")[:-1] if int(node_id) in self.by_id]
+        return chain if include_self else chain[:-1]
+
+    def descendants(self, key, include_self=True):
+        """
+        Return a category and every category below it.
+
+        Args:
+            key (int | str): The category id or slug.
+            include_self (bool): Whether the category itself is included.
+
+        Returns:
+            list: The matching `CategoryNode` objects, empty for an unknown category.
+        """
+        node = self.get(key)
+        if node is None:
+            return []
+        nodes = [
+            other for other in self.by_id.values()
+            if other.path.startswith(node.path) and (include_self or other is not node)
+        ]
+        return sorted(nodes, key=lambda other: other.path)
+
+
+def get_category_tree():
+    """
+    Return the cached category tree, building it on a cache miss.
+    """
+    tree = cache.get(CATEGORY_TREE_KEY)
+    if tree is None:
+        tree = CategoryTree.build()
+        cache.set(CATEGORY_TREE_KEY, tree, CATEGORY_TREE_TIMEOUT)
+    return tree
+
+
+def _menu_items(nodes):
+    return tuple(CategoryMenuItem(node.name, node.slug, _menu_items(node.children)) for node in nodes)
+
+
+def _menu_counter():
+    """
+    Return the current menu counter, starting one if there is none.
+
+    A counter that was evicted restarts from the clock rather than from 1, so
+    menus stored under an earlier count are never read again.
+    """
+    counter = cache.get(CATEGORY_MENU_COUNTER_KEY)
+    if counter is None:
+        counter = time.time_ns()
+        # Another process may have started the counter in the meantime
+        if not cache.add(CATEGORY_MENU_COUNTER_KEY, counter, None):
+            counter = cache.get(CATEGORY_MENU_COUNTER_KEY, counter)
+    return counter
+
+
+def get_category_menu():
+    """
+    Return the header menu as nested `CategoryMenuItem` tuples.
+
+    The hot path is two cache reads: the menu counter, then the menu stored
+    under it. On a miss the menu is derived from the category tree and stored
+    in the shared cache until the next category change, or
+    `CATEGORY_MENU_TIMEOUT` seconds at most.
+
+    Returns:
+        tuple: The root categories, each with its children, sorted by name.
+    """
+    menu_key = f"{CATEGORY_MENU_KEY}:{CATEGORY_MENU_VERSION}"
+    counter = _menu_counter()
+    menu = cache.get(menu_key, version=counter)
+    if menu is None:
+        menu = _menu_items(get_category_tree().roots)
+        cache.set(menu_key, menu, CATEGORY_MENU_TIMEOUT, version=counter)
+    return menu
+
+
+def invalidate_category_tree():
+    """
+    Drop the cached tree and move the header menu to a new counter so both
+    are rebuilt on the next read.
+    """
+    cache.delete(CATEGORY_TREE_KEY)
+    try:
+        cache.incr(CATEGORY_MENU_COUNTER_KEY)
+    except ValueError:
+        # No counter yet: the next read starts a fresh one
+        pass
@@ -1,22 +1,19 @@
-from store.models import Category
+from store.categories import get_category_menu
 
 def categories(request):
     """
-    Retrieves all categories from the database and returns them as a context dictionary.
+    Provides the category menu rendered in the header of every page.
     
     Args:
         request (HttpRequest): The HTTP request object that contains metadata about the request.
         
     Returns:
-        dict: A dictionary containing all categories retrieved from the database.
-            Key: 'categories' - A queryset of all categories in the store.
+        dict: A dictionary containing the category menu.
+            Key: 'categories' - A tuple of `CategoryMenuItem` (name, slug, children)
+            for the root categories.
     
-    Example:
-        When this function is called, it fetches all Category objects and prepares them to be
-        rendered in a template or used in an API response.
-        
     Note:
-        This function does not include pagination or any other filter, it simply returns all categories.
+        The menu is served from the cache and costs no database query; it is
+        invalidated whenever a category is saved or deleted.
     """
-    categories = Category.objects.all()
-    return {"categories": categories}
+    return {"categories": get_category_menu()}
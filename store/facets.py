@@ -0,0 +1,253 @@
+import time
+import uuid
+from dataclasses import dataclass, field
+
+from django.core.cache import cache
+
+from store.categories import get_category_tree
+from store.models import Product, ProductVariation
+
+# Facets exposed on the shop page, in display order
+FACETS = ("category", "brand", "size", "color", "on_sale")
+
+# Cache key holding the pickled index, and seconds it is kept: a change
+# missed by an incremental update is corrected by the next rebuild at worst
+FACET_INDEX_KEY = "store:facet-index"
+FACET_INDEX_TIMEOUT = 15 * 60
+
+# Lock serializing incremental updates, seconds it may be held, and seconds
+# an update waits for it before dropping the index instead
+FACET_INDEX_LOCK_KEY = "store:facet-index:lock"
+FACET_INDEX_LOCK_TIMEOUT = 10
+FACET_INDEX_LOCK_WAIT = 2
+
+
+def _bits_to_ids(bitmap):
+    """
+    Expand a bitmap into the sorted list of product ids it contains.
+    """
+    ids = []
+    while bitmap:
+        lowest = bitmap & -bitmap
+        ids.append(lowest.bit_length() - 1)
+        bitmap ^= lowest
+    return ids
+
+
+@dataclass(frozen=True)
+class FacetValue:
+    """
+    A single facet option as rendered on the shop page.
+
+    Attributes:
+        value (str): The value used in the query string.
+        label (str): The human readable label.
+        count (int): Number of products matching the current filters with this value.
+    """
+    value: str
+    label: str
+    count: int
+
+
+@dataclass
+class FacetResult:
+    """
+    Result of a faceted search.
+
+    Attributes:
+        ids (list): Ids of the matching products.
+        counts (dict): Facet name mapped to a list of `FacetValue`.
+        filtered (bool): Whether any filter was applied.
+    """
+    ids: list
+    counts: dict = field(default_factory=dict)
+    filtered: bool = False
+
+
+class FacetIndex:
+    """
+    In-memory inverted index over the active catalog.
+
+    For every facet value the index keeps a posting list of product ids stored
+    as an integer bitmap (bit `n` set means product `n` matches), so any
+    combination of filters resolves to a handful of bitwise ANDs.
+    """
+
+    def __init__(self):
+        self.universe = 0
+        self.postings = {facet: {} for facet in FACETS}
+        self.labels = {facet: {} for facet in FACETS}
+
+    @classmethod
+    def build(cls):
+        """
+        Build the index for the whole catalog in two queries.
+
+        Returns:
+            FacetIndex: The freshly built index.
+        """
+        index = cls()
+        index._load(Product.objects.all(), ProductVariation.objects.all())
+        return index
+
+    def _load(self, products, variations):
+        """
+        Add the given products and their active variations to the index.
+
+        Products are posted under their category and each of its ancestors,
+        so filtering on a category also matches its subcategories.
+        """
+        tree = get_category_tree()
+        rows = products.filter(card__is_active=True).values_list(
+            "id", "category_id", "category__slug", "category__name", "brand__name", "card__on_sale"
+        )
+        for product_id, category_id, category_slug, category_name, brand_name, on_sale in rows:
+            self.universe |= 1 << product_id
+            # A product is listed under its category and every ancestor of it
+            categories = [(node.slug, node.name) for node in tree.ancestors(category_id)]
+            for slug, name in categories or [(category_slug, category_name)]:
+                self._add("category", slug, name, product_id)
+            self._add("brand", brand_name, brand_name, product_id)
+            if on_sale:
+                self._add("on_sale", "1", "On sale", product_id)
+
+        rows = variations.filter(is_active=True, product__card__is_active=True).values_list(
+            "product_id", "size__name", "color"
+        )
+        for product_id, size_name, color in rows:
+            self._add("size", size_name, size_name, product_id)
+            self._add("color", color.lower(), color.lower(), product_id)
+
+    def _add(self, facet, value, label, product_id):
+        postings = self.postings[facet]
+        postings[value] = postings.get(value, 0) | (1 << product_id)
+        self.labels[facet][value] = label
+
+    def discard(self, product_id):
+        """
+        Remove a product from the universe and every posting list.
+        """
+        mask = ~(1 << product_id)
+        self.universe &= mask
+        for facet in FACETS:
+            postings = self.postings[facet]
+            for value in list(postings):
+                postings[value] &= mask
+                if not postings[value]:
+                    del postings[value]
+                    self.labels[facet].pop(value, None)
+
+    def reindex(self, product_ids):
+        """
+        Re-read several products and their variations into the index, in
+        two queries.
+        """
+        product_ids = list(product_ids)
+        for product_id in product_ids:
+            self.discard(product_id)
+        self._load(
+            Product.objects.filter(id__in=product_ids),
+            ProductVariation.objects.filter(product_id__in=product_ids),
+        )
+
+    def search(self, filters):
+        """
+        Resolve the given filters and compute live facet counts.
+
+        Counts for a facet ignore that facet's own filter, so the shop can
+        offer alternative values next to the one currently selected. Values
+        with no matching product are left out.
+
+        Args:
+            filters (dict): Facet name mapped to the selected value (falsy values are ignored).
+
+        Returns:
+            FacetResult: Matching product ids and per-facet counts.
+        """
+        selected = {}
+        for facet in FACETS:
+            value = filters.get(facet)
+            if value:
+                if facet == "color":
+                    value = value.lower()
+                selected[facet] = self.postings[facet].get(str(value), 0)
+
+        matches = self.universe
+        for bitmap in selected.values():
+            matches &= bitmap
+
+        counts = {}
+        for facet in FACETS:
+            base = self.universe
+            for other, bitmap in selected.items():
+                if other != facet:
+                    base &= bitmap
+            values = []
+            for value, bitmap in self.postings[facet].items():
+                count = (base & bitmap).bit_count()
+                if count:
+                    values.append(FacetValue(value, self.labels[facet][value], count))
+            counts[facet] = sorted(values, key=lambda facet_value: facet_value.label.lower())
+
+        return FacetResult(ids=_bits_to_ids(matches), counts=counts, filtered=bool(selected))
+
+
+def get_facet_index():
+    """
+    Return the cached facet index, building it on a cache miss.
+    """
+    index = cache.get(FACET_INDEX_KEY)
+    if index is None:
+        index = FacetIndex.build()
+        cache.set(FACET_INDEX_KEY, index, FACET_INDEX_TIMEOUT)
+    return index
+
+
+def reindex_product(product_id):
+    """
+    Incrementally refresh one product in the cached index.
+    """
+    reindex_products([product_id])
+
+
+def reindex_products(product_ids):
+    """
+    Incrementally refresh several products in the cached index, with a
+    single write of the index for the whole batch.
+
+    Each update rewrites the whole cached index, so updates are serialized
+    by a lock kept in the cache; without it, two concurrent saves would each
+    write back an index missing the other's change. An update that cannot
+    take the lock in time breaks it and drops the index, which also makes
+    the holder drop its copy instead of writing it.
+
+    Nothing is done when no index is cached yet; the next read builds it.
+    """
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + FACET_INDEX_LOCK_WAIT
+    while not cache.add(FACET_INDEX_LOCK_KEY, token, FACET_INDEX_LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            cache.delete(FACET_INDEX_LOCK_KEY)
+            invalidate_facet_index()
+            return
+        time.sleep(0.05)
+    try:
+        index = cache.get(FACET_INDEX_KEY)
+        if index is None:
+            return
+        index.reindex(product_ids)
+        if cache.get(FACET_INDEX_LOCK_KEY) == token:
+            cache.set(FACET_INDEX_KEY, index, FACET_INDEX_TIMEOUT)
+        else:
+            # The lock was broken or expired: another update may be missing
+            invalidate_facet_index()
+    finally:
+        if cache.get(FACET_INDEX_LOCK_KEY) == token:
+            cache.delete(FACET_INDEX_LOCK_KEY)
+
+
+def invalidate_facet_index():
+    """
+    Drop the cached index so it is rebuilt on the next read.
+    """
+    cache.delete(FACET_INDEX_KEY)
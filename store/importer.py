@@ -0,0 +1,322 @@
+import csv
+import decimal
+import json
+import time
+import uuid
+from dataclasses import dataclass
+from itertools import islice
+
+from django.db import transaction
+
+from store.categories import invalidate_category_tree
+from store.facets import invalidate_facet_index
+from store.models import (
+    Brand, Category, Product, ProductCard, ProductSalesRank, ProductVariation, Size, UniqueSlugField,
+)
+from store.pagecache import MENU_KEY, purge_surrogate_keys
+from store.search import update_search_vectors
+from store.variants import invalidate_variant_matrices
+
+# Columns every row must provide; the others are optional
+REQUIRED_COLUMNS = ("product", "category", "brand", "base_price_cents", "size", "color")
+
+
+class CatalogImportError(Exception):
+    """
+    Raised when a catalog file cannot be imported.
+    """
+
+
+def read_rows(path):
+    """
+    Stream the rows of a `.csv` or `.jsonl` catalog file as dictionaries.
+
+    Args:
+        path (str): The file to read.
+
+    Raises:
+        CatalogImportError: If the file extension is not supported.
+    """
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as handle:
+            yield from csv.DictReader(handle)
+    elif path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as handle:
+            for line in handle:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        raise CatalogImportError(f"Unsupported catalog format: {path}")
+
+
+@dataclass
+class ImportStats:
+    """
+    Counters reported by `CatalogImporter`.
+
+    Attributes:
+        rows (int): Rows read.
+        products_created (int): New products.
+        variations_created (int): New variations.
+        variations_updated (int): Existing variations updated.
+        seconds (float): Wall time spent importing.
+    """
+    rows: int = 0
+    products_created: int = 0
+    variations_created: int = 0
+    variations_updated: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+class SlugAllocator:
+    """
+    Hands out unique slugs for a `UniqueSlugField` from an in-memory set of
+    the slugs already taken, using the same `<slug>-<n>` scheme as the field
+    itself but without a uniqueness query per row.
+    """
+
+    def __init__(self, model, field_name="slug"):
+        self.field = model._meta.get_field(field_name)
+        self.taken = set(model.objects.values_list(field_name, flat=True))
+
+    def allocate(self, value):
+        base = self.field.slugify(value)[:self.field.max_length] or self.field.model._meta.model_name
+        slug, index = base, 1
+        while slug in self.taken:
+            index += 1
+            suffix = f"{self.field.index_sep}{index}"
+            slug = f"{base[:self.field.max_length - len(suffix)]}{suffix}"
+        self.taken.add(slug)
+        return slug
+
+    def assign(self, instance, value):
+        """
+        Give an instance a fresh slug built from `value`, marked as allocated
+        so saving it skips the uniqueness query.
+        """
+        UniqueSlugField.mark_allocated(instance, self.allocate(value), self.field.attname)
+        return instance
+
+
+class CatalogImporter:
+    """
+    Bulk loader for product catalogs.
+
+    Rows (one per variation) are processed in chunks. Brands, categories,
+    sizes and products are resolved through in-memory maps, missing ones are
+    created with `bulk_create`, slugs and SKUs are allocated in memory, and
+    variations are inserted or updated in bulk. Each chunk runs in its own
+    transaction and ends with one set-based swap of the featured variations
+    it flags, followed by a bulk refresh of the cards of its products.
+
+    Args:
+        chunk_size (int): Number of rows per chunk.
+    """
+
+    def __init__(self, chunk_size=1000):
+        self.chunk_size = chunk_size
+        self.brands = dict(Brand.objects.values_list("name", "id"))
+        self.categories = dict(Category.objects.values_list("name", "id"))
+        self.sizes = dict(Size.objects.values_list("name", "id"))
+        self.products = dict(Product.objects.values_list("name", "id"))
+        self.variations = {
+            (product_id, color.lower(), size_id): variation_id
+            for variation_id, product_id, color, size_id
+            in ProductVariation.objects.values_list("id", "product_id", "color", "size_id")
+        }
+        self.category_slugs = SlugAllocator(Category)
+        self.product_slugs = SlugAllocator(Product)
+        self.variation_slugs = SlugAllocator(ProductVariation)
+        self.skus = set(ProductVariation.objects.values_list("sku", flat=True))
+
+    def run(self, rows, progress=None):
+        """
+        Import an iterable of rows.
+
+        Args:
+            rows (iterable): Dictionaries with at least `REQUIRED_COLUMNS`.
+            progress (callable, optional): Called with the running `ImportStats`
+                after every chunk.
+
+        Returns:
+            ImportStats: The import counters.
+        """
+        stats = ImportStats()
+        started = time.monotonic()
+        rows = iter(rows)
+        try:
+            while True:
+                chunk = list(islice(rows, self.chunk_size))
+                if not chunk:
+                    break
+                self.import_chunk(chunk, stats)
+                stats.seconds = time.monotonic() - started
+                if progress is not None:
+                    progress(stats)
+        finally:
+            # Derived data is rebuilt once for the whole import
+            invalidate_category_tree()
+            invalidate_facet_index()
+            purge_surrogate_keys(MENU_KEY)
+        stats.seconds = time.monotonic() - started
+        return stats
+
+    def import_chunk(self, chunk, stats):
+        """
+        Import one chunk of rows in a single transaction.
+        """
+        for number, row in enumerate(chunk, start=stats.rows + 1):
+            missing = [column for column in REQUIRED_COLUMNS if not row.get(column)]
+            if missing:
+                raise CatalogImportError(f"Row {number} is missing {', '.join(missing)}")
+
+        with transaction.atomic():
+            self._create_lookups(chunk)
+            products = self._upsert_products(chunk, stats)
+            featured = self._upsert_variations(chunk, products, stats)
+            ProductVariation.set_featured_variations(featured)
+            self._refresh_cards(products.values())
+        stats.rows += len(chunk)
+
+    def _create_lookups(self, chunk):
+        names = {row["brand"] for row in chunk} - set(self.brands)
+        for brand in Brand.objects.bulk_create([Brand(name=name) for name in names]):
+            self.brands[brand.name] = brand.id
+
+        names = {row["size"] for row in chunk} - set(self.sizes)
+        for size in Size.objects.bulk_create([Size(name=name) for name in names]):
+            self.sizes[size.name] = size.id
+
+        names = {row["category"] for row in chunk} - set(self.categories)
+        categories = Category.objects.bulk_create([
+            self.category_slugs.assign(Category(name=name), name) for name in names
+        ])
+        for category in categories:
+            # Imported categories are roots of the tree
+            category.path, category.depth = f"{category.id}/", 0
+            self.categories[category.name] = category.id
+        Category.objects.bulk_update(categories, ["path", "depth"])
+
+    def _upsert_products(self, chunk, stats):
+        """
+        Create the new products of a chunk and update the existing ones.
+
+        Returns:
+            dict: Product name mapped to the `Product` of every row.
+        """
+        products = {}
+        for row in chunk:
+            products[row["product"]] = Product(
+                id=self.products.get(row["product"]),
+                name=row["product"],
+                category_id=self.categories[row["category"]],
+                brand_id=self.brands[row["brand"]],
+                description=row.get("description") or "",
+                base_price_cents=int(row["base_price_cents"]),
+            )
+
+        new = [product for product in products.values() if product.id is None]
+        existing = [product for product in products.values() if product.id is not None]
+        for product in new:
+            self.product_slugs.assign(product, product.name)
+        Product.objects.bulk_create(new)
+        for product in new:
+            self.products[product.name] = product.id
+        stats.products_created += len(new)
+
+        Product.objects.bulk_update(existing, ["category", "brand", "description", "base_price_cents"])
+        ProductSalesRank.objects.bulk_create(
+            [ProductSalesRank(product_id=product.id) for product in new], ignore_conflicts=True
+        )
+        return products
+
+    def _upsert_variations(self, chunk, products, stats):
+        """
+        Create the new variations of a chunk and update the existing ones.
+        A variation repeated inside the chunk keeps its last row.
+
+        Variations are written unflagged; the featured flag is applied by the
+        caller so the partial unique index never sees two featured rows.
+
+        Returns:
+            list: Ids of the variations flagged as featured, one per product.
+        """
+        variations, flagged = {}, {}
+        for row in chunk:
+            product = products[row["product"]]
+            size_id = self.sizes[row["size"]]
+            key = (product.id, row["color"].lower(), size_id)
+            stock = int(row.get("stock") or 0)
+            variations[key] = ProductVariation(
+                id=self.variations.get(key),
+                product=product,
+                size_id=size_id,
+                color=row["color"],
+                sku=row.get("sku") or "",
+                price_cents=int(row.get("price_cents") or product.base_price_cents),
+                stock=stock,
+                discount=decimal.Decimal(row.get("discount") or 0),
+                featured=False,
+                is_active=stock > 0,
+                description=row.get("variation_description") or "",
+            )
+            if str(row.get("featured", "")).lower() in ("1", "true", "yes"):
+                flagged[product.id] = key
+
+        new = [variation for variation in variations.values() if variation.id is None]
+        existing = [variation for variation in variations.values() if variation.id is not None]
+        for variation in new:
+            variation.sku = variation.sku or self._allocate_sku(variation)
+            self.skus.add(variation.sku)
+            self.variation_slugs.assign(variation, variation.sku)
+        ProductVariation.objects.bulk_create(new)
+        for variation in new:
+            self.variations[(variation.product_id, variation.color.lower(), variation.size_id)] = variation.id
+        stats.variations_created += len(new)
+
+        ProductVariation.objects.bulk_update(
+            existing, ["price_cents", "stock", "discount", "is_active", "description"]
+        )
+        stats.variations_updated += len(existing)
+        return [variations[key].id for key in flagged.values()]
+
+    def _allocate_sku(self, variation):
+        """
+        Build a SKU in the format used by `ProductVariation.save`.
+        """
+        size = next(name for name, size_id in self.sizes.items() if size_id == variation.size_id)
+        while True:
+            sku = f"{variation.product_id}-{size}-{variation.color.replace('#', '')}-{uuid.uuid4().hex[:5]}"
+            if sku not in self.skus:
+                return sku
+
+    def _refresh_cards(self, products):
+        """
+        Rebuild the listing cards and search vectors of the given products in bulk.
+        """
+        products = {
+            product.id: product
+            for product in Product.objects.filter(id__in=[product.id for product in products])
+            .select_related("brand", "category")
+        }
+        # The featured variation, or the oldest one, as in `Product.refresh_card`
+        # (the last row read for a product wins)
+        featured = {}
+        for variation in ProductVariation.objects.filter(product__in=products).order_by("featured", "-id"):
+            variation.product = products[variation.product_id]
+            featured[variation.product_id] = variation
+        ProductCard.objects.bulk_create(
+            [
+                ProductCard(product=product, **ProductCard.values_for(product, featured.get(product_id)))
+                for product_id, product in products.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["product"],
+            update_fields=["featured_variation", "price_cents", "compare_at_cents", "on_sale", "image_url", "image_srcset", "is_active"],
+        )
+        update_search_vectors(list(products))
+        invalidate_variant_matrices(products)
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from store.ranking import decay_sales_ranks
+
+
+class Command(BaseCommand):
+    """
+    Fades old sales out of the popularity ranking.
+
+    Run it once a day from cron.
+    """
+    help = "Decay product sales ranks."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--factor", type=float, default=None,
+            help="Multiplier applied to every score. Defaults to settings.SALES_RANK_DECAY.",
+        )
+
+    def handle(self, *args, **options):
+        factor = options["factor"] if options["factor"] is not None else settings.SALES_RANK_DECAY
+        updated = decay_sales_ranks(factor)
+        self.stdout.write(f"Decayed {updated} sales rank(s) by {factor}.")
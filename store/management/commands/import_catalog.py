@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store.importer import CatalogImporter, CatalogImportError, read_rows
+
+
+class Command(BaseCommand):
+    """
+    Bulk imports products and variations from a CSV or JSONL file.
+
+    Every row describes one variation: `product`, `category`, `brand`,
+    `base_price_cents`, `size` and `color` are required; `description`,
+    `sku`, `price_cents`, `stock`, `discount`, `featured` and
+    `variation_description` are optional. Existing products (by name) and
+    variations (by product, color and size) are updated in place.
+    """
+    help = "Import a product catalog from a .csv or .jsonl file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="The .csv or .jsonl file to import.")
+        parser.add_argument(
+            "--chunk-size", type=int, default=1000, help="Rows imported per transaction."
+        )
+
+    def handle(self, *args, **options):
+        def report(stats):
+            self.stdout.write(f"{stats.rows} rows ({stats.rows_per_second:.0f} rows/sec)")
+
+        try:
+            stats = CatalogImporter(chunk_size=options["chunk_size"]).run(
+                read_rows(options["path"]), progress=report
+            )
+        except (CatalogImportError, OSError) as error:
+            raise CommandError(str(error))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats.rows} rows in {stats.seconds:.1f}s ({stats.rows_per_second:.0f} rows/sec): "
+            f"{stats.products_created} products created, {stats.variations_created} variations created, "
+            f"{stats.variations_updated} variations updated."
+        ))
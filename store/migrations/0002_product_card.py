@@ -0,0 +1,65 @@
+# Generated by Django 5.2 on 2026-10-17 07:33
+
+import decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_cards(apps, schema_editor):
+    """
+    Backfill a card for every existing product.
+    """
+    Product = apps.get_model("store", "Product")
+    ProductCard = apps.get_model("store", "ProductCard")
+    cards = []
+    for product in Product.objects.prefetch_related("variations"):
+        variations = sorted(product.variations.all(), key=lambda v: (not v.featured, v.id))
+        featured = variations[0] if variations else None
+        card = ProductCard(
+            product=product,
+            price_cents=product.base_price_cents,
+            image_url=product.base_image.url if product.base_image else "",
+            is_active=product.is_active,
+        )
+        if featured is not None:
+            price_cents = featured.price_cents or product.base_price_cents
+            card.featured_variation = featured
+            card.price_cents = price_cents
+            if featured.discount:
+                discounted = decimal.Decimal(price_cents) * (100 - featured.discount) / 100
+                card.price_cents = int(discounted.quantize(decimal.Decimal("1"), rounding=decimal.ROUND_HALF_UP))
+                card.compare_at_cents = price_cents
+                card.on_sale = True
+            if featured.variation_image:
+                card.image_url = featured.variation_image.url
+        cards.append(card)
+    ProductCard.objects.bulk_create(cards, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCard',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='store.product')),
+                ('price_cents', models.IntegerField(default=0)),
+                ('compare_at_cents', models.IntegerField(blank=True, null=True)),
+                ('on_sale', models.BooleanField(default=False)),
+                ('image_url', models.URLField(blank=True, max_length=500)),
+                ('is_active', models.BooleanField(default=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('featured_variation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='store.productvariation')),
+            ],
+            options={
+                'verbose_name': 'product card',
+                'verbose_name_plural': 'product cards',
+            },
+        ),
+        migrations.RunPython(build_cards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2 on 2026-10-17 07:36
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.operations
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+BACKFILL_SQL = """
+UPDATE store_product AS p SET search_vector =
+    setweight(to_tsvector('english', coalesce(p.name, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(b.name, '') || ' ' || coalesce(c.name, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce((
+        SELECT string_agg(t.name, ' ')
+        FROM taggit_taggeditem ti
+        JOIN taggit_tag t ON t.id = ti.tag_id
+        JOIN django_content_type ct ON ct.id = ti.content_type_id
+        WHERE ct.app_label = 'store' AND ct.model = 'product' AND ti.object_id = p.id
+    ), '')), 'C') ||
+    setweight(to_tsvector('english', coalesce(p.description, '')), 'D')
+FROM store_brand AS b, store_category AS c
+WHERE b.id = p.brand_id AND c.id = p.category_id
+"""
+
+
+def build_search_vectors(apps, schema_editor):
+    """
+    Populate the search vector of existing products (PostgreSQL only).
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(BACKFILL_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_product_card'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+    ]
+
+    operations = [
+        django.contrib.postgres.operations.TrigramExtension(),
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='product_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunPython(build_search_vectors, migrations.RunPython.noop),
+    ]
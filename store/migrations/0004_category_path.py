@@ -0,0 +1,44 @@
+# Generated by Django 5.2 on 2026-10-17 07:55
+
+from django.db import migrations, models
+
+
+def build_paths(apps, schema_editor):
+    """
+    Backfill the materialized path of every existing category.
+    """
+    Category = apps.get_model("store", "Category")
+    categories = list(Category.objects.all())
+    parents = {category.id: category.parent_id for category in categories}
+
+    def path_of(category_id, seen=()):
+        parent_id = parents[category_id]
+        if parent_id is None or parent_id in seen:
+            return f"{category_id}/"
+        return f"{path_of(parent_id, seen + (category_id,))}{category_id}/"
+
+    for category in categories:
+        category.path = path_of(category.id)
+        category.depth = category.path.count("/") - 1
+    Category.objects.bulk_update(categories, ["path", "depth"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0003_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(build_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-17 08:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def build_sales_ranks(apps, schema_editor):
+    """
+    Create a rank for every product, seeded with its paid sales to date.
+    """
+    Product = apps.get_model("store", "Product")
+    ProductSalesRank = apps.get_model("store", "ProductSalesRank")
+    OrderItem = apps.get_model("orders", "OrderItem")
+    units = dict(
+        OrderItem.objects.filter(order__is_paid=True)
+        .values_list("product__product_id")
+        .annotate(units=Sum("quantity"))
+        .order_by()
+    )
+    ProductSalesRank.objects.bulk_create(
+        [
+            ProductSalesRank(product_id=product_id, score=units.get(product_id, 0), units_sold=units.get(product_id, 0))
+            for product_id in Product.objects.values_list("id", flat=True)
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_category_path'),
+        ('orders', '0004_stock_reservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSalesRank',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales_rank', serialize=False, to='store.product')),
+                ('score', models.FloatField(default=0)),
+                ('units_sold', models.PositiveIntegerField(default=0)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'product sales rank',
+                'verbose_name_plural': 'product sales ranks',
+                'indexes': [models.Index(fields=['-score', 'product'], name='product_sales_rank_score_idx')],
+            },
+        ),
+        migrations.RunPython(build_sales_ranks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-17 08:10
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def keep_one_featured(apps, schema_editor):
+    """
+    Keep only the oldest featured variation of each product flagged.
+    """
+    ProductVariation = apps.get_model("store", "ProductVariation")
+    keep = (
+        ProductVariation.objects.filter(featured=True)
+        .values("product_id")
+        .annotate(first=Min("id"))
+        .values_list("first", flat=True)
+        .order_by()
+    )
+    ProductVariation.objects.filter(featured=True).exclude(id__in=list(keep)).update(featured=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_product_sales_rank'),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_one_featured, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='productvariation',
+            constraint=models.UniqueConstraint(condition=models.Q(('featured', True)), fields=('product',), name='unique_featured_variation'),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2 on 2026-10-17 08:36
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_ratings(apps, schema_editor):
+    """
+    Compute the review aggregates of every reviewed product.
+    """
+    Product = apps.get_model("store", "Product")
+    Review = apps.get_model("reviews", "Review")
+    stats = {}
+    for product_id, rating, count in (
+        Review.objects.values_list("product_id", "rating").annotate(count=Count("id")).order_by()
+    ):
+        stats.setdefault(product_id, {})[rating] = count
+    products = []
+    for product_id, counts in stats.items():
+        product = Product(pk=product_id)
+        product.rating_count = sum(counts.values())
+        product.rating_sum = sum(rating * count for rating, count in counts.items())
+        product.rating_avg = product.rating_sum / product.rating_count
+        for stars in range(1, 6):
+            setattr(product, f"rating_{stars}_count", counts.get(stars, 0))
+        products.append(product)
+    Product.objects.bulk_update(
+        products,
+        ["rating_count", "rating_sum", "rating_avg"] + [f"rating_{stars}_count" for stars in range(1, 6)],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_unique_featured_variation'),
+        ('reviews', '0003_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_avg',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2 on 2026-10-17 08:43
+
+from cloudinary.utils import cloudinary_url
+from django.db import migrations, models
+
+# The "card" image preset as it was when this migration was written
+CARD_WIDTH = 400
+CARD_WIDTHS = (200, 400, 800)
+
+
+def card_image_url(image, width):
+    url, _ = cloudinary_url(
+        image.public_id,
+        version=str(image.version or ""),
+        format=image.format,
+        width=width,
+        crop="limit",
+        fetch_format="auto",
+        quality="auto",
+        secure=True,
+    )
+    return url
+
+
+def backfill_card_images(apps, schema_editor):
+    """
+    Replace the original upload URL of every card with card-sized URLs.
+    """
+    ProductCard = apps.get_model("store", "ProductCard")
+    cards = list(ProductCard.objects.select_related("product", "featured_variation"))
+    for card in cards:
+        variation = card.featured_variation
+        image = (variation.variation_image if variation is not None else None) or card.product.base_image
+        if not image:
+            card.image_url = card.image_srcset = ""
+            continue
+        card.image_url = card_image_url(image, CARD_WIDTH)
+        card.image_srcset = ", ".join(f"{card_image_url(image, width)} {width}w" for width in CARD_WIDTHS)
+    ProductCard.objects.bulk_update(cards, ["image_url", "image_srcset"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_product_rating'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productcard',
+            name='image_srcset',
+            field=models.TextField(blank=True),
+        ),
+        migrations.RunPython(backfill_card_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-17 09:18
+
+import store.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_productcard_image_srcset'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='category',
+            name='slug',
+            field=store.models.UniqueSlugField(editable=False, populate_from='name', unique=True),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='slug',
+            field=store.models.UniqueSlugField(editable=False, populate_from='name', unique=True),
+        ),
+        migrations.AlterField(
+            model_name='productvariation',
+            name='slug',
+            field=store.models.UniqueSlugField(editable=False, populate_from='sku', unique=True),
+        ),
+    ]
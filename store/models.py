@@ -1,8 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 from django.urls import reverse
 from autoslug import AutoSlugField
 from taggit.managers import TaggableManager
-from helpers import cloud_init
+from helpers import cloud_init, image_srcset, image_url
 from cloudinary.models import CloudinaryField
 from colorfield.fields import ColorField
 import uuid 
@@ -12,6 +12,11 @@ from django.db.models import OuterRef, Subquery
 from django.urls import reverse
 from urllib.parse import urlencode
 from django.db.models import Min
+from django.db.models import Count, F
+from django.db.models.functions import Cast, Coalesce, Concat, NullIf, Substr
+from django.core.exceptions import ValidationError
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 
 cloud_init()
 
@@ -27,12 +32,63 @@ class TimeStampedModel(models.Model):
         abstract = True
 
 
+class UniqueSlugField(AutoSlugField):
+    """
+    An `AutoSlugField` that trusts a slug allocated ahead of the save.
+
+    Bulk loaders that hand out unique slugs from memory record the slug with
+    `mark_allocated`; while the instance still carries that exact slug, the
+    save keeps it without probing the database for uniqueness.
+    """
+
+    @staticmethod
+    def mark_allocated(instance, slug, attname="slug"):
+        setattr(instance, attname, slug)
+        instance._allocated_slugs = {**getattr(instance, "_allocated_slugs", {}), attname: slug}
+
+    def pre_save(self, instance, add):
+        value = getattr(instance, self.attname)
+        if value and getattr(instance, "_allocated_slugs", {}).get(self.attname) == value:
+            return value
+        return super().pre_save(instance, add)
+
+
 class Brand(models.Model):
     """
     Model representing a brand.
     """
     name = models.CharField("Brand", unique=True, max_length=50)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Remember the loaded name, so `save` can tell a rename.
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_name = dict(zip(field_names, values)).get("name")
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Overridden save method to re-index the brand's products, whose search
+        vectors hold the brand name. Once a rename commits, the facet index
+        (which lists brands by name) is dropped and the cached pages showing
+        the brand are purged: its listings, the catalog-wide ones and the
+        pages of its products.
+        """
+        from store.facets import invalidate_facet_index
+        from store.pagecache import CATALOG_KEY, brand_key, product_key, purge_surrogate_keys
+        from store.search import update_search_vectors
+
+        renamed = not self._state.adding and getattr(self, "_loaded_name", None) != self.name
+        super().save(*args, **kwargs)
+        self._loaded_name = self.name
+        product_ids = list(self.products.values_list("id", flat=True))
+        update_search_vectors(product_ids)
+        if renamed:
+            keys = [brand_key(self.pk), CATALOG_KEY, *[product_key(product_id) for product_id in product_ids]]
+            transaction.on_commit(lambda: (invalidate_facet_index(), purge_surrogate_keys(*keys)))
+
     def __str__(self):
         return self.name
     
@@ -51,10 +107,13 @@ class Category(TimeStampedModel):
         blank=True,
         related_name="subcategories"
     )
-    slug = AutoSlugField(populate_from="name", unique=True)
+    slug = UniqueSlugField(populate_from="name", unique=True)
     description = models.TextField(max_length=255, blank=True)
     tags = TaggableManager(blank=True)
     image = CloudinaryField('image', null=True, blank=True)
+    # Materialized path: the ids from the root down to this category, e.g. "1/4/9/"
+    path = models.CharField(max_length=255, db_index=True, editable=False, default="")
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
 
     class Meta:
         verbose_name = 'category'
@@ -64,6 +123,73 @@ class Category(TimeStampedModel):
     def __str__(self):
         return self.name
 
+    def clean(self):
+        """
+        Refuses a parent that is the category itself or one of its descendants.
+        """
+        if self.pk and self.parent_id:
+            if self.parent_id == self.pk or self.parent.path.startswith(self.path):
+                raise ValidationError({"parent": "A category cannot be nested under itself."})
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.update_path()
+        self.refresh_read_models()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.refresh_read_models()
+        return result
+
+    def update_path(self):
+        """
+        Recompute the materialized path after a save and move the whole
+        subtree along when the category changed parent.
+        """
+        parent_path = self.parent.path if self.parent_id else ""
+        path = f"{parent_path}{self.pk}/"
+        if path == self.path:
+            return
+        old_path, old_depth = self.path, self.depth
+        self.path, self.depth = path, path.count("/") - 1
+        Category.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+        if old_path:
+            Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(models.Value(path), Substr("path", len(old_path) + 1)),
+                depth=models.F("depth") + (self.depth - old_depth),
+            )
+
+    def refresh_read_models(self):
+        """
+        Drop the cached views of the category hierarchy after a change, and
+        re-index the search vectors of its products, which hold its name.
+        """
+        from store.categories import invalidate_category_tree
+        from store.facets import invalidate_facet_index
+        from store.pagecache import MENU_KEY, purge_surrogate_keys
+        from store.search import update_search_vectors
+
+        if self.pk is not None:
+            update_search_vectors(Product.objects.filter(category_id=self.pk).values_list("id", flat=True))
+        invalidate_category_tree()
+        invalidate_facet_index()
+        # The header menu lists the categories, so every cached page is stale
+        purge_surrogate_keys(MENU_KEY)
+
+    def get_descendants(self, include_self=True):
+        """
+        Return this category and everything below it in a single range query
+        on the indexed materialized path.
+
+        Args:
+            include_self (bool): Whether the category itself is included.
+
+        Returns:
+            QuerySet: The matching categories.
+        """
+        descendants = Category.objects.filter(path__startswith=self.path)
+        return descendants if include_self else descendants.exclude(pk=self.pk)
+
 
 class Product(TimeStampedModel):
     """
@@ -78,17 +204,32 @@ class Product(TimeStampedModel):
         related_name="products"
     )
     brand = models.ForeignKey(Brand, on_delete=models.CASCADE, related_name="products")
-    slug = AutoSlugField(populate_from="name", unique=True)
+    slug = UniqueSlugField(populate_from="name", unique=True)
     description = models.TextField(max_length=500, blank=True)
     tags = TaggableManager(blank=True)
     base_image = CloudinaryField('image', null=True, blank=True)
     base_price_cents = models.IntegerField()
     is_active = models.BooleanField(default=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # Review aggregates, kept up to date by `Review.save` and `Review.delete`
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_avg = models.FloatField(default=0, editable=False)
+    rating_1_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         verbose_name = 'product'
         verbose_name_plural = 'products'
         ordering = ['name']
+        indexes = [
+            GinIndex(fields=["search_vector"], name="product_search_vector_idx"),
+            GinIndex(fields=["name"], name="product_name_trgm_idx", opclasses=["gin_trgm_ops"]),
+        ]
         
     @property
     def base_price(self):
@@ -96,15 +237,84 @@ class Product(TimeStampedModel):
         Property method to return the base price of the product in dollars.
         """
         return self.base_price_cents / 100
+
+    @property
+    def rating_histogram(self):
+        """
+        The number and share of reviews per star, from five stars down to one.
+
+        Returns:
+            list: `(stars, count, percent)` tuples.
+        """
+        return [
+            (stars, count, round(100 * count / self.rating_count) if self.rating_count else 0)
+            for stars in range(5, 0, -1)
+            for count in [getattr(self, f"rating_{stars}_count")]
+        ]
+
+    @staticmethod
+    def adjust_rating(product_id, rating, delta):
+        """
+        Add (`delta=1`) or remove (`delta=-1`) one rating from the review
+        aggregates of a product.
+
+        A single UPDATE built from `F()` expressions, so concurrent reviews
+        never overwrite each other's counts.
+
+        Args:
+            product_id (int): The reviewed product.
+            rating (int): The rating, from 1 to 5 stars.
+            delta (int): 1 for a new review, -1 for a deleted one.
+        """
+        count = F("rating_count") + delta
+        total = F("rating_sum") + delta * rating
+        Product.objects.filter(pk=product_id).update(
+            rating_count=count,
+            rating_sum=total,
+            rating_avg=Coalesce(Cast(total, models.FloatField()) / NullIf(count, 0), 0.0),
+            **{f"rating_{rating}_count": F(f"rating_{rating}_count") + delta},
+        )
+
+    @staticmethod
+    def refresh_ratings(product_ids):
+        """
+        Recompute the review aggregates of several products from their reviews.
+
+        Used when a review changes rating, and to backfill the aggregates.
+
+        Args:
+            product_ids (list): The products to recompute.
+        """
+        from reviews.models import Review
+
+        stats = {}
+        for product_id, rating, count in (
+            Review.objects.filter(product_id__in=product_ids)
+            .values_list("product_id", "rating").annotate(count=Count("id")).order_by()
+        ):
+            stats.setdefault(product_id, {})[rating] = count
+        products = []
+        for product_id in product_ids:
+            counts = stats.get(product_id, {})
+            product = Product(pk=product_id)
+            product.rating_count = sum(counts.values())
+            product.rating_sum = sum(rating * count for rating, count in counts.items())
+            product.rating_avg = product.rating_sum / product.rating_count if product.rating_count else 0
+            for stars in range(1, 6):
+                setattr(product, f"rating_{stars}_count", counts.get(stars, 0))
+            products.append(product)
+        Product.objects.bulk_update(
+            products,
+            ["rating_count", "rating_sum", "rating_avg"] + [f"rating_{stars}_count" for stars in range(1, 6)],
+        )
     
     @property
     def featured(self):
         """
-        Property method to get the featured variation of the product.
+        Property method to get the featured variation of the product, falling
+        back to the oldest variation when none is flagged.
         """
-        featured = self.variations.filter(
-            featured=True
-        ).first()
+        featured = self.variations.order_by("-featured", "id").first()
         return featured
     
     @property
@@ -126,7 +336,79 @@ class Product(TimeStampedModel):
         return self.variations.filter(
             has_discount=True
         ).exists()
-    
+
+    def save(self, *args, **kwargs):
+        """
+        Overridden save method to keep the product's read models in sync.
+        """
+        creating = self._state.adding
+        super().save(*args, **kwargs)
+        if creating:
+            # Every product has a rank row, so popular orderings stay a plain sort
+            ProductSalesRank.objects.get_or_create(product=self)
+        self.refresh_read_models()
+
+    def delete(self, *args, **kwargs):
+        from store.facets import reindex_product
+        from store.pagecache import purge_product_pages
+
+        product_id, category_id, brand_id = self.pk, self.category_id, self.brand_id
+        result = super().delete(*args, **kwargs)
+        transaction.on_commit(lambda: (
+            reindex_product(product_id),
+            purge_product_pages(product_id, category_id, brand_id),
+        ))
+        return result
+
+    def refresh_read_models(self, search=True, card=True, facets=True):
+        """
+        Refresh the denormalized views of this product after a change to it
+        or to one of its variations.
+
+        The card and the search vector are rewritten in the current
+        transaction; the cached facet index, variant matrix and pages are
+        refreshed once it commits, so no other process can cache the old
+        rows again after they were dropped.
+
+        Args:
+            search (bool): Whether to re-index the search vector, which only
+                depends on the product itself (variation changes skip it).
+            card (bool): Whether to rebuild the listing card.
+            facets (bool): Whether to re-index the product in the facet index.
+        """
+        from store.search import update_search_vector
+
+        if card:
+            self.refresh_card()
+        if search:
+            update_search_vector(self)
+        transaction.on_commit(lambda: self._refresh_cached_views(facets))
+
+    def _refresh_cached_views(self, facets=True):
+        from store.facets import reindex_product
+        from store.pagecache import purge_product_pages
+        from store.variants import invalidate_variant_matrices
+
+        if facets:
+            reindex_product(self.pk)
+        invalidate_variant_matrices([self.pk])
+        purge_product_pages(self.pk, self.category_id, self.brand_id)
+
+    def refresh_card(self):
+        """
+        Rebuild the denormalized `ProductCard` used by listing pages.
+
+        The featured variation is preferred; if no variation is flagged as
+        featured the oldest one is used instead.
+
+        Returns:
+            ProductCard: The updated card.
+        """
+        featured = self.variations.order_by("-featured", "id").first()
+        defaults = ProductCard.values_for(self, featured)
+        card, _ = ProductCard.objects.update_or_create(product=self, defaults=defaults)
+        return card
+
     def __str__(self):
         return self.name
 
@@ -150,7 +432,7 @@ class ProductVariation(TimeStampedModel):
         on_delete=models.CASCADE,
         related_name="variations"
     )
-    slug = AutoSlugField(populate_from="sku", unique=True)
+    slug = UniqueSlugField(populate_from="sku", unique=True)
     description = models.TextField(max_length=500, blank=True)
     sku = models.CharField(max_length=50, unique=True, blank=True)
     size = models.ForeignKey(Size, related_name="products", on_delete=models.CASCADE)
@@ -167,19 +449,52 @@ class ProductVariation(TimeStampedModel):
         verbose_name_plural = 'product variations'
         unique_together = [['product', 'color', 'size']]
         ordering = ['product', 'color']
+        constraints = [
+            # At most one featured variation per product
+            models.UniqueConstraint(
+                fields=["product"],
+                condition=models.Q(featured=True),
+                name="unique_featured_variation",
+            ),
+        ]
 
-    def save(self, *args, **kwargs):
+    # Fields feeding the product's listing card, and its facet postings
+    CARD_FIELDS = frozenset({"price_cents", "discount", "featured", "variation_image"})
+    FACET_FIELDS = frozenset({"is_active", "size_id", "color"})
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
         """
-        Overridden save method to handle SKU generation, set product price if not set,
-        and ensure only one product variation is featured for every product.
+        Remember the loaded values, so `save` can tell what changed.
         """
-        if not self.is_active_now:
-            self.is_active = False 
-        else:
-            self.is_active = True
-        super().save(*args, **kwargs)
-    
-    
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def _tracked_values(self):
+        return {
+            name: getattr(self, name)
+            for name in self.CARD_FIELDS | self.FACET_FIELDS
+            if name in self.__dict__
+        }
+
+    def changed_fields(self):
+        """
+        Return the card and facet fields changed since the variation was
+        loaded or last saved, or None for a variation that is not stored yet.
+        """
+        loaded = getattr(self, "_loaded_values", None)
+        if loaded is None:
+            return None
+        def normalize(name, value):
+            # Images are compared by public id and version
+            return str(value) if name == "variation_image" and value else value
+
+        return {
+            name for name, value in self._tracked_values().items()
+            if name not in loaded or normalize(name, loaded[name]) != normalize(name, value)
+        }
+
     @property
     def price_after(self):
         """
@@ -189,6 +504,18 @@ class ProductVariation(TimeStampedModel):
             discounted_price = (self.price_cents / 100) * (100 - float(self.discount)) / 100
             return round(discounted_price, 2)
     
+    @property
+    def final_price_cents(self):
+        """
+        Return the discounted price of the variation in whole cents.
+        """
+        if not self.price_cents:
+            return 0
+        if not self.has_discount:
+            return self.price_cents
+        discounted = decimal.Decimal(self.price_cents) * (100 - decimal.Decimal(self.discount)) / 100
+        return int(discounted.quantize(decimal.Decimal("1"), rounding=decimal.ROUND_HALF_UP))
+
     @property
     def price_without(self):
         """
@@ -203,6 +530,12 @@ class ProductVariation(TimeStampedModel):
         """
         return self.discount != 0
     
+    def get_absolute_url(self):
+        """
+        Return the product page with this variation selected.
+        """
+        return reverse("product-detail", args=[self.product.slug]) + f"?variant_slug={self.slug}"
+
     @property
     def display_name(self):
         """
@@ -221,6 +554,14 @@ class ProductVariation(TimeStampedModel):
         if self.product.base_image:
             return self.product.base_image.url
         return None  # Or a default image URL, e.g., '/static/default.jpg'
+
+    @property
+    def image_resource(self):
+        """
+        Return the Cloudinary image of the variation, falling back to the product's base image,
+        for building sized URLs with `helpers.image_url`.
+        """
+        return self.variation_image or self.product.base_image or None
     
     @property
     def price(self):
@@ -260,6 +601,14 @@ class ProductVariation(TimeStampedModel):
         """
         Overridden save method to generate SKU if missing, set product price if not set,
         and ensure only one product variation is featured for every product.
+
+        The product's card and facets are refreshed only when one of their
+        inputs (`CARD_FIELDS`, `FACET_FIELDS`) changed.
+
+        Only a featured variation costs an extra statement (clearing the flag
+        on its sibling, found through the partial unique index
+        `unique_featured_variation`, which also guarantees the invariant
+        under concurrent saves).
         """
         if not self.sku:
             uid = str(uuid.uuid4()).replace("-", "")[:5]
@@ -267,20 +616,176 @@ class ProductVariation(TimeStampedModel):
             self.sku = f"{self.product.id}-{self.size}-{color_hex}-{uid}"
         if not self.price_cents:
             self.price_cents = self.product.base_price_cents
-        if self.featured:
-            ProductVariation.objects.filter(
-                product=self.product
-            ).update(
-                featured=False
-            )
-        if not ProductVariation.objects.filter(
-            product=self.product, featured=True
-        ).exists():
-            self.featured = True 
         
         if self.stock == 0:
             self.is_active = False 
-        super().save(*args, **kwargs)
+        changed = self.changed_fields()
+        with transaction.atomic():
+            if self.featured:
+                ProductVariation.objects.filter(
+                    product_id=self.product_id, featured=True
+                ).exclude(pk=self.pk).update(featured=False)
+            super().save(*args, **kwargs)
+        # Stock or description changes only reach the variant matrix and pages
+        card = changed is None or bool(changed & self.CARD_FIELDS)
+        facets = card or bool(changed & self.FACET_FIELDS)
+        self.product.refresh_read_models(search=False, card=card, facets=facets)
+        self._loaded_values = self._tracked_values()
+
+    def set_featured(self):
+        """
+        Make this variation the featured one of its product.
+        """
+        ProductVariation.set_featured_variations([self.pk])
+        self.featured = True
+        self.product.refresh_read_models(search=False)
+
+    @staticmethod
+    def set_featured_variations(variation_ids):
+        """
+        Make each of the given variations the featured one of its product, for
+        any number of products at once.
+
+        The swap runs as two set-based statements in one transaction: the
+        flag is cleared on the current featured siblings, then set on the new
+        ones. (A single `UPDATE` could transiently hold two featured rows for
+        a product, which the partial unique index rejects.)
+
+        Args:
+            variation_ids (list): Ids of the variations to feature, at most one per product.
+
+        Returns:
+            int: The number of variations now featured.
+        """
+        variations = ProductVariation.objects.filter(id__in=variation_ids)
+        with transaction.atomic():
+            ProductVariation.objects.filter(
+                product__in=variations.values("product_id"), featured=True
+            ).exclude(id__in=variation_ids).update(featured=False)
+            return variations.update(featured=True)
+
+    def delete(self, *args, **kwargs):
+        """
+        Overridden delete method to refresh the product's listing card.
+        """
+        product = self.product
+        result = super().delete(*args, **kwargs)
+        product.refresh_read_models(search=False)
+        return result
 
     def __str__(self):
         return self.display_name
+
+
+class ProductCard(models.Model):
+    """
+    Denormalized read model holding everything a product tile needs.
+
+    Listing pages render from this row instead of resolving the featured
+    variation of every product. It is rebuilt by `Product.refresh_card`
+    whenever a product or one of its variations is saved. The image is
+    stored as card-sized Cloudinary URLs (`image_url` and its `srcset`), so
+    tiles neither ship the original upload nor build URLs while rendering.
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="card"
+    )
+    featured_variation = models.ForeignKey(
+        ProductVariation,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+"
+    )
+    price_cents = models.IntegerField(default=0)
+    compare_at_cents = models.IntegerField(null=True, blank=True)
+    on_sale = models.BooleanField(default=False)
+    image_url = models.URLField(max_length=500, blank=True)
+    image_srcset = models.TextField(blank=True)
+    is_active = models.BooleanField(default=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'product card'
+        verbose_name_plural = 'product cards'
+
+    @staticmethod
+    def values_for(product, featured):
+        """
+        Compute the card fields of a product from its featured variation.
+
+        Args:
+            product (Product): The product.
+            featured (ProductVariation): Its featured variation, or None.
+
+        Returns:
+            dict: The card field values, without the product.
+        """
+        image = featured.image_resource if featured is not None else product.base_image
+        values = {
+            "featured_variation": featured,
+            "price_cents": product.base_price_cents,
+            "compare_at_cents": None,
+            "on_sale": False,
+            "image_url": image_url(image, "card"),
+            "image_srcset": image_srcset(image, "card"),
+            "is_active": product.is_active,
+        }
+        if featured is not None:
+            values["price_cents"] = featured.final_price_cents
+            values["on_sale"] = featured.has_discount
+            if featured.has_discount:
+                values["compare_at_cents"] = featured.price_cents
+        return values
+
+    @property
+    def price(self):
+        """
+        Return the display price in dollars.
+        """
+        return self.price_cents / 100
+
+    @property
+    def compare_at_price(self):
+        """
+        Return the strike-through price in dollars, if the product is on sale.
+        """
+        if self.compare_at_cents is None:
+            return None
+        return self.compare_at_cents / 100
+
+    def __str__(self):
+        return f"Card for {self.product_id}"
+
+
+class ProductSalesRank(models.Model):
+    """
+    Rollup of recent sales used to rank popular products.
+
+    Paid order items are added to `score` as they come in and the score is
+    periodically multiplied by a decay factor (`manage.py decay_sales_ranks`),
+    so recent sales weigh more than old ones. Every product has a row, which
+    keeps "popular" orderings a plain indexed sort.
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="sales_rank"
+    )
+    score = models.FloatField(default=0)
+    units_sold = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'product sales rank'
+        verbose_name_plural = 'product sales ranks'
+        indexes = [
+            models.Index(fields=["-score", "product"], name="product_sales_rank_score_idx"),
+        ]
+
+    def __str__(self):
+        return f"Sales rank for {self.product_id}: {self.score:.2f}"
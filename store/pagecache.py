@@ -0,0 +1,225 @@
+import hashlib
+import json
+import re
+import uuid
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+from cart.cart import get_cart
+
+# Tag carried by every cached page: the header menu lists the categories
+MENU_KEY = "menu"
+
+# Tag carried by listings whose content depends on the whole catalog
+CATALOG_KEY = "catalog"
+
+# Hidden input rendered by `{% csrf_token %}`; it is swapped for a fresh
+# token on every hit so cached forms keep working for each visitor
+CSRF_INPUT = re.compile(rb'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+CSRF_PLACEHOLDER = b"__csrf_token__"
+
+
+def product_key(product_id):
+    return f"product-{product_id}"
+
+
+def category_key(category_id):
+    return f"category-{category_id}"
+
+
+def brand_key(brand_id):
+    return f"brand-{brand_id}"
+
+
+def _tag_version_key(tag):
+    return f"store:page-tag-version:{tag}"
+
+
+def _tag_versions(tags):
+    """
+    Return the current version token of each surrogate key.
+
+    A tag without a version (never used, purged or evicted) gets a new one.
+    """
+    version_keys = {_tag_version_key(tag): tag for tag in tags}
+    versions = cache.get_many(list(version_keys))
+    for version_key in version_keys.keys() - versions.keys():
+        token = uuid.uuid4().hex
+        # Another process may have started the tag in the meantime
+        if not cache.add(version_key, token, None):
+            token = cache.get(version_key, token)
+        versions[version_key] = token
+    return {version_keys[version_key]: token for version_key, token in versions.items()}
+
+
+def page_cache_key(request, params=None):
+    """
+    Build the cache key of a page from its path and normalized query string.
+
+    Parameters are sorted and empty values dropped, so `?b=1&a=2&c=` and
+    `?a=2&b=1` share one entry.
+
+    Args:
+        request (HttpRequest): The request of the page.
+        params (iterable, optional): The query parameters that change the
+            page; others are left out of the key. Defaults to all of them.
+    """
+    items = sorted(
+        (key, value)
+        for key in request.GET
+        if params is None or key in params
+        for value in request.GET.getlist(key)
+        if value
+    )
+    digest = hashlib.md5(json.dumps([request.path, items]).encode()).hexdigest()
+    return f"store:page:{digest}"
+
+
+def add_surrogate_keys(request, *keys):
+    """
+    Tag the page being rendered with surrogate keys.
+
+    The current version of each key is recorded as the page is tagged, so a
+    purge racing the rendering of the page leaves it stale. Does nothing
+    when the page is not being cached, so views can call it
+    unconditionally.
+    """
+    surrogate_keys = getattr(request, "surrogate_keys", None)
+    if surrogate_keys is not None:
+        new_keys = set(keys) - surrogate_keys.keys()
+        if new_keys:
+            surrogate_keys.update(_tag_versions(new_keys))
+
+
+def purge_surrogate_keys(*keys):
+    """
+    Invalidate every cached page tagged with any of the given surrogate keys.
+
+    Only the version of each key is dropped, in a single cache call: pages
+    recorded with the old version no longer validate and are re-rendered on
+    their next request (or expire on their own).
+    """
+    cache.delete_many([_tag_version_key(key) for key in keys])
+
+
+def get_cached_page(page_key):
+    """
+    Return a cached page, unless one of its surrogate keys was purged since.
+
+    Args:
+        page_key (str): The key built by `page_cache_key`.
+
+    Returns:
+        tuple: The content, the content type and the surrogate key versions
+        of the page, or None on a miss.
+    """
+    cached = cache.get(page_key)
+    if cached is None:
+        return None
+    versions = cached[2]
+    current = cache.get_many([_tag_version_key(key) for key in versions])
+    if any(current.get(_tag_version_key(key)) != version for key, version in versions.items()):
+        return None
+    return cached
+
+
+def product_page_keys(product_id, category_id, brand_id):
+    """
+    Return the surrogate keys of the cached pages that may show a product:
+    its own page, the listings of its category, of every ancestor category
+    and of its brand, and the catalog-wide listings.
+    """
+    from store.categories import get_category_tree
+
+    categories = [node.id for node in get_category_tree().ancestors(category_id)] or [category_id]
+    return [
+        product_key(product_id),
+        brand_key(brand_id),
+        CATALOG_KEY,
+        *[category_key(category) for category in categories],
+    ]
+
+
+def purge_product_pages(product_id, category_id, brand_id):
+    """
+    Drop the cached pages that may show a product (see `product_page_keys`).
+    """
+    purge_surrogate_keys(*product_page_keys(product_id, category_id, brand_id))
+
+
+class PageCacheMixin:
+    """
+    Full-page cache for anonymous visitors with an empty cart.
+
+    Such visitors all see the same HTML, so the rendered page is stored under
+    a key derived from its normalized URL and replayed without touching the
+    database or the template engine. Only requests whose query parameters
+    are all listed in `page_cache_params` are cached, so arbitrary query
+    strings cannot fill the cache.
+
+    The view tags the page with surrogate keys through `add_surrogate_keys`,
+    and the page is stored with the version of each key. Model changes
+    purge the tagged pages with `purge_surrogate_keys`, which bumps those
+    versions; a hit whose versions no longer match is rendered again.
+
+    The same keys are sent in a `Surrogate-Key` header, with a `Cache-Control`
+    allowing shared caches to keep pages without forms, so a CDN or Varnish
+    in front of the site can cache and purge them too.
+
+    Attributes:
+        page_cache_timeout (int): Seconds a page is kept. Defaults to
+            `settings.PAGE_CACHE_TIMEOUT`.
+        page_cache_params (tuple): The query parameters the view reads.
+    """
+    page_cache_timeout = None
+    page_cache_params = ()
+
+    def is_page_cacheable(self, request):
+        """
+        Whether the request may be answered from (and stored into) the cache.
+        """
+        return (
+            request.method in ("GET", "HEAD")
+            and not request.user.is_authenticated
+            and len(get_cart(request)) == 0
+            and len(get_messages(request)) == 0
+            and all(key in self.page_cache_params for key in request.GET)
+        )
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.is_page_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        timeout = self.page_cache_timeout or settings.PAGE_CACHE_TIMEOUT
+        page_key = page_cache_key(request, self.page_cache_params)
+        cached = get_cached_page(page_key)
+        if cached is not None:
+            content, content_type, versions = cached
+            uses_csrf = CSRF_PLACEHOLDER in content
+            if uses_csrf:
+                content = content.replace(CSRF_PLACEHOLDER, get_token(request).encode())
+            response = HttpResponse(content, content_type=content_type)
+            return self._tag_response(response, sorted(versions), timeout, uses_csrf)
+
+        request.surrogate_keys = _tag_versions([MENU_KEY])
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code != 200 or response.streaming:
+            return response
+        if hasattr(response, "render"):
+            response.render()
+
+        versions = request.surrogate_keys
+        content, uses_csrf = CSRF_INPUT.subn(rb"\g<1>" + CSRF_PLACEHOLDER + rb"\g<2>", response.content)
+        cache.set(page_key, (content, response["Content-Type"], versions), timeout)
+        return self._tag_response(response, sorted(versions), timeout, uses_csrf)
+
+    def _tag_response(self, response, keys, timeout, uses_csrf):
+        response["Surrogate-Key"] = " ".join(keys)
+        if not uses_csrf:
+            # Pages carrying a CSRF token are per visitor and stay out of shared caches
+            response["Cache-Control"] = f"public, max-age=0, s-maxage={timeout}"
+        return response
@@ -0,0 +1,198 @@
+import base64
+import datetime
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(Exception):
+    """
+    Raised when a pagination token cannot be decoded.
+    """
+
+
+def encode_cursor(value, pk, direction):
+    """
+    Build an opaque token pointing just past (`"n"`) or before (`"p"`) a row.
+    """
+    if isinstance(value, datetime.datetime):
+        # Keep full microsecond precision so rows are never skipped
+        value = value.isoformat()
+    payload = json.dumps({"v": value, "id": pk, "d": direction})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """
+    Decode a token built by `encode_cursor`.
+
+    Raises:
+        InvalidCursor: If the token is malformed or its value is not a
+            string or a number.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value = payload["v"]
+        if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+            raise InvalidCursor(f"Unsupported cursor value: {value!r}")
+        return value, int(payload["id"]), payload["d"]
+    except (ValueError, KeyError, TypeError) as error:
+        raise InvalidCursor(str(error))
+
+
+class CursorPage:
+    """
+    A page returned by `CursorPaginator`.
+
+    Attributes:
+        object_list (list): The objects on this page.
+        next_cursor (str): Token for the following page, or None.
+        previous_cursor (str): Token for the preceding page, or None.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class CursorPaginator:
+    """
+    Keyset paginator: pages are addressed by the sort key of their edge rows
+    rather than by an offset, so every page is an indexed range scan and no
+    `COUNT(*)` is ever run.
+
+    Args:
+        queryset (QuerySet): The objects to paginate.
+        per_page (int): Number of objects per page.
+        ordering (str): The sort field, optionally prefixed with `-`. Lookups
+            across relations (e.g. `card__price_cents`) are supported. The
+            primary key is always added as a tie-breaker.
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.descending = ordering.startswith("-")
+        self.field = ordering.lstrip("-")
+
+    def _order(self, reverse=False):
+        descending = self.descending != reverse
+        prefix = "-" if descending else ""
+        return (f"{prefix}{self.field}", f"{prefix}pk")
+
+    def _after(self, value, pk, reverse=False):
+        descending = self.descending != reverse
+        op = "lt" if descending else "gt"
+        return Q(**{f"{self.field}__{op}": value}) | Q(**{self.field: value, f"pk__{op}": pk})
+
+    def _parse_value(self, value):
+        """
+        Convert a decoded cursor value to the type of the sort field.
+
+        Raises:
+            InvalidCursor: If the value does not fit the sort field.
+        """
+        model, *path, name = [self.queryset.model, *self.field.split("__")]
+        for part in path:
+            model = model._meta.get_field(part).related_model
+        try:
+            return model._meta.get_field(name).to_python(value)
+        except (ValidationError, TypeError, ValueError) as error:
+            raise InvalidCursor(str(error))
+
+    def _value(self, obj):
+        for attr in self.field.split("__"):
+            obj = getattr(obj, attr)
+        return obj
+
+    def get_page(self, token=None):
+        """
+        Return the page designated by `token`, or the first page.
+
+        An invalid token yields the first page.
+        """
+        try:
+            value, pk, direction = decode_cursor(token) if token else (None, None, "n")
+            if pk is not None:
+                value = self._parse_value(value)
+        except InvalidCursor:
+            value, pk, direction = None, None, "n"
+
+        reverse = direction == "p"
+        queryset = self.queryset.order_by(*self._order(reverse))
+        if pk is not None:
+            queryset = queryset.filter(self._after(value, pk, reverse))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or reverse:
+                next_cursor = encode_cursor(self._value(rows[-1]), rows[-1].pk, "n")
+            if pk is not None and (has_more or not reverse):
+                previous_cursor = encode_cursor(self._value(rows[0]), rows[0].pk, "p")
+        return CursorPage(rows, next_cursor, previous_cursor)
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Page-number paginator that avoids running `COUNT(*)` on every request.
+
+    The total is taken from `count` when the caller already knows it (for
+    instance from the facet index), otherwise it is counted once and kept in
+    the cache under `cache_key` for `timeout` seconds. Totals may therefore
+    lag slightly behind the catalog, which is fine for page links.
+    """
+
+    def __init__(self, object_list, per_page, cache_key=None, count=None, timeout=300, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.cache_key = cache_key
+        self.known_count = count
+        self.timeout = timeout
+
+    @cached_property
+    def count(self):
+        if self.known_count is not None:
+            return self.known_count
+        if self.cache_key is None:
+            return super().count
+        total = cache.get(self.cache_key)
+        if total is None:
+            total = super().count
+            cache.set(self.cache_key, total, self.timeout)
+        return total
+
+
+def count_cache_key(prefix, params, ignore=("page", "cursor")):
+    """
+    Build a cache key from a request's query parameters, ignoring their order
+    and the pagination parameters themselves.
+    """
+    items = sorted(
+        (key, value) for key in params if key not in ignore for value in params.getlist(key)
+    )
+    digest = hashlib.md5(json.dumps(items).encode()).hexdigest()
+    return f"{prefix}:{digest}"
@@ -0,0 +1,71 @@
+from django.db.models import Case, F, FloatField, IntegerField, Value, When
+from django.utils.timezone import now
+
+from store.models import ProductSalesRank
+from store.pagecache import CATALOG_KEY, purge_surrogate_keys
+
+
+def ranked_products(products):
+    """
+    Prepare products to be ordered by `-sales_rank__score`.
+
+    Every product has a rank row, so requiring one turns the join into an
+    INNER JOIN: the score is never NULL (which PostgreSQL would sort first
+    and keyset pagination could not compare against), and the sort reads
+    `product_sales_rank_score_idx` as is. The rank is loaded with the
+    products for the cursor.
+
+    Args:
+        products (QuerySet): The products.
+
+    Returns:
+        QuerySet: The products, orderable and paginable by `sales_rank__score`.
+    """
+    return products.filter(sales_rank__isnull=False).select_related("sales_rank")
+
+
+def record_sales(units):
+    """
+    Add freshly paid units to the sales rank of several products.
+
+    Missing rank rows are created first, then every score is bumped by a
+    single CASE UPDATE. Cached pages are left alone, so a sale does not
+    flush every listing: popular orderings catch up as pages expire, or
+    at the next `decay_sales_ranks`.
+
+    Args:
+        units (dict): Product id mapped to the number of units sold.
+
+    Returns:
+        int: The number of ranks updated.
+    """
+    units = {product_id: quantity for product_id, quantity in units.items() if quantity > 0}
+    if not units:
+        return 0
+    ProductSalesRank.objects.bulk_create(
+        [ProductSalesRank(product_id=product_id) for product_id in units],
+        ignore_conflicts=True,
+    )
+    whens = [When(product_id=product_id, then=Value(quantity)) for product_id, quantity in units.items()]
+    updated = ProductSalesRank.objects.filter(product_id__in=units).update(
+        score=F("score") + Case(*whens, output_field=FloatField()),
+        units_sold=F("units_sold") + Case(*whens, output_field=IntegerField()),
+        updated=now(),
+    )
+    return updated
+
+
+def decay_sales_ranks(factor):
+    """
+    Multiply every positive score by `factor`, fading old sales out.
+
+    Args:
+        factor (float): The decay factor, between 0 and 1.
+
+    Returns:
+        int: The number of ranks updated.
+    """
+    updated = ProductSalesRank.objects.filter(score__gt=0).update(score=F("score") * factor, updated=now())
+    # Popular listings are now ordered differently
+    purge_surrogate_keys(CATALOG_KEY)
+    return updated
@@ -0,0 +1,106 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connection
+from django.db.models import F, Q
+
+# Text search configuration used for both the stored vector and the queries
+SEARCH_CONFIG = "english"
+
+# Recomputes the stored vectors of the products in `%s` (a list of ids), as
+# the backfill of migration 0003: name weighs the most, then brand and
+# category, then tags and finally the description
+SEARCH_VECTOR_SQL = """
+UPDATE store_product AS p SET search_vector =
+    setweight(to_tsvector('english', coalesce(p.name, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(b.name, '') || ' ' || coalesce(c.name, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce((
+        SELECT string_agg(t.name, ' ')
+        FROM taggit_taggeditem ti
+        JOIN taggit_tag t ON t.id = ti.tag_id
+        JOIN django_content_type ct ON ct.id = ti.content_type_id
+        WHERE ct.app_label = 'store' AND ct.model = 'product' AND ti.object_id = p.id
+    ), '')), 'C') ||
+    setweight(to_tsvector('english', coalesce(p.description, '')), 'D')
+FROM store_brand AS b, store_category AS c
+WHERE b.id = p.brand_id AND c.id = p.category_id AND p.id = ANY(%s)
+"""
+
+
+def update_search_vectors(product_ids):
+    """
+    Recompute the stored `tsvector` of several products in one UPDATE.
+
+    Only runs on PostgreSQL; other backends fall back to plain `icontains`
+    matching in `search_products`.
+
+    Args:
+        product_ids (iterable): Ids of the products to re-index.
+    """
+    product_ids = list(product_ids)
+    if connection.vendor != "postgresql" or not product_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(SEARCH_VECTOR_SQL, [product_ids])
+
+
+def update_search_vector(product):
+    """
+    Recompute the stored `tsvector` of a single product.
+
+    Args:
+        product (Product): The product to re-index.
+    """
+    update_search_vectors([product.pk])
+
+
+def _prefix_query(query):
+    """
+    Match every word of the query as a prefix, so "trail" finds
+    "Trailrunner". Returns None when the query holds no word.
+    """
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return None
+    return SearchQuery(" & ".join(f"{term}:*" for term in terms), search_type="raw", config=SEARCH_CONFIG)
+
+
+def search_products(queryset, query):
+    """
+    Filter and rank a product queryset by a free text query.
+
+    Full-text matches on the stored vector are ranked by relevance. The
+    query matches as typed (quotes, `or` and `-word` are understood) or with
+    every word taken as a prefix. When nothing matches (typically a typo)
+    the query falls back to trigram similarity on the product name, served
+    by the trigram GIN index.
+
+    Args:
+        queryset (QuerySet): The products to search in.
+        query (str): The text typed in the shop search box.
+
+    Returns:
+        QuerySet: The matching products, best match first.
+    """
+    if connection.vendor != "postgresql":
+        return queryset.filter(
+            Q(name__icontains=query)
+            | Q(description__icontains=query)
+            | Q(brand__name__icontains=query)
+            | Q(category__name__icontains=query)
+            | Q(tags__name__icontains=query)
+        ).distinct()
+
+    search_query = SearchQuery(query, search_type="websearch", config=SEARCH_CONFIG)
+    prefix_query = _prefix_query(query)
+    if prefix_query is not None:
+        search_query |= prefix_query
+    ranked = queryset.filter(search_vector=search_query).annotate(
+        rank=SearchRank(F("search_vector"), search_query)
+    ).order_by("-rank", "id")
+    if ranked.exists():
+        return ranked
+
+    return queryset.filter(name__trigram_similar=query).annotate(
+        similarity=TrigramSimilarity("name", query)
+    ).order_by("-similarity", "id")
@@ -0,0 +1,20 @@
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+
+from store.models import Product
+from store.search import update_search_vectors
+
+
+@receiver(m2m_changed, sender=Product.tags.through, dispatch_uid="store.reindex_tagged_products")
+def reindex_tagged_products(sender, instance, action, **kwargs):
+    """
+    Re-index the search vectors of products whose tags changed.
+
+    The tags are weighed into the stored vector, but `product.tags.add()`
+    and friends do not save the product. The signal is shared with the tags
+    of categories, which are ignored.
+    """
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if isinstance(instance, Product):
+        update_search_vectors([instance.pk])
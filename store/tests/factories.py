@@ -8,7 +8,7 @@ class SizeFactory(factory.django.DjangoModelFactory):
     class Meta:
         model = Size
 
-    name = factory.Faker('word')
+    name = factory.Sequence(lambda n: f"size-{n}")
 
 # Factory for Brand
 class BrandFactory(factory.django.DjangoModelFactory):
@@ -22,7 +22,7 @@ class CategoryFactory(factory.django.DjangoModelFactory):
     class Meta:
         model = Category
 
-    name = factory.Faker('word')
+    name = factory.Sequence(lambda n: f"category-{n}")
     
     description = factory.Faker('paragraph')
     slug = factory.LazyAttribute(lambda o: slugify(o.name))
@@ -33,7 +33,7 @@ class ProductFactory(factory.django.DjangoModelFactory):
     class Meta:
         model = Product
 
-    name = factory.Faker('word')
+    name = factory.Sequence(lambda n: f"product-{n}")
     category = factory.SubFactory(CategoryFactory)
     brand = factory.SubFactory(BrandFactory)
     description = factory.Faker('paragraph')
@@ -0,0 +1,115 @@
+import pytest
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+from django.core.cache import cache
+from store.categories import CATEGORY_MENU_COUNTER_KEY, get_category_tree
+from store.context_processors import categories
+from store.facets import get_facet_index
+from store.models import Category
+from store.tests.factories import CategoryFactory, ProductFactory, ProductVariationFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def clothing():
+    """Builds Clothing > Shirts > Polos and Clothing > Pants"""
+    clothing = CategoryFactory(name="Clothing")
+    shirts = CategoryFactory(name="Shirts", parent=clothing)
+    CategoryFactory(name="Polos", parent=shirts)
+    CategoryFactory(name="Pants", parent=clothing)
+    return clothing
+
+
+def test_paths_are_materialized_on_save(clothing):
+    polos = Category.objects.get(name="Polos")
+    shirts = polos.parent
+
+    assert polos.path == f"{clothing.pk}/{shirts.pk}/{polos.pk}/"
+    assert polos.depth == 2
+    assert set(clothing.get_descendants().values_list("name", flat=True)) == {"Clothing", "Shirts", "Polos", "Pants"}
+    assert set(shirts.get_descendants(include_self=False).values_list("name", flat=True)) == {"Polos"}
+
+
+def test_moving_a_category_moves_its_subtree(clothing):
+    shirts = Category.objects.get(name="Shirts")
+    tops = CategoryFactory(name="Tops")
+
+    shirts.parent = tops
+    shirts.save()
+
+    polos = Category.objects.get(name="Polos")
+    assert polos.path == f"{tops.pk}/{shirts.pk}/{polos.pk}/"
+    assert polos.depth == 2
+    assert [node.name for node in get_category_tree().ancestors(polos.pk)] == ["Tops", "Shirts", "Polos"]
+
+
+def test_category_cannot_be_nested_under_its_descendant(clothing):
+    clothing.parent = Category.objects.get(name="Polos")
+
+    with pytest.raises(ValidationError):
+        clothing.full_clean()
+
+
+def test_tree_is_served_from_the_cache(clothing, django_assert_num_queries):
+    get_category_tree()
+
+    with django_assert_num_queries(0):
+        tree = get_category_tree()
+        assert [node.name for node in tree.roots] == ["Clothing"]
+        assert [node.name for node in tree.get("clothing").children] == ["Pants", "Shirts"]
+        assert [node.name for node in tree.ancestors("polos", include_self=False)] == ["Clothing", "Shirts"]
+        assert {node.name for node in tree.descendants("shirts")} == {"Shirts", "Polos"}
+
+
+def test_tree_is_rebuilt_after_a_change(clothing):
+    assert len(get_category_tree().by_id) == 4
+
+    Category.objects.get(name="Pants").delete()
+
+    assert {node.name for node in get_category_tree().descendants("clothing")} == {"Clothing", "Shirts", "Polos"}
+
+
+def test_category_filter_includes_subcategories(clothing, client):
+    polo = ProductVariationFactory(product=ProductFactory(category=Category.objects.get(name="Polos"))).product
+    pants = ProductVariationFactory(product=ProductFactory(category=Category.objects.get(name="Pants"))).product
+
+    assert get_facet_index().search({"category": "clothing"}).ids == sorted([polo.id, pants.id])
+    assert get_facet_index().search({"category": "shirts"}).ids == [polo.id]
+
+    response = client.get(reverse("shop"), {"category": "shirts"})
+    assert list(response.context["page"]) == [polo]
+
+
+def test_product_page_shows_category_breadcrumbs(clothing, client):
+    variation = ProductVariationFactory(product=ProductFactory(category=Category.objects.get(name="Polos")))
+
+    response = client.get(reverse("product-detail", args=[variation.product.slug]))
+
+    assert [node.name for node in response.context["breadcrumbs"]] == ["Clothing", "Shirts", "Polos"]
+
+
+def test_menu_is_a_single_cache_read(clothing, rf, django_assert_num_queries):
+    categories(rf.get("/"))
+
+    with django_assert_num_queries(0):
+        menu = categories(rf.get("/"))["categories"]
+    assert [item.name for item in menu] == ["Clothing"]
+    assert [child.slug for child in menu[0].children] == ["pants", "shirts"]
+
+
+def test_category_change_bumps_the_menu_counter(clothing, rf):
+    categories(rf.get("/"))
+    counter = cache.get(CATEGORY_MENU_COUNTER_KEY)
+
+    CategoryFactory(name="Shoes")
+
+    assert cache.get(CATEGORY_MENU_COUNTER_KEY) == counter + 1
+
+
+def test_menu_follows_category_changes(clothing, rf):
+    categories(rf.get("/"))
+
+    CategoryFactory(name="Shoes")
+
+    assert [item.name for item in categories(rf.get("/"))["categories"]] == ["Clothing", "Shoes"]
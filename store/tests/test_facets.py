@@ -0,0 +1,77 @@
+import pytest
+from django.core.cache import cache
+
+from store import facets
+from store.facets import FacetIndex, get_facet_index
+from store.models import Brand
+from store.tests.factories import BrandFactory, CategoryFactory, ProductFactory, ProductVariationFactory, SizeFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def _counts(result, facet):
+    return {value.value: value.count for value in result.counts[facet]}
+
+
+def test_search_intersects_filters_and_counts_facets():
+    shoes = CategoryFactory(name="Shoes")
+    acme = BrandFactory(name="Acme")
+    small = SizeFactory(name="S")
+    large = SizeFactory(name="L")
+    red_small = ProductVariationFactory(product=ProductFactory(category=shoes, brand=acme), size=small, color="#FF0000", stock=3)
+    red_large = ProductVariationFactory(product=ProductFactory(category=shoes), size=large, color="#ff0000", stock=3)
+    blue_small = ProductVariationFactory(product=ProductFactory(brand=acme), size=small, color="#0000ff", stock=3)
+
+    index = FacetIndex.build()
+
+    result = index.search({"color": "#ff0000", "size": "S"})
+    assert result.ids == [red_small.product_id]
+
+    result = index.search({"category": "shoes"})
+    assert result.ids == sorted([red_small.product_id, red_large.product_id])
+    assert _counts(result, "size") == {"S": 1, "L": 1}
+    assert _counts(result, "category")["shoes"] == 2
+
+    result = index.search({"brand": "Acme", "size": "S"})
+    assert result.ids == sorted([red_small.product_id, blue_small.product_id])
+    assert _counts(result, "size") == {"S": 2}
+
+
+def test_index_is_refreshed_when_a_variation_changes(django_capture_on_commit_callbacks):
+    variation = ProductVariationFactory(color="#00ff00", stock=3)
+    assert get_facet_index().search({"color": "#00ff00"}).ids == [variation.product_id]
+
+    variation.color = "#000000"
+    with django_capture_on_commit_callbacks(execute=True):
+        variation.save()
+
+    index = get_facet_index()
+    assert index.search({"color": "#00ff00"}).ids == []
+    assert index.search({"color": "#000000"}).ids == [variation.product_id]
+
+
+
+def test_update_blocked_by_a_stuck_lock_drops_the_index(monkeypatch):
+    variation = ProductVariationFactory(color="#00ff00", stock=3)
+    get_facet_index()
+    monkeypatch.setattr(facets, "FACET_INDEX_LOCK_WAIT", 0)
+    cache.set(facets.FACET_INDEX_LOCK_KEY, "another-process")
+
+    facets.reindex_product(variation.product_id)
+
+    assert cache.get(facets.FACET_INDEX_KEY) is None
+    assert cache.get(facets.FACET_INDEX_LOCK_KEY) is None
+
+
+def test_renaming_a_brand_drops_the_index(django_capture_on_commit_callbacks):
+    variation = ProductVariationFactory(stock=3)
+    brand = Brand.objects.get(pk=variation.product.brand_id)
+    assert get_facet_index().search({"brand": brand.name}).ids == [variation.product_id]
+
+    brand.name = "Renamed"
+    with django_capture_on_commit_callbacks(execute=True):
+        brand.save()
+
+    index = get_facet_index()
+    assert index.search({"brand": "Renamed"}).ids == [variation.product_id]
+    assert [value.label for value in index.search({}).counts["brand"]] == ["Renamed"]
@@ -0,0 +1,69 @@
+import pytest
+from cloudinary import CloudinaryResource
+
+from cart.pricing import price_cart
+from helpers import image_srcset, image_url
+from helpers.cloudinary import images
+from store.tests.factories import ProductFactory, ProductVariationFactory
+
+SHIRT = CloudinaryResource("products/shirt", format="jpg", version=123, type="upload", resource_type="image")
+
+
+def test_url_is_sized_for_the_preset():
+    url = image_url(SHIRT, "card")
+
+    assert "c_limit,f_auto,q_auto,w_400" in url
+    assert url.endswith("/v123/products/shirt.jpg")
+
+
+def test_fixed_format_presets_skip_format_negotiation():
+    url = image_url(SHIRT, "stripe")
+
+    assert "f_auto" not in url
+    assert "w_512" in url and url.endswith(".jpg")
+
+
+def test_srcset_lists_every_preset_width():
+    srcset = image_srcset(SHIRT, "detail").split(", ")
+
+    assert [entry.rsplit(" ", 1)[1] for entry in srcset] == ["400w", "800w", "1200w", "1600w"]
+    assert "w_1600" in srcset[-1]
+
+
+def test_missing_image_gives_an_empty_url():
+    assert image_url(None, "card") == ""
+    assert image_srcset(None, "card") == ""
+
+
+def test_urls_are_memoized_per_public_id_and_version(monkeypatch):
+    calls = []
+    build = images.cloudinary_url
+    monkeypatch.setattr(images, "cloudinary_url", lambda *args, **kwargs: calls.append(args) or build(*args, **kwargs))
+    images._build_url.cache_clear()
+
+    for _ in range(3):
+        image_url(SHIRT, "card")
+    reuploaded = CloudinaryResource("products/shirt", format="jpg", version=124, type="upload", resource_type="image")
+    new_url = image_url(reuploaded, "card")
+
+    assert len(calls) == 2
+    assert "/v124/" in new_url
+
+
+@pytest.mark.django_db
+def test_card_stores_card_sized_urls():
+    product = ProductFactory(base_image=SHIRT)
+    ProductVariationFactory(product=product, featured=True)
+    card = product.refresh_card()
+
+    assert card.image_url == image_url(SHIRT, "card")
+    assert card.image_srcset == image_srcset(SHIRT, "card")
+
+
+@pytest.mark.django_db
+def test_stripe_line_items_use_the_stripe_preset():
+    variation = ProductVariationFactory(variation_image=SHIRT, stock=5)
+
+    line_item = price_cart({str(variation.id): 1}).stripe_line_items()[0]
+
+    assert line_item["price_data"]["product_data"]["images"] == [image_url(SHIRT, "stripe")]
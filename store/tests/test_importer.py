@@ -0,0 +1,97 @@
+import json
+
+import pytest
+from django.core.management import CommandError, call_command
+from io import StringIO
+from store.facets import get_facet_index
+from store.models import Category, Product, ProductVariation
+from store.tests.factories import ProductVariationFactory
+
+pytestmark = pytest.mark.django_db
+
+COLUMNS = "product,category,brand,base_price_cents,size,color,stock,discount,featured\n"
+
+
+def write_csv(tmp_path, lines):
+    path = tmp_path / "catalog.csv"
+    path.write_text(COLUMNS + "".join(f"{line}\n" for line in lines))
+    return str(path)
+
+
+def test_import_creates_the_catalog(tmp_path):
+    path = write_csv(tmp_path, [
+        "Tee,Shirts,Acme,2000,S,#ff0000,3,0,",
+        "Tee,Shirts,Acme,2000,M,#ff0000,0,0,1",
+        "Jeans,Pants,Denimco,5000,M,#0000ff,2,10,",
+    ])
+    out = StringIO()
+
+    call_command("import_catalog", path, stdout=out)
+
+    assert "rows/sec" in out.getvalue()
+    tee = Product.objects.get(name="Tee")
+    assert tee.slug == "tee"
+    assert tee.category.path == f"{tee.category_id}/"
+    variations = list(tee.variations.order_by("id"))
+    assert [variation.featured for variation in variations] == [False, True]
+    assert [variation.is_active for variation in variations] == [True, False]
+    assert all(variation.sku and variation.slug for variation in variations)
+    assert tee.card.featured_variation == variations[1]
+    jeans = Product.objects.get(name="Jeans")
+    assert (jeans.card.price_cents, jeans.card.on_sale) == (4500, True)
+    assert get_facet_index().search({"category": "pants"}).ids == [jeans.id]
+
+
+def test_import_updates_existing_rows(tmp_path):
+    variation = ProductVariationFactory(color="#00ff00", stock=1)
+    product = variation.product
+    path = tmp_path / "catalog.jsonl"
+    path.write_text(json.dumps({
+        "product": product.name,
+        "category": product.category.name,
+        "brand": product.brand.name,
+        "base_price_cents": 1500,
+        "size": variation.size.name,
+        "color": "#00FF00",
+        "stock": 9,
+    }) + "\n")
+
+    call_command("import_catalog", str(path), stdout=StringIO())
+
+    variation.refresh_from_db()
+    assert variation.stock == 9
+    assert ProductVariation.objects.count() == 1
+    assert Product.objects.get().base_price_cents == 1500
+
+
+def test_slugs_do_not_collide_with_existing_ones(tmp_path):
+    Category.objects.create(name="Other", slug="shirts")
+
+    call_command("import_catalog", write_csv(tmp_path, ["Tee,Shirts,Acme,2000,S,#ff0000,3,0,"]), stdout=StringIO())
+
+    assert Category.objects.get(name="Shirts").slug == "shirts-2"
+
+
+def test_regular_saves_still_make_slugs_unique_after_an_import(tmp_path):
+    call_command("import_catalog", write_csv(tmp_path, ["Tee,Shirts,Acme,2000,S,#ff0000,3,0,"]), stdout=StringIO())
+
+    category = Category.objects.create(name="Other", slug="shirts")
+    imported = Category.objects.get(name="Shirts")
+    imported.save()
+
+    assert category.slug == "shirts-2"
+    assert imported.slug == "shirts"
+
+
+def test_import_runs_a_bounded_number_of_queries_per_chunk(tmp_path, django_assert_max_num_queries):
+    lines = [f"P{index},Shirts,Acme,1000,S{index % 3},#ff0000,1,0," for index in range(200)]
+    path = write_csv(tmp_path, lines)
+
+    with django_assert_max_num_queries(40):
+        call_command("import_catalog", path, "--chunk-size", "100", stdout=StringIO())
+    assert ProductVariation.objects.count() == 200
+
+
+def test_missing_columns_are_reported(tmp_path):
+    with pytest.raises(CommandError, match="Row 1 is missing brand"):
+        call_command("import_catalog", write_csv(tmp_path, ["Tee,Shirts,,2000,S,#ff0000,3,0,"]), stdout=StringIO())
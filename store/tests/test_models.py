@@ -1,6 +1,7 @@
 import pytest
+from django.db import IntegrityError, transaction
 from store.tests.factories import BrandFactory, CategoryFactory, ProductFactory, ProductVariationFactory, SizeFactory
-from store.models import Product, ProductVariation, Category
+from store.models import Product, ProductVariation, Category, ProductCard
 
 @pytest.mark.django_db
 def test_category_creation():
@@ -49,3 +50,103 @@ def test_active_variation():
     product_variation = ProductVariationFactory(stock=0)
     assert not product_variation.is_active  # Stock is 0, so is_active should be False
 
+
+@pytest.mark.django_db
+def test_product_card_tracks_featured_variation():
+    """Test that saving a variation refreshes the product's listing card."""
+    product = ProductFactory(base_price_cents=5000)
+    assert product.card.featured_variation is None
+    assert product.card.price_cents == 5000
+
+    variation = ProductVariationFactory(product=product, price_cents=10000, discount=25, stock=5)
+    card = ProductCard.objects.get(product=product)
+    assert card.featured_variation == variation
+    assert card.price_cents == 7500
+    assert card.compare_at_cents == 10000
+    assert card.on_sale is True
+    assert card.price == 75.0
+
+    variation.discount = 0
+    variation.save()
+    card.refresh_from_db()
+    assert card.price_cents == 10000
+    assert card.compare_at_cents is None
+    assert card.on_sale is False
+
+
+@pytest.mark.django_db
+def test_only_one_variation_is_featured_per_product():
+    """Test that featuring a variation unfeatures its siblings and the index enforces it."""
+    product = ProductFactory()
+    first = ProductVariationFactory(product=product, featured=True)
+    second = ProductVariationFactory(product=product, featured=True)
+
+    assert list(product.variations.filter(featured=True)) == [second]
+    with pytest.raises(IntegrityError), transaction.atomic():
+        ProductVariation.objects.filter(pk=first.pk).update(featured=True)
+
+
+@pytest.mark.django_db
+def test_saving_an_unfeatured_variation_leaves_siblings_alone():
+    """Test that only featured saves touch sibling variations."""
+    product = ProductFactory()
+    featured = ProductVariationFactory(product=product, featured=True)
+    other = ProductVariationFactory(product=product, featured=False)
+
+    other.stock = 3
+    other.save()
+
+    featured.refresh_from_db()
+    assert featured.featured is True
+    assert product.featured == featured
+
+
+@pytest.mark.django_db
+def test_set_featured_swaps_the_flag_and_refreshes_the_card():
+    """Test the dedicated featured swap operation."""
+    product = ProductFactory()
+    first = ProductVariationFactory(product=product, featured=True)
+    second = ProductVariationFactory(product=product, featured=False, price_cents=1234, discount=0)
+
+    second.set_featured()
+
+    assert list(product.variations.filter(featured=True)) == [second]
+    assert ProductCard.objects.get(product=product).price_cents == 1234
+
+
+@pytest.mark.django_db
+def test_set_featured_variations_handles_many_products():
+    """Test the bulk swap across several products."""
+    featured = [ProductVariationFactory(featured=True) for _ in range(3)]
+    chosen = [ProductVariationFactory(product=variation.product, featured=False) for variation in featured]
+
+    assert ProductVariation.set_featured_variations([variation.id for variation in chosen]) == 3
+    assert set(ProductVariation.objects.filter(featured=True)) == set(chosen)
+
+
+@pytest.mark.django_db
+def test_variation_saves_refresh_only_the_read_models_they_affect(monkeypatch, django_capture_on_commit_callbacks):
+    """Test that a stock change skips the card and facets, while a price change rebuilds them."""
+    from store import facets
+
+    variation = ProductVariationFactory(stock=5, price_cents=1000, discount=0)
+    variation = ProductVariation.objects.get(pk=variation.pk)
+    refreshed = {"cards": 0, "facets": 0}
+    monkeypatch.setattr(Product, "refresh_card", lambda product: refreshed.update(cards=refreshed["cards"] + 1))
+    monkeypatch.setattr(facets, "reindex_product", lambda product_id: refreshed.update(facets=refreshed["facets"] + 1))
+
+    variation.stock = 4
+    with django_capture_on_commit_callbacks(execute=True):
+        variation.save()
+    assert refreshed == {"cards": 0, "facets": 0}
+
+    variation.price_cents = 1200
+    with django_capture_on_commit_callbacks(execute=True):
+        variation.save()
+    assert refreshed == {"cards": 1, "facets": 1}
+
+    # Selling out deactivates the variation, which changes its facets
+    variation.stock = 0
+    with django_capture_on_commit_callbacks(execute=True):
+        variation.save()
+    assert refreshed == {"cards": 1, "facets": 2}
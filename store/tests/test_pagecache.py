@@ -0,0 +1,139 @@
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from reviews.models import Review
+from store.models import Brand
+from store.pagecache import CSRF_PLACEHOLDER, get_cached_page, page_cache_key, purge_surrogate_keys
+from store.tests.factories import CategoryFactory, ProductVariationFactory
+from users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def detail_url(variation):
+    return reverse("product-detail", args=[variation.product.slug])
+
+
+def is_cached(rf, url, **params):
+    return get_cached_page(page_cache_key(rf.get(url, params))) is not None
+
+
+def test_anonymous_pages_are_replayed_without_queries(client, django_assert_num_queries):
+    variation = ProductVariationFactory(stock=5)
+    first = client.get(reverse("shop"))
+
+    with django_assert_num_queries(0):
+        second = client.get(reverse("shop"))
+
+    assert second.content == first.content
+    assert f"product-{variation.product_id}" in second["Surrogate-Key"].split()
+    assert "catalog" in second["Surrogate-Key"].split()
+    assert "s-maxage" in second["Cache-Control"]
+
+
+def test_query_strings_are_normalized(client, rf):
+    ProductVariationFactory(stock=5)
+
+    client.get(reverse("shop") + "?sorting=alpha&query=&page=1")
+
+    assert is_cached(rf, reverse("shop"), page=1, sorting="alpha")
+
+
+def test_unknown_query_parameters_bypass_the_cache(client, rf):
+    ProductVariationFactory(stock=5)
+
+    response = client.get(reverse("shop"), {"sorting": "alpha", "utm_source": "mail"})
+
+    assert "Surrogate-Key" not in response
+    assert not is_cached(rf, reverse("shop"), sorting="alpha", utm_source="mail")
+    assert not is_cached(rf, reverse("shop"), sorting="alpha")
+
+
+def test_a_purged_page_is_rendered_and_cached_again(client, rf):
+    variation = ProductVariationFactory(stock=5)
+    client.get(detail_url(variation))
+
+    purge_surrogate_keys(f"product-{variation.product_id}")
+
+    assert not is_cached(rf, detail_url(variation))
+    client.get(detail_url(variation))
+    assert is_cached(rf, detail_url(variation))
+
+
+def test_authenticated_users_bypass_the_cache(client, rf):
+    ProductVariationFactory(stock=5)
+    client.force_login(UserFactory())
+
+    response = client.get(reverse("shop"))
+
+    assert "Surrogate-Key" not in response
+    assert not is_cached(rf, reverse("shop"))
+
+
+def test_visitors_with_a_cart_bypass_the_cache(client, rf):
+    variation = ProductVariationFactory(stock=5)
+    client.get(reverse("cart-add", args=[variation.slug]), {"quantity": 1})
+
+    client.get(reverse("shop"))
+
+    assert not is_cached(rf, reverse("shop"))
+
+
+def test_saving_a_product_purges_only_its_pages(client, rf, django_capture_on_commit_callbacks):
+    first = ProductVariationFactory(stock=5)
+    second = ProductVariationFactory(stock=5)
+    for url in (detail_url(first), detail_url(second), reverse("shop")):
+        client.get(url)
+
+    first.product.description = "Updated"
+    with django_capture_on_commit_callbacks(execute=True):
+        first.product.save()
+
+    assert not is_cached(rf, detail_url(first))
+    assert not is_cached(rf, reverse("shop"))
+    assert is_cached(rf, detail_url(second))
+
+
+def test_a_review_purges_the_product_page(client, rf):
+    variation = ProductVariationFactory(stock=5)
+    client.get(detail_url(variation))
+
+    Review.objects.create(product=variation.product, rating=4, review="Nice", name="Ann")
+
+    assert not is_cached(rf, detail_url(variation))
+
+
+def test_renaming_a_brand_purges_its_pages(client, rf, django_capture_on_commit_callbacks):
+    variation = ProductVariationFactory(stock=5)
+    other = ProductVariationFactory(stock=5)
+    for url in (detail_url(variation), detail_url(other), reverse("shop")):
+        client.get(url)
+
+    brand = Brand.objects.get(pk=variation.product.brand_id)
+    brand.name = "Renamed"
+    with django_capture_on_commit_callbacks(execute=True):
+        brand.save()
+
+    assert not is_cached(rf, detail_url(variation))
+    assert not is_cached(rf, reverse("shop"))
+    assert is_cached(rf, detail_url(other))
+
+
+def test_a_category_change_purges_every_page(client, rf):
+    variation = ProductVariationFactory(stock=5)
+    client.get(detail_url(variation))
+
+    CategoryFactory()
+
+    assert not is_cached(rf, detail_url(variation))
+
+
+def test_cached_forms_get_a_fresh_csrf_token(client):
+    variation = ProductVariationFactory(stock=5)
+    client.get(detail_url(variation))
+
+    response = client.get(detail_url(variation))
+
+    assert b'name="csrfmiddlewaretoken"' in response.content
+    assert CSRF_PLACEHOLDER not in response.content
+    assert "Cache-Control" not in response
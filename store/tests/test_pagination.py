@@ -0,0 +1,69 @@
+import pytest
+from django.urls import reverse
+from store.models import Product
+from store.pagination import CachedCountPaginator, CursorPaginator, encode_cursor
+from store.tests.factories import BrandFactory, CategoryFactory, ProductFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.mark.parametrize("ordering", ["name", "-created", "card__price_cents", "-card__price_cents"])
+def test_cursor_paginator_walks_forward_and_back(ordering):
+    category = CategoryFactory()
+    brand = BrandFactory()
+    for index, price in enumerate([300, 100, 100, 200, 500, 400, 100]):
+        ProductFactory(name=f"Product {index}", category=category, brand=brand, base_price_cents=price)
+    queryset = Product.objects.select_related("card")
+    expected = list(queryset.order_by(ordering, ("-" if ordering.startswith("-") else "") + "pk"))
+    paginator = CursorPaginator(queryset, 3, ordering)
+
+    pages = [paginator.get_page()]
+    while pages[-1].has_next():
+        pages.append(paginator.get_page(pages[-1].next_cursor))
+    assert [product for page in pages for product in page] == expected
+    assert not pages[0].has_previous()
+
+    back = paginator.get_page(pages[-1].previous_cursor)
+    assert back.object_list == pages[-2].object_list
+
+
+@pytest.mark.parametrize("ordering, value", [
+    ("-created", {"a": 1}),
+    ("-created", [1, 2]),
+    ("-created", "not a date"),
+    ("card__price_cents", "12.5x"),
+    ("name", None),
+])
+def test_cursor_values_of_the_wrong_type_give_the_first_page(ordering, value):
+    for index in range(4):
+        ProductFactory(name=f"Product {index}")
+    paginator = CursorPaginator(Product.objects.select_related("card"), 3, ordering)
+    first = paginator.get_page()
+
+    page = paginator.get_page(encode_cursor(value, first.object_list[-1].pk, "n"))
+
+    assert page.object_list == first.object_list
+
+
+def test_cached_count_paginator_counts_once(django_assert_num_queries):
+    ProductFactory()
+    ProductFactory()
+    with django_assert_num_queries(1):
+        assert CachedCountPaginator(Product.objects.all(), 5, cache_key="test-count").count == 2
+    with django_assert_num_queries(0):
+        assert CachedCountPaginator(Product.objects.all(), 5, cache_key="test-count").count == 2
+        assert CachedCountPaginator(Product.objects.all(), 5, count=7).count == 7
+
+
+def test_shop_page_cursor_mode(client):
+    category = CategoryFactory()
+    brand = BrandFactory()
+    for name in ["Alpha", "Bravo", "Charlie", "Delta", "Echo", "Foxtrot"]:
+        ProductFactory(name=name, category=category, brand=brand)
+
+    response = client.get(reverse("shop") + "?sorting=alpha&cursor=")
+    page = response.context["page"]
+    assert [p.name for p in page] == ["Alpha", "Bravo", "Charlie", "Delta", "Echo"]
+
+    response = client.get(reverse("shop"), {"sorting": "alpha", "cursor": page.next_cursor})
+    assert [p.name for p in response.context["page"]] == ["Foxtrot"]
@@ -0,0 +1,70 @@
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from io import StringIO
+from django.test import RequestFactory
+from store.models import ProductSalesRank
+from store.pagecache import get_cached_page, page_cache_key
+from store.ranking import record_sales
+from store.tests.factories import ProductVariationFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def test_every_product_gets_a_rank():
+    variation = ProductVariationFactory()
+
+    assert variation.product.sales_rank.score == 0
+
+
+def test_sales_accumulate_and_decay():
+    first = ProductVariationFactory().product
+    second = ProductVariationFactory().product
+
+    record_sales({first.id: 2, second.id: 1})
+    record_sales({first.id: 3})
+    call_command("decay_sales_ranks", factor=0.5, stdout=StringIO())
+
+    ranks = {rank.product_id: rank for rank in ProductSalesRank.objects.all()}
+    assert (ranks[first.id].score, ranks[first.id].units_sold) == (2.5, 5)
+    assert (ranks[second.id].score, ranks[second.id].units_sold) == (0.5, 1)
+
+
+def test_popular_products_follow_sales(client):
+    products = [ProductVariationFactory(stock=5).product for _ in range(5)]
+    record_sales({products[3].id: 5, products[1].id: 2})
+
+    response = client.get(reverse("home"))
+    assert list(response.context["popular_products"])[:2] == [products[3], products[1]]
+
+    response = client.get(reverse("shop"), {"sorting": "popular"})
+    assert list(response.context["page"])[:2] == [products[3], products[1]]
+
+
+def test_popular_sort_supports_cursor_pages(client):
+    products = [ProductVariationFactory(stock=5).product for _ in range(7)]
+    record_sales({product.id: index + 1 for index, product in enumerate(products)})
+
+    first = client.get(reverse("shop"), {"sorting": "popular", "cursor": ""}).context["page"]
+    second = client.get(reverse("shop"), {"sorting": "popular", "cursor": first.next_cursor}).context["page"]
+
+    assert list(first) + list(second) == products[::-1]
+
+
+def test_a_sale_keeps_cached_listings(client):
+    product = ProductVariationFactory(stock=5).product
+    client.get(reverse("shop"))
+
+    record_sales({product.id: 1})
+
+    assert get_cached_page(page_cache_key(RequestFactory().get(reverse("shop")))) is not None
+
+
+def test_unsold_products_come_last_in_popular_cursor_pages(client):
+    products = [ProductVariationFactory(stock=5).product for _ in range(7)]
+    record_sales({product.id: index + 1 for index, product in enumerate(products[:4])})
+
+    first = client.get(reverse("shop"), {"sorting": "popular", "cursor": ""}).context["page"]
+    second = client.get(reverse("shop"), {"sorting": "popular", "cursor": first.next_cursor}).context["page"]
+
+    assert list(first) + list(second) == products[::-1][3:] + products[::-1][:3]
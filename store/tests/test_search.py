@@ -0,0 +1,64 @@
+import pytest
+from django.db import connection
+from store.models import Product
+from store import search, signals
+from store.search import search_products
+from store.tests.factories import BrandFactory, CategoryFactory, ProductFactory, ProductVariationFactory
+
+pytestmark = pytest.mark.django_db
+
+postgres_only = pytest.mark.skipif(connection.vendor != "postgresql", reason="requires PostgreSQL")
+
+
+def test_search_matches_name_description_brand_and_category():
+    by_name = ProductFactory(name="Trailrunner")
+    by_description = ProductFactory(name="Boot", description="A waterproof trail shoe")
+    by_brand = ProductFactory(name="Sandal", brand=BrandFactory(name="Trailworks"))
+    by_category = ProductFactory(name="Sock", category=CategoryFactory(name="Trail gear"))
+    ProductFactory(name="Scarf", description="Wool")
+
+    results = set(search_products(Product.objects.all(), "trail"))
+    assert results == {by_name, by_description, by_brand, by_category}
+
+
+@postgres_only
+def test_search_ranks_name_matches_first_and_tolerates_typos():
+    best = ProductFactory(name="Denim jacket", description="Classic")
+    other = ProductFactory(name="Shirt", description="Goes well with a denim jacket")
+
+    assert list(search_products(Product.objects.all(), "denim jacket")) == [best, other]
+    assert list(search_products(Product.objects.all(), "denin jaket")) == [best]
+
+
+@postgres_only
+def test_full_text_search_matches_word_prefixes():
+    by_name = ProductFactory(name="Trailrunner")
+    by_brand = ProductFactory(name="Sandal", brand=BrandFactory(name="Trailworks"))
+    ProductFactory(name="Scarf", description="Wool")
+
+    assert set(search_products(Product.objects.all(), "trail")) == {by_name, by_brand}
+
+
+@postgres_only
+def test_tags_and_brand_renames_are_searchable():
+    product = ProductFactory(name="Boot")
+    product.tags.add("waterproof")
+    product.brand.name = "Northpeak"
+    product.brand.save()
+
+    assert list(search_products(Product.objects.all(), "waterproof")) == [product]
+    assert list(search_products(Product.objects.all(), "northpeak")) == [product]
+
+
+def test_variation_saves_do_not_reindex_the_search_vector(monkeypatch):
+    variation = ProductVariationFactory(stock=3)
+    calls = []
+    record = lambda ids: calls.append(list(ids))
+    monkeypatch.setattr(search, "update_search_vectors", record)
+    monkeypatch.setattr(signals, "update_search_vectors", record)
+
+    variation.stock = 2
+    variation.save()
+    variation.product.tags.add("summer")
+
+    assert calls == [[variation.product_id]]
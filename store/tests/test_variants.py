@@ -0,0 +1,117 @@
+import pytest
+from django.urls import reverse
+
+from orders.reservations import reserve_stock
+from orders.tests.factories import OrderFactory
+from store.tests.factories import ProductFactory, ProductVariationFactory, SizeFactory
+from store.variants import get_variant_matrix
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def product(django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        product = ProductFactory()
+        small, large = SizeFactory(name="S"), SizeFactory(name="L")
+        ProductVariationFactory(product=product, color="#000000", size=small, stock=3, price_cents=1000, discount=10, featured=False)
+        ProductVariationFactory(product=product, color="#000000", size=large, stock=2, featured=True)
+        ProductVariationFactory(product=product, color="#ffffff", size=small, stock=4, featured=False)
+        ProductVariationFactory(product=product, color="#ffffff", size=large, stock=0, featured=False)
+    return product
+
+
+def test_matrix_arranges_variations_by_color_and_size(product):
+    matrix = get_variant_matrix(product)
+
+    assert matrix.colors == ["#000000", "#ffffff"]
+    assert matrix.sizes == ["S", "L"]
+    black_small = matrix.cells[("#000000", "S")]
+    assert (black_small.stock, black_small.final_price_cents) == (3, 900)
+    assert matrix.featured == matrix.cells[("#000000", "L")]
+    assert [variant.size for variant in matrix.same_color(black_small)] == ["L"]
+    # Out of stock variations are inactive and left out of the pickers
+    assert matrix.other_colors(black_small) == [matrix.cells[("#ffffff", "S")]]
+
+
+def test_matrix_is_cached_until_a_variation_changes(product, django_assert_num_queries, django_capture_on_commit_callbacks):
+    get_variant_matrix(product)
+    with django_assert_num_queries(0):
+        get_variant_matrix(product)
+
+    variation = product.variations.get(size__name="S", color="#000000")
+    variation.stock = 7
+    with django_capture_on_commit_callbacks(execute=True):
+        variation.save()
+
+    assert get_variant_matrix(product).cells[("#000000", "S")].stock == 7
+
+
+def test_reserving_stock_drops_the_matrix(product, django_capture_on_commit_callbacks):
+    variation = product.variations.get(size__name="S", color="#000000")
+    get_variant_matrix(product)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        reserve_stock(OrderFactory(), {variation.id: 2})
+
+    assert get_variant_matrix(product).cells[("#000000", "S")].stock == 1
+
+
+def test_detail_page_renders_pickers_without_variation_queries(client, product, django_assert_num_queries):
+    url = reverse("product-detail", args=[product.slug])
+    variant = get_variant_matrix(product).cells[("#ffffff", "S")]
+
+    with django_assert_num_queries(1):
+        # The product only: it has no reviews to page through and no variation is queried
+        response = client.get(url, {"variant_slug": variant.slug})
+
+    assert response.context["chosen"] == variant
+    assert f'href="{url}?variant_slug=' in response.content.decode()
+
+
+def test_variant_of_another_product_is_not_found(client, product):
+    other = ProductVariationFactory()
+
+    response = client.get(reverse("product-detail", args=[product.slug]), {"variant_slug": other.slug})
+
+    assert response.status_code == 404
+
+
+def test_variant_endpoint_serves_the_matrix_with_an_etag(client, product):
+    url = reverse("product-variants", args=[product.slug])
+
+    response = client.get(url)
+
+    data = response.json()
+    assert response.status_code == 200
+    assert response["ETag"] == get_variant_matrix(product).etag
+    assert data["sizes"] == ["S", "L"]
+    assert data["featured"] == get_variant_matrix(product).featured.slug
+    black_small = next(variant for variant in data["variants"] if (variant["color"], variant["size"]) == ("#000000", "S"))
+    assert (black_small["price_cents"], black_small["final_price_cents"], black_small["stock"]) == (1000, 900, 3)
+    assert len(response.content) < 1024
+
+
+def test_variant_endpoint_revalidates_without_a_body(client, product, django_assert_num_queries):
+    url = reverse("product-variants", args=[product.slug])
+    etag = client.get(url)["ETag"]
+
+    with django_assert_num_queries(1):
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+def test_variant_endpoint_etag_changes_with_stock(client, product, django_capture_on_commit_callbacks):
+    url = reverse("product-variants", args=[product.slug])
+    etag = client.get(url)["ETag"]
+    variation = product.variations.get(size__name="S", color="#000000")
+    variation.stock = 1
+    with django_capture_on_commit_callbacks(execute=True):
+        variation.save()
+
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    assert response.status_code == 200
+    assert response["ETag"] != etag
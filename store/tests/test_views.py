@@ -49,7 +49,7 @@ def test_product_detail_with_variant_slug(client):
     response = client.get(reverse("product-detail", args=[product.slug]) + f"?variant_slug={alt_variation.slug}")
 
     assert response.status_code == 200
-    assert response.context["chosen"] == alt_variation
+    assert response.context["chosen"].id == alt_variation.id
 
 
 def test_shop_page_sorting_latest(client):
@@ -60,3 +60,34 @@ def test_shop_page_sorting_latest(client):
     products = list(response.context["page"].object_list)
     names = [p.name for p in products]
     assert names == sorted(names)
+
+
+def test_shop_page_query_count_does_not_grow_with_products(client, django_assert_max_num_queries):
+    for _ in range(2):
+        ProductVariationFactory(stock=5)
+    with django_assert_max_num_queries(12) as small_page:
+        client.get(reverse("shop"))
+
+    for _ in range(3):
+        ProductVariationFactory(stock=5)
+    with django_assert_max_num_queries(len(small_page.captured_queries)):
+        response = client.get(reverse("shop"))
+    assert response.status_code == 200
+
+
+def test_product_detail_reviews_are_paginated_in_fixed_queries(client, django_assert_num_queries):
+    from reviews.tests.factories import ReviewFactory
+
+    product = ProductFactory(is_active=True)
+    ProductVariationFactory(product=product)
+    url = reverse("product-detail", args=[product.slug])
+    client.get(url)  # Builds the variant matrix
+
+    for review_count in (3, 25):
+        ReviewFactory.create_batch(review_count - product.reviews.count(), product=product)
+        with django_assert_num_queries(2):
+            response = client.get(url, {"reviews_page": 2})
+
+    assert response.context["reviews_count"] == 25
+    assert len(response.context["reviews"]) == 10
+    assert response.context["reviews_page"].paginator.num_pages == 3
@@ -1,10 +1,13 @@
 from django.urls import path
-from .views import HomePageView, ProductDetailPage, ShopPageView
+from .views import HomePageView, ProductDetailPage, ProductVariantsView, ShopPageView
 
 urlpatterns = [
     # Path for the shop page, where users can view products with filtering options
     path("shop/", ShopPageView.as_view(), name="shop"),
     
+    # Path for the JSON variant matrix used to switch variations in place
+    path("<slug:slug>/variants/", ProductVariantsView.as_view(), name="product-variants"),
+
     # Path for the product detail page, using a slug to uniquely identify the product
     path("<slug:slug>/", ProductDetailPage.as_view(), name="product-detail"),
     
@@ -0,0 +1,215 @@
+import hashlib
+import json
+from dataclasses import asdict, dataclass
+
+from django.core.cache import cache
+from django.urls import reverse
+
+from helpers import image_srcset, image_url
+from store.models import ProductVariation
+
+# Cache key format, version and seconds kept of a product's matrix; bump
+# the version whenever the shape of `Variant` changes so stale entries are
+# never read
+VARIANT_MATRIX_KEY = "store:variant-matrix:{product_id}"
+VARIANT_MATRIX_VERSION = 3
+VARIANT_MATRIX_TIMEOUT = 15 * 60
+
+
+def _matrix_cache_key(product_id):
+    return VARIANT_MATRIX_KEY.format(product_id=product_id)
+
+
+@dataclass(frozen=True)
+class Variant:
+    """
+    A variation as held in the cached matrix.
+
+    Attributes:
+        id (int): The variation id.
+        slug (str): The variation slug, used in `?variant_slug=`.
+        sku (str): The stock keeping unit.
+        color (str): The color.
+        size (str): The size name.
+        stock (int): Units in stock.
+        is_active (bool): Whether the variation is on sale.
+        featured (bool): Whether the variation is the featured one.
+        price_cents (int): The list price, in cents.
+        final_price_cents (int): The discounted price, in cents.
+        image (str): The detail-sized image URL, falling back to the
+            product image.
+        image_srcset (str): The `srcset` of the detail image.
+        thumbnail (str): The thumbnail-sized image URL (the color picker).
+        description (str): The variation description.
+        url (str): The product page with this variation selected.
+    """
+    id: int
+    slug: str
+    sku: str
+    color: str
+    size: str
+    stock: int
+    is_active: bool
+    featured: bool
+    price_cents: int
+    final_price_cents: int
+    image: str
+    image_srcset: str
+    thumbnail: str
+    description: str
+    url: str
+
+    @property
+    def price(self):
+        return self.final_price_cents / 100
+
+    @property
+    def has_discount(self):
+        return self.final_price_cents != self.price_cents
+
+    def get_absolute_url(self):
+        return self.url
+
+
+class VariantMatrix:
+    """
+    Every variation of a product arranged by color and size, built in one
+    query and kept in the cache.
+
+    The product page and its size and color pickers are rendered from it
+    without any further variation query. It is kept in the shared cache for
+    `VARIANT_MATRIX_TIMEOUT` seconds at most, and dropped whenever the
+    product or one of its variations changes, or stock is taken or released.
+
+    Attributes:
+        product_id (int): The product id.
+        variants (tuple): The `Variant` of every variation, oldest first.
+        colors (list): The colors, in order of first appearance.
+        sizes (list): The size names, in order of first appearance.
+        content (bytes): The matrix as compact JSON, for the variant endpoint.
+        etag (str): A quoted ETag of `content`.
+    """
+
+    def __init__(self, product_id, variants):
+        self.product_id = product_id
+        self.variants = tuple(variants)
+        self.by_slug = {variant.slug: variant for variant in self.variants}
+        self.cells = {(variant.color, variant.size): variant for variant in self.variants}
+        self.colors = list(dict.fromkeys(variant.color for variant in self.variants))
+        self.sizes = list(dict.fromkeys(variant.size for variant in self.variants))
+        # Serialized once per build, so every request for it is a cache read
+        self.content = json.dumps(self.payload(), separators=(",", ":")).encode()
+        self.etag = f'"{hashlib.md5(self.content).hexdigest()}"'
+
+    def payload(self):
+        """
+        The matrix as JSON-serializable data.
+
+        Returns:
+            dict: The product id, the color and size axes, the featured slug
+            and one entry per variant (without its description or URL, which
+            the client already has or can build).
+        """
+        featured = self.featured
+        return {
+            "product": self.product_id,
+            "colors": self.colors,
+            "sizes": self.sizes,
+            "featured": featured.slug if featured else None,
+            "variants": [
+                {
+                    key: value
+                    for key, value in asdict(variant).items()
+                    if key not in ("sku", "description", "url", "featured")
+                }
+                for variant in self.variants
+            ],
+        }
+
+    @classmethod
+    def build(cls, product):
+        """
+        Build the matrix of a product from a single query.
+        """
+        detail_url = reverse("product-detail", args=[product.slug])
+        variations = ProductVariation.objects.filter(product_id=product.pk).select_related("size").order_by("id")
+        variants = []
+        for variation in variations:
+            image = variation.variation_image or product.base_image
+            variants.append(Variant(
+                id=variation.id,
+                slug=variation.slug,
+                sku=variation.sku,
+                color=variation.color,
+                size=variation.size.name,
+                stock=variation.stock,
+                is_active=variation.is_active,
+                featured=variation.featured,
+                price_cents=variation.price_cents or 0,
+                final_price_cents=variation.final_price_cents,
+                image=image_url(image, "detail") or None,
+                image_srcset=image_srcset(image, "detail"),
+                thumbnail=image_url(image, "thumbnail") or None,
+                description=variation.description,
+                url=f"{detail_url}?variant_slug={variation.slug}",
+            ))
+        return cls(product.pk, variants)
+
+    @property
+    def featured(self):
+        """
+        The featured variant, or the oldest one if none is flagged (as in
+        `Product.featured`).
+        """
+        return next((variant for variant in self.variants if variant.featured), None) or (
+            self.variants[0] if self.variants else None
+        )
+
+    def get(self, slug):
+        return self.by_slug.get(slug)
+
+    def same_color(self, variant):
+        """
+        Other active variants in the color of `variant` (the size picker).
+        """
+        return [
+            other for other in self.variants
+            if other.color == variant.color and other.is_active and other.id != variant.id
+        ]
+
+    def other_colors(self, variant):
+        """
+        The oldest active variant of every other color (the color picker).
+        """
+        firsts = {}
+        for other in self.variants:
+            if other.is_active and other.color != variant.color:
+                firsts.setdefault(other.color, other)
+        return list(firsts.values())
+
+
+def get_variant_matrix(product):
+    """
+    Return the cached variant matrix of a product, building it on a miss.
+
+    Args:
+        product (Product): The product.
+
+    Returns:
+        VariantMatrix: The matrix.
+    """
+    key = _matrix_cache_key(product.pk)
+    matrix = cache.get(key, version=VARIANT_MATRIX_VERSION)
+    if matrix is None:
+        matrix = VariantMatrix.build(product)
+        cache.set(key, matrix, VARIANT_MATRIX_TIMEOUT, version=VARIANT_MATRIX_VERSION)
+    return matrix
+
+
+def invalidate_variant_matrices(product_ids):
+    """
+    Drop the cached matrices of several products.
+    """
+    cache.delete_many(
+        [_matrix_cache_key(product_id) for product_id in product_ids], version=VARIANT_MATRIX_VERSION
+    )
@@ -1,14 +1,25 @@
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response
 from django.shortcuts import render, get_object_or_404, get_list_or_404
 from store.models import Category, Product, ProductVariation, Size, Brand
+from store.categories import get_category_tree
+from store.facets import get_facet_index
+from store.ranking import ranked_products
+from store.search import search_products
+from store.variants import get_variant_matrix
 from django.views.generic import ListView, View
 from django.core.paginator import Paginator
+from store.pagination import CachedCountPaginator, CursorPaginator, count_cache_key
+from store.pagecache import (
+    CATALOG_KEY, PageCacheMixin, add_surrogate_keys, brand_key, category_key, product_key,
+)
 from store.forms import QuantityForm
 from reviews.forms import ReviewForm
 
 
 
 # View to display the homepage with top categories and featured products
-class HomePageView(View):
+class HomePageView(PageCacheMixin, View):
     """
     View to render the homepage, showcasing top categories and featured products.
     
@@ -19,15 +30,24 @@ class HomePageView(View):
         # Get top-level categories (no parent)
         top_categories = Category.objects.filter(parent__isnull=True)
         
+        # Active products rendered from their precomputed cards
+        listed_products = Product.objects.filter(
+            card__is_active=True
+        ).select_related("card", "category")
+
         # Get the latest active products (limit to 4)
-        latest_products = [
-            product for product in Product.objects.all().order_by("-created") if product.is_active
-        ][:4]
+        latest_products = listed_products.order_by("-created")[:4]
         
-        # Get popular active products (limit to 4)
-        popular_products = [
-            product for product in Product.objects.all().order_by("-created") if product.is_active
-        ][:4]
+        # Get the best selling active products (limit to 4), from the sales rank rollup
+        popular_products = ranked_products(listed_products).order_by("-sales_rank__score", "-created")[:4]
+
+        # Tag the cached page with everything it shows
+        add_surrogate_keys(
+            request,
+            CATALOG_KEY,
+            *[product_key(product.id) for product in [*latest_products, *popular_products]],
+            *[category_key(category.id) for category in top_categories],
+        )
 
         # Render the homepage with the products and categories
         context = {
@@ -39,7 +59,7 @@ class HomePageView(View):
 
 
 # View to display product details with an option to choose product variations
-class ProductDetailPage(View):
+class ProductDetailPage(PageCacheMixin, View):
     """
     View to display detailed information about a product, including its variations and reviews.
     
@@ -47,6 +67,8 @@ class ProductDetailPage(View):
         get(request, slug): Renders the product details page.
     """
     template_name = "product-detail.html"
+    reviews_per_page = 10
+    page_cache_params = ("reviews_page", "variant_slug")
     
     def get(self, request, slug):
         # Initialize form and review form
@@ -54,33 +76,73 @@ class ProductDetailPage(View):
         review_form = ReviewForm()
         
         # Get the product object by slug
-        product = get_object_or_404(Product, slug=slug)
+        product = get_object_or_404(Product.objects.select_related("brand"), slug=slug)
         
-        # Get the product's reviews
-        reviews = product.reviews.all()
-        reviews_count = len(reviews)
+        # One page of reviews, counted from the product's rating aggregates
+        paginator = CachedCountPaginator(
+            product.reviews.select_related("user").order_by("-created", "-id"),
+            self.reviews_per_page,
+            count=product.rating_count,
+        )
+        reviews_page = paginator.get_page(request.GET.get("reviews_page"))
+        reviews_count = product.rating_count
         
+        # Variations are rendered from the cached color x size matrix
+        matrix = get_variant_matrix(product)
+
         # Determine the selected variation, defaulting to featured if no variant is chosen
         variant_slug = request.GET.get("variant_slug", None)
         if variant_slug is None:
-            chosen = product.featured
+            chosen = matrix.featured
         else:
-            chosen = get_object_or_404(ProductVariation, slug=variant_slug)
+            chosen = matrix.get(variant_slug)
+            if chosen is None:
+                raise Http404("No such variation of this product")
+        
+        add_surrogate_keys(request, product_key(product.id))
+
+        # Category chain for the breadcrumbs, served from the cached tree
+        breadcrumbs = get_category_tree().ancestors(product.category_id)
         
         # Render the product detail page with context
         context = {
+            "breadcrumbs": breadcrumbs,
             "chosen": chosen,
+            "same_color": matrix.same_color(chosen) if chosen else [],
+            "other_colors": matrix.other_colors(chosen) if chosen else [],
             "form": form,
             "review_form": review_form,
-            "reviews": reviews,
+            "reviews": reviews_page.object_list,
+            "reviews_page": reviews_page,
             "reviews_count": reviews_count,
             "product": product
         }
         return render(request, self.template_name, context)
 
 
+# JSON view serving the variant matrix of a product
+class ProductVariantsView(View):
+    """
+    Serves the variant matrix of a product as compact JSON, so the product
+    page can switch colors and sizes without reloading.
+
+    The body is serialized once per matrix build and carries an ETag, so a
+    repeated request is answered with an empty 304.
+    """
+    def get(self, request, slug):
+        product = get_object_or_404(Product.objects.only("id", "slug", "base_image"), slug=slug)
+        matrix = get_variant_matrix(product)
+        response = get_conditional_response(request, etag=matrix.etag)
+        if response is None:
+            response = HttpResponse(matrix.content, content_type="application/json")
+        response["ETag"] = matrix.etag
+        # Browsers keep the body and revalidate it on every use
+        response["Cache-Control"] = "private, max-age=0, must-revalidate"
+        return response
+
+
 # View to display a paginated list of products with filtering and sorting options
-class ShopPageView(View):
+class ShopPageView(PageCacheMixin, View):
     """
     View to display the shop page with products, categories, and various filters.
     
@@ -88,68 +150,84 @@ class ShopPageView(View):
         get(request): Renders the shop page with filtering, sorting, and pagination.
     """
     template_name = "shop.html"
+    paginate_by = 5
+    page_cache_params = ("query", "sorting", "category", "brand", "size", "color", "cursor", "page")
+
+    # Sorting options mapped to the field they order by
+    sort_fields = {
+        "latest": "-created",
+        "alpha": "name",
+        "price_asc": "card__price_cents",
+        "price_desc": "-card__price_cents",
+        "popular": "-sales_rank__score",
+    }
     
     def get(self, request):
-        # Get active products and other necessary data
-        products = Product.objects.filter(is_active=True)
-        categories = Category.objects.all()
-        sizes = Size.objects.all()
-        colors = ProductVariation.objects.filter(is_active=True).values_list('color', flat=True).distinct()
-        brands = Brand.objects.all()
-        
-        # Handle sorting by latest, alphabetical, or on sale
-        sorting = request.GET.get("sorting", None)
-        if sorting:
-            if sorting == "latest":
-                products = products.order_by("-created")
-            elif sorting == "alpha":
-                products = products.order_by("name")
-            elif sorting == "on_sale":
-                products = products.filter(on_sale=True)
-
-        # Handle category filtering
-        category_slug = request.GET.get("category", None)
-        if category_slug:
-            category = Category.objects.filter(slug=category_slug).first()
-            if category is None:
-                raise ValueError("Category not found")
-            else:
-                products = products.filter(category=category)
-        
-        # Handle size filtering
-        size = request.GET.get("size", None)
-        if size:
-            size = get_object_or_404(Size, name=size)
-            products = products.filter(variations__size=size)
-        
-        # Handle color filtering
-        color = request.GET.get("color", None)
-        if color:
-            products = products.filter(variations__color__iexact=color).distinct()
-        
-        # Handle brand filtering
-        brand = request.GET.get("brand", None)
-        if brand:
-            brand = get_object_or_404(Brand, name=brand)
-            products = products.filter(brand=brand)
+        # Get active products (rendered from their cards)
+        products = Product.objects.filter(card__is_active=True).select_related("card", "category")
         
-        # Handle search query
+        # Handle search query (results are ranked by relevance unless a sorting is chosen)
         query = request.GET.get("query", None)
         if query:
-            products = products.filter(name__icontains=query)
+            products = search_products(products, query)
+
+        # Handle sorting by latest, popularity, alphabetical, price, or on sale
+        sorting = request.GET.get("sorting", None)
+        if sorting == "popular":
+            products = ranked_products(products)
+        if sorting in self.sort_fields:
+            # The primary key breaks ties so pages never overlap
+            products = products.order_by(self.sort_fields[sorting], "id")
+
+        # Resolve category, brand, size, color and on-sale filters through the facet index
+        facets = get_facet_index().search({
+            "category": request.GET.get("category", None),
+            "brand": request.GET.get("brand", None),
+            "size": request.GET.get("size", None),
+            "color": request.GET.get("color", None),
+            "on_sale": "1" if sorting == "on_sale" else None,
+        })
+        if facets.filtered:
+            products = products.filter(id__in=facets.ids)
         
-        # Pagination setup
-        paginator = Paginator(products, 5)
-        page_number = request.GET.get("page")
-        page = paginator.get_page(page_number)
+        # Pagination setup: opt-in keyset pagination when a cursor is requested,
+        # otherwise page numbers backed by a known or cached total
+        if "cursor" in request.GET:
+            paginator = CursorPaginator(
+                products, self.paginate_by, self.sort_fields.get(sorting, "name")
+            )
+            page = paginator.get_page(request.GET.get("cursor"))
+        else:
+            paginator = CachedCountPaginator(
+                products,
+                self.paginate_by,
+                cache_key=count_cache_key("store:shop-count", request.GET),
+                count=len(facets.ids) if facets.filtered and not query else None,
+            )
+            page = paginator.get_page(request.GET.get("page"))
         
+        # Tag the cached page with the products it lists and the filters that
+        # scope it; unscoped listings depend on the whole catalog
+        add_surrogate_keys(request, *[product_key(product.id) for product in page])
+        category = get_category_tree().get(request.GET.get("category") or "")
+        if category is not None:
+            add_surrogate_keys(request, category_key(category.id))
+        brand_filter = request.GET.get("brand")
+        if brand_filter:
+            add_surrogate_keys(request, *[
+                brand_key(brand_id) for brand_id in Brand.objects.filter(name=brand_filter).values_list("id", flat=True)
+            ])
+        if category is None and not brand_filter:
+            add_surrogate_keys(request, CATALOG_KEY)
+
         # Render the shop page with context
         context = {
             "products": products,
-            "categories": categories,
-            "sizes": sizes,
-            "colors": colors,
-            "brands": brands,
+            "category_facets": facets.counts["category"],
+            "size_facets": facets.counts["size"],
+            "color_facets": facets.counts["color"],
+            "brand_facets": facets.counts["brand"],
+            "on_sale_facets": facets.counts["on_sale"],
             "page": page
         }
         return render(request, self.template_name, context)
\ No newline at end of file